@@ -0,0 +1,180 @@
+import time
+import queue
+import threading
+import requests
+from logs import get_logger
+
+# ==========================================
+# Telegram alert dispatcher
+# ==========================================
+# Alerts go into a bounded queue and are sent by one worker over a single
+# keep-alive requests.Session. Each chat has a token bucket; while a chat is
+# out of tokens its alerts pile up and go out as one digest message; at most
+# max_pending per chat are held, the oldest beyond that are dropped (counted).
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+MAX_TEXT = 4096          # Telegram's limit per message (UTF-16 code units)
+log = get_logger("alerts")
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate          # tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.blocked_until = 0.0  # set from Telegram's retry_after on HTTP 429
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self, now):
+        self._refill(now)
+        if now < self.blocked_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self, now):
+        self._refill(now)
+        return max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0.0)
+
+
+def _units(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _clip(text, limit=MAX_TEXT):
+    if _units(text) <= limit:
+        return text
+    while _units(text) > limit - 1:
+        text = text[:-max(1, (_units(text) - limit + 1) // 2)]
+    return text + "…"
+
+
+def format_digest(messages):
+    # One message of at most MAX_TEXT; lines that don't fit are summarised
+    if len(messages) == 1:
+        return _clip(messages[0])
+    counts = {}
+    for m in messages:
+        counts[m] = counts.get(m, 0) + 1
+    lines = [_clip(f"• {m}" + (f" (x{n})" if n > 1 else ""), 512) for m, n in counts.items()]
+    text, rest = f"🚨 {len(messages)} alerts:", len(messages)
+    for line, n in zip(lines, counts.values()):
+        more = f"\n• … and {rest} more"
+        if _units(text) + 1 + _units(line) + (len(more) if rest > n else 0) > MAX_TEXT:
+            return text + more
+        text += "\n" + line
+        rest -= n
+    return text
+
+
+def retry_after(r, default=30):
+    # Seconds to back off after a 429: Telegram's JSON, else Retry-After, else default
+    try:
+        return float(r.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(r.headers.get("Retry-After", default))
+    except (ValueError, TypeError):
+        return default
+
+
+class AlertDispatcher:
+    def __init__(self, token, api_base=TELEGRAM_API_BASE, maxsize=1000, rate=1 / 3.0, burst=3, timeout=10, max_pending=100):
+        self.url = f"{api_base.rstrip('/')}/bot{token}/sendMessage"
+        self.timeout = timeout
+        self.rate = rate
+        self.burst = burst
+        self.session = requests.Session()
+        self.buckets = {}    # chat_id -> TokenBucket
+        self.pending = {}    # chat_id -> messages waiting for a token (guarded by _lock)
+        self.max_pending = max_pending
+        self.sent = 0
+        self.dropped = 0
+        self._q = queue.Queue(maxsize)
+        self._lock = threading.Lock()   # depth() reads pending from the /metrics thread
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def send(self, text, chat_id):
+        # Never blocks the caller (the ingest worker); False if the queue is full
+        try:
+            self._q.put_nowait((chat_id, text))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            log.warning("❌ [Telegram] Queue full, dropped", message=text)
+            return False
+
+    def depth(self):
+        with self._lock:
+            held = sum(len(m) for m in self.pending.values())
+        return self._q.qsize() + held
+
+    def _hold(self, chat_id, held):
+        # Worker only, under _lock: keep the newest max_pending for the chat
+        excess = len(held) - self.max_pending
+        if excess > 0:
+            held = held[excess:]
+            self.dropped += excess
+            log.warning("❌ [Telegram] Too many pending, dropped oldest", chat_id=chat_id, dropped=excess)
+        self.pending[chat_id] = held
+
+    def _bucket(self, chat_id):
+        b = self.buckets.get(chat_id)
+        if b is None:
+            b = self.buckets[chat_id] = TokenBucket(self.rate, self.burst)
+        return b
+
+    def _next_wakeup(self):
+        if not self.pending:
+            return None
+        now = time.monotonic()
+        return min(self._bucket(c).wait_time(now) for c in self.pending)
+
+    def _run(self):
+        while True:
+            burst = {}
+            try:
+                item = self._q.get(timeout=self._next_wakeup())
+                while True:
+                    chat_id, text = item
+                    burst.setdefault(chat_id, []).append(text)
+                    item = self._q.get_nowait()   # drain a burst so it can be coalesced
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            with self._lock:
+                for chat_id, messages in burst.items():
+                    self._hold(chat_id, self.pending.get(chat_id, []) + messages)
+                ready = [(c, self.pending.pop(c)) for c in list(self.pending) if self._bucket(c).take(now)]
+            for chat_id, messages in ready:
+                self._post(chat_id, messages)
+
+    def _post(self, chat_id, messages):
+        text = format_digest(messages)
+        try:
+            r = self.session.post(self.url, json={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+            if r.status_code == 200:
+                self.sent += 1
+                log.info("✅ [Telegram] Sent", alerts=len(messages), chat_id=chat_id)
+            elif r.status_code == 429:
+                # Rate limited by Telegram: back off and keep the messages for the next digest
+                retry = retry_after(r)
+                self._bucket(chat_id).blocked_until = time.monotonic() + retry
+                with self._lock:
+                    self._hold(chat_id, messages + self.pending.get(chat_id, []))
+                log.warning("⏳ [Telegram] Rate limited", retry_s=retry)
+            else:
+                log.error("❌ [Telegram] Failed", status=r.status_code, body=r.text)
+        except Exception as e:
+            log.error("❌ [Telegram Error]", error=e)
@@ -0,0 +1,81 @@
+// Server push (/stream): each sample message is applied in the browser by
+// plant.apply (value cards, extendData on the graphs); the server only renders
+// again for a new window, device or profile, or when samples were missed.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    plant: {
+        connect: function (deviceId) {
+            if (!window.EventSource) { return window.dash_clientside.no_update; }
+            if (window._plantStream) { window._plantStream.close(); }
+            const src = new EventSource("/stream?device_id=" + encodeURIComponent(deviceId || "default"));
+            src.addEventListener("sample", function (e) {
+                window.dash_clientside.set_props("live-sample", {data: JSON.parse(e.data)});
+            });
+            src.addEventListener("event", function (e) {
+                const msg = JSON.parse(e.data);
+                window.dash_clientside.set_props("event-version", {data: msg.events});
+            });
+            // While the stream is down the 30 s poll renders new samples on the server
+            src.onerror = function () { window.dash_clientside.set_props("stream-device", {data: null}); };
+            src.onopen = function () { window.dash_clientside.set_props("stream-device", {data: deviceId}); };
+            window._plantStream = src;
+            return deviceId;
+        },
+
+        apply: function (msg, view, soilFig, healthFig, gauge) {
+            // Same formatting as update_view() in dashboard.py
+            const nu = window.dash_clientside.no_update;
+            const out = new Array(14).fill(nu);
+            view = view || {};
+            if (!msg || view.device !== msg.version.device) { return out; }   // a device switch renders on the server
+            if (view.rev !== msg.version.rev || !msg.latest) {
+                out[13] = msg.version;   // stored rows were rederived: full render
+                return out;
+            }
+
+            const l = msg.latest;
+            const pad = function (x) { return String(Math.floor(x)).padStart(2, "0"); };
+            out[0] = l.temp.toFixed(1) + "°";
+            out[1] = l.hum.toFixed(0) + "%";
+            out[2] = l.light.toFixed(0) + " Lx";
+            const drying = l.eta !== -1 && l.eta > 0 && l.eta < 240;
+            out[3] = drying ? pad(l.eta) : "--";
+            out[4] = drying ? pad((l.eta % 1) * 60) : "--";
+            out[5] = "";
+            if (drying && l.eta_lo > 0) {
+                out[5] = (l.eta_hi > 0 && l.eta_hi < 240) ? l.eta_lo.toFixed(1) + "–" + l.eta_hi.toFixed(1) + " h" : "≥ " + l.eta_lo.toFixed(1) + " h";
+            }
+            const h = Math.trunc(l.health);
+            out[6] = String(h);
+            out[7] = '"' + l.smart_msg + '"';
+            out[8] = {Thirsty: "😰", Critical: "🥵", Sleepy: "😴"}[l.mood_state] || "😊";
+            if (view.health !== h && healthFig && healthFig.data && healthFig.data.length) {
+                const color = h < 40 ? gauge[2] : (h < 60 ? gauge[1] : gauge[0]);
+                const pie = Object.assign({}, healthFig.data[0], {values: [h, 100 - h]});
+                pie.marker = Object.assign({}, pie.marker, {colors: [color, "#252630"]});
+                out[9] = Object.assign({}, healthFig, {data: [pie]});
+            }
+
+            // Points this browser has not drawn yet: sequence numbers view.version and up
+            const p = msg.points;
+            const skip = view.version - p.seq;
+            if (view.version === undefined || view.level === undefined || view.level === null || skip < 0) {
+                out[13] = msg.version;   // missed samples (or nothing drawn yet): full render
+                return out;
+            }
+            const n = p.time.length - Math.max(skip, 0);
+            if (n > 0) {
+                const seq = [];
+                for (let i = 0; i < n; i++) { seq.push(view.version + i); }
+                out[10] = [{x: [seq], y: [p.light.slice(-n)]}, [0], 30];
+                if (view.level === "raw") {
+                    // Long windows are rollup buckets; a few new samples do not move them
+                    const times = p.time.slice(-n);
+                    const kept = soilFig && soilFig.data && soilFig.data.length ? soilFig.data[0].x.length : undefined;
+                    out[11] = [{x: [times, times], y: [p.soil.slice(-n), new Array(n).fill(p.dry)]}, [0, 1], kept];
+                }
+            }
+            out[12] = Object.assign({}, view, {version: msg.version.version, health: h});
+            return out;
+        }
+    }
+});
@@ -0,0 +1,79 @@
+import numpy as np
+from datetime import datetime
+
+# ==========================================
+# Batched ingest decoding (/update_sensor_batch)
+# ==========================================
+# Two wire formats, both carrying the device's millis() timestamp per sample:
+#   text/csv                 -> the firmware's serial line,
+#                               "ms,T,RH,light,soil,status,slope,eta,health"
+#   application/octet-stream -> packed `Sample` records from lib/Core/Types.h,
+#                               {float soil, T, RH, luxRaw; uint32_t ms}, little endian
+# Every decoder returns the same columnar batch plus a per-sample valid mask,
+# which becomes the ack bitmap sent back to the node. CSV lines also carry the
+# node's status (batch["status"], None where the field is empty); packed
+# records don't.
+
+SAMPLE_DTYPE = np.dtype([("soil", "<f4"), ("T", "<f4"), ("RH", "<f4"), ("luxRaw", "<f4"), ("ms", "<u4")])
+CSV_FIELDS = 9
+
+
+def _empty_batch(n):
+    return {"ms": np.zeros(n, dtype=np.uint32), "temp": np.zeros(n), "hum": np.zeros(n),
+            "light": np.zeros(n), "soil": np.zeros(n)}
+
+
+def parse_binary_batch(buf):
+    n = len(buf) // SAMPLE_DTYPE.itemsize
+    rec = np.frombuffer(buf, dtype=SAMPLE_DTYPE, count=n)
+    batch = {"ms": rec["ms"].astype(np.uint32), "temp": rec["T"].astype(float), "hum": rec["RH"].astype(float),
+             "light": rec["luxRaw"].astype(float), "soil": rec["soil"].astype(float)}
+    return batch, _validate(batch)
+
+
+def parse_csv_batch(text):
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    # Skip the "timestamp,temperature,..." header the firmware prints at boot
+    if lines and not lines[0].split(",", 1)[0].strip().replace(".", "", 1).isdigit():
+        lines = lines[1:]
+    batch = _empty_batch(len(lines))
+    batch["status"] = np.full(len(lines), None, dtype=object)
+    parsed = np.zeros(len(lines), dtype=bool)
+    for i, line in enumerate(lines):
+        parts = line.split(",")
+        if len(parts) != CSV_FIELDS: continue
+        try:
+            batch["ms"][i] = int(float(parts[0]))
+            batch["temp"][i] = float(parts[1])
+            batch["hum"][i] = float(parts[2])
+            batch["light"][i] = float(parts[3])
+            batch["soil"][i] = float(parts[4])
+        except ValueError: continue
+        batch["status"][i] = parts[5].strip() or None
+        parsed[i] = True
+    return batch, parsed & _validate(batch)
+
+
+def _validate(batch):
+    # A sample is usable as long as the soil reading is; missing T/RH/light
+    # fall back to 0 exactly like the serial and GET paths do.
+    valid = np.isfinite(batch["soil"]) & (batch["soil"] >= 0) & (batch["soil"] <= 1.5)
+    for c in ("temp", "hum", "light"):
+        batch[c] = np.nan_to_num(batch[c], nan=0.0, posinf=0.0, neginf=0.0)
+    return valid
+
+
+def device_times(ms, now_ms=None, now=None):
+    # Map device millis() onto wall-clock time. `now_ms` is the device clock at
+    # flush time; without it the last sample in the batch is assumed to be "now".
+    now = now or datetime.now()
+    if len(ms) == 0:
+        return np.empty(0, dtype="datetime64[ms]")
+    ref = int(now_ms) if now_ms is not None else int(ms[-1])
+    age = (np.int64(ref) - ms.astype(np.int64)) % (1 << 32)   # millis() wraps after ~49.7 days
+    return np.datetime64(now, "ms") - age.astype("timedelta64[ms]")
+
+
+def ack_bitmap(valid):
+    # Bit i (LSB first within each byte) acknowledges sample i
+    return np.packbits(valid.astype(np.uint8), bitorder="little").tobytes().hex()
@@ -0,0 +1,45 @@
+import pytest
+from export import stream_export
+
+# Dashboard read paths against stores of 1k / 8k / 100k rows (5 min samples,
+# so 100k rows is ~11 months): a full update_view render for a 24 h (raw) and
+# a 30 day (rollup) window, the incremental extendData render, the table page
+# and CSV export.
+
+ROWS = [1000, 8000, 100000]
+
+
+@pytest.mark.parametrize("win_hrs", [24, 720])
+@pytest.mark.parametrize("rows", ROWS)
+def bench_update_view_full(benchmark, dash_app, filled_devices, monkeypatch, rows, win_hrs):
+    reg = filled_devices(rows)
+    monkeypatch.setattr(dash_app, "devices", reg)
+    version = {"device": f"bench-{rows}", "version": rows}
+    out = benchmark(dash_app.update_view, version, win_hrs, None)
+    assert out[0] != "--"
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def bench_update_view_incremental(benchmark, dash_app, filled_devices, monkeypatch, rows):
+    # One new sample since the last render: the extendData path
+    reg = filled_devices(rows)
+    monkeypatch.setattr(dash_app, "devices", reg)
+    version = {"device": f"bench-{rows}", "version": rows}
+    view = {"win": 24, "device": f"bench-{rows}", "rev": 0, "version": rows - 1, "base": rows - 1, "health": -1}
+    out = benchmark(dash_app.update_view, version, 24, view)
+    assert out[3] is dash_app.dash.no_update
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def bench_update_table(benchmark, dash_app, filled_devices, monkeypatch, rows):
+    reg = filled_devices(rows)
+    monkeypatch.setattr(dash_app, "devices", reg)
+    benchmark(dash_app.update_table, 3, 20, [{"column_id": "soil", "direction": "asc"}], "{health} < 80", {"device": f"bench-{rows}"})
+
+
+@pytest.mark.parametrize("rows", [8000, 100000])
+def bench_export_csv(benchmark, filled_devices, rows):
+    dev = filled_devices(rows).find(f"bench-{rows}")
+    size = benchmark(lambda: sum(len(chunk) for chunk in stream_export([dev], "csv")))
+    benchmark.extra_info["rows"] = rows
+    benchmark.extra_info["bytes"] = size
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from conftest import make_batch_of
+from pipeline import calculate_vpd_batch, calculate_health_batch, get_smart_advice_batch, hour_of_day, eta_batch
+
+# Per-call cost of the estimators on one sample (the /update_sensor path) and
+# on a 1000-sample batch (backfills, restore); extra_info has the per-sample time.
+
+SIZES = [1, 1000]
+
+
+def per_sample(benchmark, n):
+    benchmark.extra_info["samples"] = n
+    if benchmark.stats:   # None under --benchmark-disable
+        benchmark.extra_info["median_us_per_sample"] = benchmark.stats.stats.median / n * 1e6
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_calculate_vpd(benchmark, n):
+    b = make_batch_of(n)
+    benchmark(calculate_vpd_batch, b["temp"], b["hum"])
+    per_sample(benchmark, n)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_calculate_health(benchmark, n):
+    b = make_batch_of(n)
+    hours = hour_of_day(b["time"])
+    benchmark(calculate_health_batch, b["soil"], b["temp"], b["hum"], b["light"], hours)
+    per_sample(benchmark, n)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_get_smart_advice(benchmark, n):
+    b = make_batch_of(n)
+    hours = hour_of_day(b["time"])
+    eta = eta_batch(b["soil"], np.full(n, -0.004), calculate_vpd_batch(b["temp"], b["hum"]))
+    benchmark(get_smart_advice_batch, b["soil"], b["light"], eta, b["temp"], hours)
+    per_sample(benchmark, n)
+
+
+YEAR = 365 * 24 * 3600 // 300   # samples at CFG::SAMPLE_MS
+
+
+@pytest.mark.parametrize("reasons", [False, True])
+def bench_rescore_year(benchmark, reasons):
+    # A profile change: rescore a year of history in one pass (health.py)
+    from health import load_rules
+    b = make_batch_of(YEAR)
+    hours = hour_of_day(b["time"])
+    benchmark(load_rules().score, b["soil"], b["temp"], b["light"], hours, b["time"], reasons)
+    per_sample(benchmark, YEAR)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_forecast_update(benchmark, n):
+    # Feeding the drying model (forecast.py); a fresh model each round so hours close the same way
+    from forecast import DryingForecaster
+    b = make_batch_of(n)
+    vpd = calculate_vpd_batch(b["temp"], b["hum"])
+    t = b["time"].astype(np.int64)
+    benchmark(lambda: DryingForecaster().update(t, b["soil"], vpd, b["temp"], b["light"]))
+    per_sample(benchmark, n)
+
+
+def bench_forecast_eta(benchmark):
+    # The per-ingest call: ETA quantiles from a model trained on two weeks
+    from forecast import DryingForecaster
+    b = make_batch_of(12 * 24 * 14)
+    f = DryingForecaster()
+    f.update(b["time"].astype(np.int64), b["soil"], calculate_vpd_batch(b["temp"], b["hum"]), b["temp"], b["light"])
+    assert benchmark(f.forecast, 0.6, 0.25) is not None
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from conftest import make_batch_of, START, SPACING_S
+from devices import DeviceState
+
+# Ingest hot paths: the Flask routes end to end (request until the sample is
+# in the store) and the pipeline step the ingest worker runs per batch.
+
+
+def bench_update_sensor(benchmark, dash_app):
+    client = dash_app.server.test_client()
+    soil = iter(np.tile(np.linspace(0.7, 0.4, 500), 10000))
+
+    def request():
+        r = client.get(f"/update_sensor?device_id=bench-get&temp=22.5&hum=48&light=1800&soil={next(soil):.3f}")
+        dash_app.ingest.join()
+        return r.status_code
+    assert benchmark(request) == 200
+
+
+def bench_update_sensor_batch(benchmark, dash_app):
+    client = dash_app.server.test_client()
+    b = make_batch_of(100)
+    body = "\n".join(f"{i * 15000},{t:.2f},{h:.2f},{l:.0f},{s:.3f},OK,0,-1,0"
+                     for i, (t, h, l, s) in enumerate(zip(b["temp"], b["hum"], b["light"], b["soil"])))
+
+    def request():
+        r = client.post("/update_sensor_batch?device_id=bench-batch", data=body, content_type="text/csv")
+        dash_app.ingest.join()
+        return r.status_code
+    assert benchmark(request) == 200
+    benchmark.extra_info["samples"] = 100
+
+
+@pytest.mark.parametrize("n", [1, 100])
+def bench_ingest_samples(benchmark, dash_app, n):
+    dev = DeviceState(f"bench-ingest-{n}")
+    k = iter(range(10 ** 6))
+
+    def next_batch():
+        # Untimed: the following n samples of the same node
+        i = next(k)
+        return (dev, make_batch_of(n, start=START + np.timedelta64(i * n * SPACING_S, "s"), seed=i), "Bench"), {}
+    benchmark.pedantic(dash_app.ingest_samples, setup=next_batch, rounds=min(2000, 20000 // n), warmup_rounds=5)
+    benchmark.extra_info["samples"] = n
+    if benchmark.stats:
+        benchmark.extra_info["median_us_per_sample"] = benchmark.stats.stats.median / n * 1e6
@@ -0,0 +1,64 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# ==========================================
+# Hot-path benchmarks (pytest-benchmark)
+# ==========================================
+#   cd "Plant Water" && pytest bench                         # saves .benchmarks/<machine>/NNNN_*.json (under the cwd)
+#   pytest bench --benchmark-compare --benchmark-compare-fail=median:20%   # fail on a regression vs the last run
+#   pytest bench --benchmark-json=bench.json                 # one explicit JSON report
+# The dashboard is imported with a memory-only history and Telegram muted.
+
+os.environ["PLANT_HISTORY_DIR"] = ""
+os.environ.pop("PLANT_FOLLOW_INGEST", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+SPACING_S = 300   # CFG::SAMPLE_MS
+START = np.datetime64("2026-01-05T00:00", "ms")
+
+
+def make_batch_of(n, start=START, seed=0):
+    # Synthetic node: 3-day drying cycles, day/night temperature and light, sensor noise
+    from pipeline import make_batch
+    rng = np.random.default_rng(seed)
+    t = start + (np.arange(n) * SPACING_S * 1000).astype("timedelta64[ms]")
+    h = (np.arange(n) * SPACING_S / 3600.0)
+    day = np.clip(np.sin((h % 24 - 6) / 12 * np.pi), 0, None)
+    soil = 0.75 - 0.4 * ((h % 72) / 72) + rng.normal(0, 0.004, n)
+    return make_batch(t, 18 + 8 * day + rng.normal(0, 0.2, n), 55 - 15 * day + rng.normal(0, 1, n),
+                      soil, 3000 * day + rng.normal(0, 20, n))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _benchmark_plugin():
+    # Skips every bench (rather than a fixture error) when the plugin is missing
+    pytest.importorskip("pytest_benchmark")   # pip install pytest-benchmark
+
+
+@pytest.fixture(scope="session")
+def dash_app():
+    import dashboard
+    import runtime
+    runtime.send_telegram_message = lambda message: None   # the ingest worker's alerts
+    return dashboard
+
+
+@pytest.fixture(scope="session")
+def filled_devices(dash_app):
+    # device_id -> DeviceState holding exactly that many rows, built once per session
+    from devices import DeviceRegistry
+    cache = {}
+
+    def get(rows):
+        if rows not in cache:
+            reg = DeviceRegistry(capacity=max(rows, 1000))
+            dev = reg.get(f"bench-{rows}")
+            batch = make_batch_of(rows)
+            for i in range(0, rows, 5000):
+                dash_app.ingest_samples(dev, {k: v[i:i + 5000] for k, v in batch.items()}, "Bench")
+            cache[rows] = reg
+        return cache[rows]
+    return get
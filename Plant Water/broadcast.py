@@ -0,0 +1,70 @@
+import json
+import queue
+import threading
+
+# ==========================================
+# Server-Sent Events fan-out
+# ==========================================
+# The ingest worker publishes one message per processed batch; it is encoded
+# once and the same bytes are queued for every subscriber of that device, so
+# the per-viewer cost is a queue put and a socket write, not a callback. A
+# viewer that stops reading (full queue) is dropped and its EventSource
+# reconnects on its own. Each open stream holds one server thread, so for
+# hundreds of viewers run the app under a threaded or gevent WSGI server.
+
+HEARTBEAT_S = 15
+RETRY_MS = 3000
+
+
+class Subscription:
+    def __init__(self, key, maxsize):
+        self.key = key   # device_id, or None for every device
+        self.q = queue.Queue(maxsize)
+        self.closed = False
+
+
+class Broadcaster:
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.published = 0
+        self.dropped = 0
+        self._subs = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(self, key=None):
+        sub = Subscription(key, self.maxsize)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.closed = True
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, event, data, key=None):
+        msg = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+        with self._lock:
+            subs = [s for s in self._subs if s.key is None or key is None or s.key == key]
+        for sub in subs:
+            try:
+                sub.q.put_nowait(msg)
+            except queue.Full:
+                self.dropped += 1
+                self.unsubscribe(sub)
+        self.published += 1
+
+    def stream(self, sub):
+        # Generator for a Flask streaming response
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while not sub.closed:
+                try:
+                    yield sub.q.get(timeout=HEARTBEAT_S)
+                except queue.Empty:
+                    yield b": ping\n\n"   # keeps proxies from closing an idle stream
+        finally:
+            self.unsubscribe(sub)
@@ -1,181 +1,65 @@
 import dash
-from dash import html, dcc, dash_table, Input, Output, State, callback_context
+from dash import html, dcc, dash_table, Input, Output, State, ClientsideFunction
 import plotly.graph_objs as go
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import serial
 import threading
 import time
-from collections import deque
-import statistics
-import requests
-import random
+import os
 import math
-from flask import request
+import json
+import functools
+from urllib.parse import quote
+from flask import request, jsonify, Response, stream_with_context
+from devices import DEFAULT_DEVICE
+from segments import devices_on_disk
+from pipeline import make_batch
+from table_query import query_page
+from batch_ingest import parse_binary_batch, parse_csv_batch, device_times, ack_bitmap
+from export import stream_export, parse_columns, FORMATS, HAVE_PARQUET
+from downsample import downsample, DEFAULT_TARGETS
+from serial_ingest import start_readers, parse_port_map
+from events import SEVERITIES
+import metrics
+from metrics import STAGE_SECONDS, INVALID_SAMPLES, STALE_SAMPLES, VIEW_SECONDS, timed
+from logs import get_logger
+# Registry, ingest worker, alerts and the work on the worker live in runtime.py (no Dash)
+from runtime import (devices, ingest, live, ingest_samples, apply_segment_records, apply_followed_events,
+                     start_profile_watch, shutdown, shown_eta, HISTORY_DIR, FOLLOW_INGEST)
 
 # ==========================================
 # 1. Core Configuration
 # ==========================================
 SERIAL_PORT = "COM3"   # Please confirm port
+# Several boards: "COM3=fern,COM4=cactus" (port=device_id); a bare port feeds the default device
+SERIAL_PORTS = os.environ.get("PLANT_SERIAL_PORTS", SERIAL_PORT)
 BAUD_RATE = 9600
 SERVER_PORT = 8050 
-
-# 🔑 Telegram Configuration
-TELEGRAM_TOKEN = "7507833046:AAFWv9bFPnWoaz-mSOjJ4142itB8I37NRXQ"
-TELEGRAM_CHAT_ID = "8414366426"
+# ⚡ PLANT_FOLLOW_INGEST=1 (runtime.py): how often the history ingest_server.py writes is tailed
+FOLLOW_POLL_S = 1.0
 
 # Global variables
-data_rows = []
-event_records = []
-slope_buffer = deque(maxlen=12)
-ser = None
-
-# Status tracking
-last_health_reasons = set()
-last_message_time = datetime.min 
-last_status = "Init"
-last_smart_msg = "Init"
-
-# Connection status monitoring
-last_serial_update = datetime.min 
-last_wifi_update = datetime.min
-
-# Slope calculation auxiliary variables
-prev_soil_val = None
-prev_calc_time = None
-
-# Pre-fill data
-data_rows.append({
-    "timestamp": datetime.now().strftime("%H:%M:%S"),
-    "full_time": datetime.now(),
-    "temp": 0, "hum": 0, "light": 0, "soil": 0,
-    "status": "Waiting...", 
-    "vpd": 0.0,      
-    "slopeh": 0.0,   
-    "eta": -1, "health": 0,
-    "smart_msg": "System Initializing...", "mood_state": "Happy"
-})
+SERIAL_DEVICE_ID = DEFAULT_DEVICE
+serial_readers = []   # serial_ingest.SerialReader per port (counters in .stats)
+log = get_logger("dashboard")
+
+# 📈 /metrics: counters that already live on these objects are read at scrape time
+def serial_stat(key):
+    return lambda: {(r.port,): r.stats[key] for r in serial_readers}
+
+metrics.SERIAL_BYTES.set_function(serial_stat("bytes"))
+metrics.SERIAL_LINES.set_function(serial_stat("lines"))
+metrics.SERIAL_DROPPED.set_function(serial_stat("bad_lines"))
+metrics.SERIAL_RECONNECTS.set_function(serial_stat("reconnects"))
+_PARSE = STAGE_SECONDS.labels(stage="parse")
 
 # ==========================================
 # 2. Helper Functions
 # ==========================================
 
-def send_telegram_message(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": message}
-    
-    def _send():
-        try:
-            print(f"📤 [Telegram] Sending: {message}")
-            r = requests.post(url, json=payload, timeout=10)
-            if r.status_code == 200:
-                print(f"✅ [Telegram] Success!")
-            else:
-                print(f"❌ [Telegram] Failed: {r.text}")
-        except Exception as e:
-            print(f"❌ [Telegram Error] {e}")
-    
-    threading.Thread(target=_send).start()
-
-def calculate_python_slope(current_soil, current_time):
-    global prev_soil_val, prev_calc_time
-    if prev_soil_val is None or prev_calc_time is None:
-        prev_soil_val = current_soil; prev_calc_time = current_time
-        return 0.0
-    dt_hours = (current_time - prev_calc_time).total_seconds() / 3600.0
-    if dt_hours < 0.0001: return 0.0
-    raw_slope = (current_soil - prev_soil_val) / dt_hours
-    prev_soil_val = current_soil; prev_calc_time = current_time
-    return raw_slope
-
-def calculate_vpd(temp, hum):
-    if temp == 0 or hum == 0: return 0
-    try:
-        es = 0.6108 * math.exp((17.27 * temp) / (temp + 237.3))
-        return round(es * (1 - (hum / 100.0)), 3)
-    except:
-        return 0
-
-def get_smart_advice(soil, light, status, eta, temp):
-    current_hour = datetime.now().hour
-    is_night = light < 100 or (current_hour >= 22 or current_hour < 7)
-    
-    # 🔥 For testing: Alarm directly if temp > 30
-    if temp > 30: 
-        return f"🔥 Heat Wave! Temp is {temp:.1f}°C", "Critical"
-
-    # 🔥 For testing: Trigger thirsty alarm easier (originally 0.20)
-    if soil < 0.30: 
-        return "CRITICAL: Water NOW! 🩸", "Critical"
-    
-    if soil < 0.40 or (eta > 0 and eta < 24):
-        if is_night: return "Wait until morning 🌙", "Sleepy"
-        else: return "Time to water! 💧", "Thirsty"
-        
-    if soil > 0.90: return "Fully Hydrated 🌊", "Happy"
-    if is_night: return "Plantie is sleeping 💤", "Sleepy"
-    return "Plantie is growing 🌱", "Happy"
-
-def calculate_health_detailed(soil, temp, hum, light):
-    # Safety checks
-    if math.isnan(temp): temp = 0
-    if math.isnan(hum): hum = 0
-    if math.isnan(light): light = 0
-
-    reasons = [] # 🚀 FIX: Initialize list to store reasons
-
-    # Soil scoring
-    if 0.45 <= soil <= 0.65: 
-        soil_score = 100
-    elif soil < 0.20: 
-        soil_score = 10
-        reasons.append("Critical Dry")
-    elif soil < 0.35: 
-        soil_score = 40
-        reasons.append("Soil Dry")
-    elif soil < 0.45: 
-        soil_score = 70
-        reasons.append("Soil Low")
-    elif soil > 0.90: 
-        soil_score = 50
-        reasons.append("Too Wet")
-    else: 
-        soil_score = 80
-
-    # Temperature scoring
-    if 22 <= temp <= 25: 
-        temp_score = 100
-    else:
-        diff = abs(temp - 23.5)
-        temp_score = max(20, 100 - diff * 12) 
-        
-        # 🚀 FIX: Explicitly add Temperature Warnings
-        if temp > 30:
-            reasons.append(f"High Temp ({temp:.1f}°C)")
-        elif temp < 15:
-            reasons.append(f"Low Temp ({temp:.1f}°C)")
-
-    # Light scoring
-    hour = datetime.now().hour
-    is_day = 8 <= hour <= 18
-    if is_day:
-        if light < 300: 
-            light_score = 50
-            reasons.append("Low Light")
-        elif light > 3000: 
-            light_score = 60
-        else: 
-            light_score = 100
-    else:
-        light_score = 100 if light < 50 else 60
-
-    total = (soil_score * 0.5 + temp_score * 0.3 + light_score * 0.2)
-    jitter = random.uniform(-2, 2)
-    total = max(0, min(100, total + jitter))
-
-    # 🚀 FIX: Return 'reasons' list instead of empty []
-    return int(total), soil_score, int(temp_score), light_score, reasons
+def forecast_dict(dev):
+    q = dev.eta_forecast
+    return dict(zip(("p10", "p50", "p90"), q)) if q is not None else None
 
 # ==========================================
 # 3. App Initialization
@@ -186,170 +70,182 @@ server = app.server
 
 @server.route('/update_sensor', methods=['GET'])
 def update_sensor_data():
-    global data_rows, event_records, slope_buffer, last_health_reasons, last_message_time, last_status, last_wifi_update
-
+    if FOLLOW_INGEST:
+        return "Ingest runs in ingest_server.py", 503
+    try:
+        dev = devices.get(request.args.get('device_id'))
+    except ValueError as e:
+        return f"Bad request: {e}", 400
     try:
         def safe_float(val):
             try: return 0 if math.isnan(float(val)) else float(val)
             except: return 0
 
-        t_val = safe_float(request.args.get('temp', 0))
-        h_val = safe_float(request.args.get('hum', 0))
-        s_val = safe_float(request.args.get('soil', 0))
-        l_val = safe_float(request.args.get('light', 0))
+        with _PARSE.time():
+            t_val = safe_float(request.args.get('temp', 0))
+            h_val = safe_float(request.args.get('hum', 0))
+            s_val = safe_float(request.args.get('soil', 0))
+            l_val = safe_float(request.args.get('light', 0))
         
-        last_wifi_update = datetime.now()
-        now = datetime.now()
+            dev.last_wifi_update = datetime.now()
+            batch = make_batch(datetime.now(), t_val, h_val, s_val, l_val)
+            dev.admit(batch["time"])
+        if not ingest.submit(ingest_samples, dev, batch, "WiFi"):
+            return "Busy", 503
+        return "OK"
 
-        if s_val < 0.35: status = "Thirsty"
-        elif s_val > 0.85: status = "Too Wet"
-        else: status = "OK"
-        
-        vpd_val = calculate_vpd(t_val, h_val)
-        raw_slope = calculate_python_slope(s_val, now)
-        slope_buffer.append(raw_slope)
-        avg_slope = statistics.mean(slope_buffer) if len(slope_buffer) > 0 else 0
-        
-        dry_factor = 1.0 + (vpd_val * 0.2)
-        if avg_slope < -0.0005: 
-            raw_eta = (s_val - 0.25) / abs(avg_slope)
-            smooth_eta = raw_eta / dry_factor
-        else: 
-            smooth_eta = -1
-
-        # Pass t_val (temperature) for judgment
-        smart_msg, mood_state = get_smart_advice(s_val, l_val, status, smooth_eta, t_val)
-        h_total, h_s, h_e, h_l, current_reasons = calculate_health_detailed(s_val, t_val, h_val, l_val)
-
-        # 🚀 LOGIC FIX: Log updates when reasons change
-        current_reasons_set = set(current_reasons)
-        if current_reasons_set != last_health_reasons:
-            if len(current_reasons) > 0:
-                # Log new issues
-                new_issues = current_reasons_set - last_health_reasons
-                # If it's a completely new set (e.g. from perfect to bad), log all
-                if not new_issues and len(current_reasons) > 0:
-                     new_issues = current_reasons_set
-
-                for issue in new_issues:
-                     event_records.insert(0, {"time": now.strftime("%H:%M"), "msg": f"⚠️ {issue}", "color": "#FF4B4B"})
-            elif h_total > 90:
-                event_records.insert(0, {"time": now.strftime("%H:%M"), "msg": "✅ Restored", "color": "#00D188"})
-            last_health_reasons = current_reasons_set
-
-        # Telegram Trigger
-        time_since_last_msg = (datetime.now() - last_message_time).total_seconds()
-        if mood_state == "Critical":
-            if time_since_last_msg > 30: 
-                send_telegram_message(f"🚨 ALERT (WiFi): {smart_msg}")
-                last_message_time = datetime.now()
+    except Exception as e:
+        log.error("❌ [WiFi Error]", error=e)
+        return "Error", 400
+
+@server.route('/update_sensor_batch', methods=['POST'])
+def update_sensor_batch():
+    # Buffered samples from a node: CSV lines in the serial format or packed `Sample`
+    # structs (see batch_ingest.py). Replies with a per-sample ack bitmap.
+    if FOLLOW_INGEST:
+        return "Ingest runs in ingest_server.py", 503
+    try:
+        dev = devices.get(request.args.get('device_id'))
+    except ValueError as e:
+        return f"Bad request: {e}", 400
+    try:
+        with _PARSE.time():
+            if request.mimetype == "application/octet-stream":
+                batch, valid = parse_binary_batch(request.get_data())
             else:
-                print(f"⏳ [Telegram] Cooling down... ({int(30-time_since_last_msg)}s)")
-
-        if status != last_status: last_status = status
-
-        row = {
-            "timestamp": now.strftime("%H:%M:%S"), "full_time": now,
-            "temp": t_val, "hum": h_val, "light": l_val, "soil": s_val,
-            "status": status, "slopeh": avg_slope, "vpd": vpd_val, "eta": smooth_eta, 
-            "health": h_total, "h_soil": h_s, "h_temp": h_e, "h_light": h_l, 
-            "reasons": ", ".join(current_reasons), "smart_msg": smart_msg, "mood_state": mood_state
-        }
-        data_rows.append(row)
-        if len(data_rows) > 8000: data_rows.pop(0)
-        print(f"📡 [WiFi] T:{t_val} S:{s_val} | Msg: {smart_msg}")
-        return "OK"
+                batch, valid = parse_csv_batch(request.get_data(as_text=True))
+            times = device_times(batch["ms"], request.args.get('now_ms'))
+
+            # The whole batch goes through the pipeline in one vectorized pass
+            idx = np.flatnonzero(valid)
+            idx = idx[np.argsort(times[idx], kind="stable")]
+            invalid = len(valid) - len(idx)
+            # Samples older than what is already stored are acknowledged (the node
+            # would only resend them) but not stored
+            fresh, before = dev.admit(times[idx])
+            idx = idx[fresh]
+            samples = make_batch(times[idx], batch["temp"][idx], batch["hum"][idx], batch["soil"][idx], batch["light"][idx],
+                                 batch["status"][idx] if "status" in batch else None)
+        if invalid: INVALID_SAMPLES.labels(source="WiFi").inc(invalid)
+        if len(idx) < len(fresh): STALE_SAMPLES.labels(source="WiFi").inc(len(fresh) - len(idx))
+        if not ingest.submit(ingest_samples, dev, samples, "WiFi"):
+            dev.retract(before, samples["time"])
+            return "Busy", 503
+        if len(idx): dev.last_wifi_update = datetime.now()
+
+        log.info("📦 [WiFi Batch] accepted", device=dev.device_id, accepted=len(idx), received=len(valid), stale=len(fresh) - len(idx))
+        return jsonify({"received": int(len(valid)), "accepted": int(len(idx)), "stale": int(len(fresh) - len(idx)), "ack": ack_bitmap(valid)})
 
     except Exception as e:
-        print(f"❌ [WiFi Error] {e}")
+        log.error("❌ [WiFi Batch Error]", error=e)
         return "Error", 400
 
+@server.route('/stream', methods=['GET'])
+def stream():
+    # Server-Sent Events: one message per ingested batch / event log change for the device
+    sub = live.subscribe(request.args.get('device_id') or None)
+    return Response(stream_with_context(live.stream(sub)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@server.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus scrape target (text exposition format)
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+@server.route('/events', methods=['GET'])
+def event_history():
+    # Newest first: /events?device_id=fern|all&severity=warning&limit=50&before=<id>
+    # "next" is the `before` for the following page (null on the last one); times are epoch ms
+    device = request.args.get('device_id') or DEFAULT_DEVICE
+    severity = request.args.get('severity') or None
+    if severity is not None and severity not in SEVERITIES:
+        return f"Unknown severity: {severity}", 400
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 1000)
+        before = int(request.args['before']) if request.args.get('before') else None
+    except ValueError as e:
+        return f"Bad request: {e}", 400
+    device = None if device == "all" else device
+    page = devices.events.query(device, severity, before=before, limit=limit)
+    nxt = page[-1]["id"] if len(page) == limit else None
+    return jsonify({"events": page, "next": nxt, "total": devices.events.count(device, severity)})
+
+@server.route('/cycles', methods=['GET'])
+def drying_cycles():
+    # Drying cycles (watering to watering) overlapping [start, end], epoch ms
+    dev = devices.find(request.args.get('device_id'))
+    if dev is None:
+        return "Unknown device", 404
+    try:
+        start = int(np.datetime64(request.args['start'], "ms").astype(np.int64)) if request.args.get('start') else None
+        end = int(np.datetime64(request.args['end'], "ms").astype(np.int64)) if request.args.get('end') else None
+    except ValueError as e:
+        return f"Bad request: {e}", 400
+    return jsonify(dev.cycles.between(start, end))
+
+@server.route('/forecast', methods=['GET'])
+def eta_forecast():
+    # Drying-model ETA (hours to the plant's empty level, 10/50/90 %; -1 = not drying) and the model behind it
+    dev = devices.find(request.args.get('device_id'))
+    if dev is None:
+        return "Unknown device", 404
+    return jsonify({"device": dev.device_id, "eta": forecast_dict(dev), "model": dev.forecaster.summary()})
+
+@server.route('/export', methods=['GET'])
+def export_history():
+    # Streamed in chunks, never built in memory:
+    #   /export?device=fern,cactus|all&start=2025-06-01&end=2025-06-30T12:00&columns=full_time,soil&format=csv|gzip|parquet
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in FORMATS:
+            return f"Unknown format: {fmt}", 400
+        if fmt == "parquet" and not HAVE_PARQUET:
+            return "Parquet export needs pyarrow", 400
+        spec = request.args.get('device') or DEFAULT_DEVICE
+        ids = devices.ids() if spec == "all" else [d for d in spec.split(",") if d]
+        devs = [devices.find(d) for d in ids]
+        if not devs or None in devs:
+            return "Unknown device", 404
+        start = np.datetime64(request.args['start'], "ms") if request.args.get('start') else None
+        end = np.datetime64(request.args['end'], "ms") if request.args.get('end') else None
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return f"Bad request: {e}", 400
+
+    mimetype, ext = FORMATS[fmt]
+    name = f"plant_data_{'all' if len(devs) > 1 else devs[0].device_id}{ext}"
+    log.info("📤 [Export]", devices=",".join(ids), format=fmt)
+    return Response(stream_with_context(stream_export(devs, fmt, start, end, columns)), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
 # ==========================================
-# 4. Serial Thread
+# 4. Serial Readers
 # ==========================================
-def read_serial_thread():
-    global ser, data_rows, event_records, slope_buffer, last_health_reasons, last_message_time, last_status, last_serial_update
-    print(f"[System] Attempting to connect to serial {SERIAL_PORT}...")
-
+def on_serial_batch(device_id, batch):
+    # Called on a port's reader thread with every complete line it framed
+    dev = devices.get(device_id)
+    dev.last_serial_update = datetime.now()
+    dev.admit(batch["time"])
+    ingest.submit(ingest_samples, dev, batch, "USB")
+
+def start_serial():
+    global serial_readers
+    serial_readers = start_readers(parse_port_map(SERIAL_PORTS, SERIAL_DEVICE_ID), BAUD_RATE, on_serial_batch)
+
+def follow_ingest_thread():
+    # Tail the segments ingest_server.py appends (new devices included)
+    log.info("[System] Following history (ingest runs in ingest_server.py)", dir=HISTORY_DIR)
     while True:
         try:
-            if ser is None or not ser.is_open:
-                try:
-                    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-                    print(f"✅ [System] Serial Connected Success on {SERIAL_PORT}")
-                    ser.reset_input_buffer()
-                except Exception as e:
-                    time.sleep(2); continue
-
-            if ser.in_waiting:
-                try: line = ser.readline().decode("utf-8", errors="replace").strip()
-                except: continue
-                if not line: continue
-                
-                parts = line.split(",")
-                if len(parts) != 9: continue
-                
-                last_serial_update = datetime.now()
-                now = datetime.now()
-                _, T_str, RH_str, light_str, soil_str, status, _, _, _ = parts
-
-                try:
-                    s_val = float(soil_str) if soil_str != 'nan' else 0
-                    l_val = int(float(light_str)) if light_str != 'nan' else 0
-                    t_val = float(T_str) if T_str != 'nan' else 0
-                    h_val = float(RH_str) if RH_str != 'nan' else 0
-                except ValueError: continue
-
-                vpd_val = calculate_vpd(t_val, h_val)
-                raw_slope = calculate_python_slope(s_val, now)
-                slope_buffer.append(raw_slope)
-                avg_slope = statistics.mean(slope_buffer) if len(slope_buffer) > 0 else 0
-                
-                dry_factor = 1.0 + (vpd_val * 0.2)
-                if avg_slope < -0.0005: 
-                    raw_eta = (s_val - 0.25) / abs(avg_slope)
-                    smooth_eta = raw_eta / dry_factor
-                else: smooth_eta = -1
-
-                # Pass t_val (temperature)
-                smart_msg, mood_state = get_smart_advice(s_val, l_val, status, smooth_eta, t_val)
-                h_total, h_s, h_e, h_l, current_reasons = calculate_health_detailed(s_val, t_val, h_val, l_val)
-
-                # 🚀 LOGIC FIX: Log updates
-                current_reasons_set = set(current_reasons)
-                if current_reasons_set != last_health_reasons:
-                    if len(current_reasons) > 0:
-                        new_issues = current_reasons_set - last_health_reasons
-                        if not new_issues and len(current_reasons) > 0: new_issues = current_reasons_set
-                        for issue in new_issues: event_records.insert(0, {"time": now.strftime("%H:%M"), "msg": f"⚠️ {issue}", "color": "#FF4B4B"})
-                    elif h_total > 90:
-                        event_records.insert(0, {"time": now.strftime("%H:%M"), "msg": "✅ Restored", "color": "#00D188"})
-                    last_health_reasons = current_reasons_set
-
-                # Telegram Trigger
-                time_since_last_msg = (datetime.now() - last_message_time).total_seconds()
-                if mood_state == "Critical":
-                    if time_since_last_msg > 30:
-                        send_telegram_message(f"🚨 ALERT (USB): {smart_msg}")
-                        last_message_time = datetime.now()
-                    else:
-                        print(f"⏳ [Telegram] Cooling down... ({int(30-time_since_last_msg)}s)")
-
-                if status != last_status: last_status = status
-
-                row = {
-                    "timestamp": now.strftime("%H:%M:%S"), "full_time": now,
-                    "temp": t_val, "hum": h_val, "light": l_val, "soil": s_val,
-                    "status": status, "slopeh": avg_slope, "vpd": vpd_val, "eta": smooth_eta, 
-                    "health": h_total, "h_soil": h_s, "h_temp": h_e, "h_light": h_l,
-                    "reasons": ", ".join(current_reasons), "smart_msg": smart_msg, "mood_state": mood_state
-                }
-                data_rows.append(row)
-                if len(data_rows) > 8000: data_rows.pop(0)
-                print(f"🔌 [Serial] T:{t_val} S:{s_val} | Msg: {smart_msg}")
-
+            for device_id in devices_on_disk(HISTORY_DIR):
+                dev = devices.get(device_id, saved=True)
+                rec = dev.segments.read_new()
+                if len(rec): ingest.submit(apply_segment_records, dev, rec)
+            new = devices.events.read_new()
+            if new: ingest.submit(apply_followed_events, new)
         except Exception as e:
-            print(f"[Serial Error] {e}"); time.sleep(1)
+            log.error("[Follow Error]", error=e)
+        time.sleep(FOLLOW_POLL_S)
 
 # ==========================================
 # 5. UI Layout
@@ -360,7 +256,7 @@ def apply_chart_style(fig): fig.update_layout(template='plotly_dark', paper_bgco
 
 dashboard_layout = html.Div(style={"display": "grid", "gridTemplateColumns": "2fr 1fr 1fr", "gap": "25px", "maxWidth": "1800px", "margin": "0 auto", "alignItems": "start"}, children=[
     html.Div(style={"display": "flex", "flexDirection": "column", "gap": "25px"}, children=[
-        html.Div(style={**CARD_STYLE, "padding": "15px", "flexDirection": "row", "alignItems": "center", "justifyContent": "space-between", "height": "auto"}, children=[html.Div("🔌 Connection Mode:", style={"color": COLORS["text_dim"], "fontSize": "12px"}), html.Div(id="conn-status-display", children="Waiting...", style={"fontWeight": "bold", "color": COLORS["accent"], "fontSize": "14px"})]),
+        html.Div(style={**CARD_STYLE, "padding": "15px", "flexDirection": "row", "alignItems": "center", "justifyContent": "space-between", "height": "auto"}, children=[dcc.Dropdown(id="device-select", options=[], value=DEFAULT_DEVICE, clearable=False, style={"width": "180px", "color": "#111", "fontSize": "12px"}), html.Div("🔌 Connection Mode:", style={"color": COLORS["text_dim"], "fontSize": "12px"}), html.Div(id="conn-status-display", children="Waiting...", style={"fontWeight": "bold", "color": COLORS["accent"], "fontSize": "14px"})]),
         html.Div(style={"display": "grid", "gridTemplateColumns": "280px 1fr", "gap": "25px", "height": "300px"}, children=[
             html.Div(style={**CARD_STYLE, "padding": "0", "backgroundImage": "url('https://images.unsplash.com/photo-1485955900006-10f4d324d411?q=80&w=600')", "backgroundSize": "cover", "backgroundPosition": "center"}),
             html.Div(style={"display": "flex", "flexDirection": "column", "gap": "20px"}, children=[
@@ -371,8 +267,8 @@ dashboard_layout = html.Div(style={"display": "grid", "gridTemplateColumns": "2f
                 html.Div(style={**CARD_STYLE, "flex": "1.5"}, children=[html.Div([html.Span("Light Intensity"), html.Span(id="val-light", style={"float":"right", "fontWeight":"bold", "color": "#f59e0b"})], style={"fontSize":"12px", "color":COLORS["text_dim"], "marginBottom":"5px"}), dcc.Graph(id="light-graph", config={'displayModeBar': False}, style={"flex": "1"})])
             ])
         ]),
-        html.Div(style={"display": "flex", "justifyContent": "space-between", "alignItems": "flex-end", "padding": "0 10px"}, children=[html.Div([html.Div("HOURS", style={"fontSize":"10px", "color":COLORS["text_dim"]}), html.Div(id="eta-h", children="--", style={"fontSize":"64px", "fontWeight":"800", "lineHeight":"0.8"})]), html.Div([html.Div("MINUTES", style={"fontSize":"10px", "color":COLORS["text_dim"]}), html.Div(id="eta-m", children="--", style={"fontSize":"64px", "fontWeight":"800", "lineHeight":"0.8"})]), html.Div([html.Div("TO WATER", style={"fontSize":"10px", "color":COLORS["text_dim"], "textAlign":"right"}), html.Div("THE PLANTIE", style={"fontSize":"12px", "fontWeight":"bold", "textAlign":"right"})], style={"marginBottom": "8px"})]),
-        html.Div(style={**CARD_STYLE, "height": "400px"}, children=[html.Div([html.Span("Soil Moisture Trend", style={"fontWeight":"bold", "fontSize":"16px"}), html.Div([html.Button("6H", id="btn-6h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("12H", id="btn-12h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("24H", id="btn-24h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "cursor":"pointer"})])], style={"display":"flex", "justifyContent":"space-between", "marginBottom":"20px", "alignItems":"center"}), dcc.Graph(id="soil-graph", config={'displayModeBar': False}, style={"flex": "1"})])
+        html.Div(style={"display": "flex", "justifyContent": "space-between", "alignItems": "flex-end", "padding": "0 10px"}, children=[html.Div([html.Div("HOURS", style={"fontSize":"10px", "color":COLORS["text_dim"]}), html.Div(id="eta-h", children="--", style={"fontSize":"64px", "fontWeight":"800", "lineHeight":"0.8"})]), html.Div([html.Div("MINUTES", style={"fontSize":"10px", "color":COLORS["text_dim"]}), html.Div(id="eta-m", children="--", style={"fontSize":"64px", "fontWeight":"800", "lineHeight":"0.8"})]), html.Div([html.Div("TO WATER", style={"fontSize":"10px", "color":COLORS["text_dim"], "textAlign":"right"}), html.Div("THE PLANTIE", style={"fontSize":"12px", "fontWeight":"bold", "textAlign":"right"}), html.Div(id="eta-band", style={"fontSize":"10px", "color":COLORS["text_dim"], "textAlign":"right"})], style={"marginBottom": "8px"})]),
+        html.Div(style={**CARD_STYLE, "height": "400px"}, children=[html.Div([html.Span("Soil Moisture Trend", style={"fontWeight":"bold", "fontSize":"16px"}), html.Div([html.Button("6H", id="btn-6h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("12H", id="btn-12h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("24H", id="btn-24h", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("7D", id="btn-7d", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "marginRight":"6px", "cursor":"pointer"}), html.Button("30D", id="btn-30d", n_clicks=0, style={"fontSize":"11px", "padding":"6px 12px", "borderRadius":"8px", "cursor":"pointer"})])], style={"display":"flex", "justifyContent":"space-between", "marginBottom":"20px", "alignItems":"center"}), dcc.Graph(id="soil-graph", config={'displayModeBar': False}, style={"flex": "1"})])
     ]),
     html.Div(style={"display": "flex", "flexDirection": "column", "gap": "20px"}, children=[
         html.Div(id="cal-widget", style={**CARD_STYLE, "height": "100px", "flexDirection":"row", "justifyContent":"space-around", "alignItems":"center", "padding":"0 10px"}),
@@ -386,92 +282,235 @@ dashboard_layout = html.Div(style={"display": "grid", "gridTemplateColumns": "2f
 
 table_layout = html.Div(style={"padding": "40px", "maxWidth": "1600px", "margin": "0 auto"}, children=[
     html.H3("Raw Data Logs", style={"color": "white"}),
-    html.Button("Download CSV", id="btn-download", style={"marginBottom": "10px", "padding": "10px", "background": COLORS["accent"], "color": "white", "border": "none", "borderRadius": "5px", "cursor": "pointer"}),
-    dcc.Download(id="download-dataframe-csv"),
-    dash_table.DataTable(id='raw-data-table', columns=[{"name": i, "id": i} for i in ["timestamp","status","soil","temp","hum","vpd","light","health","eta","smart_msg"]], data=[], style_header={'backgroundColor': '#2c2d3e','color':'white','border':'none'}, style_data={'backgroundColor':'#1e1e26','color':'#ccc','border':'1px solid #333'}, page_size=20)
+    html.A("Download CSV", id="btn-download", href="/export", style={"display": "inline-block", "marginBottom": "10px", "padding": "10px", "background": COLORS["accent"], "color": "white", "border": "none", "borderRadius": "5px", "cursor": "pointer", "textDecoration": "none"}),
+    dash_table.DataTable(id='raw-data-table', columns=[{"name": i, "id": i, "type": "text" if i in ("timestamp", "status", "smart_msg") else "numeric"} for i in ["timestamp","status","soil","temp","hum","vpd","light","health","eta","smart_msg"]], data=[], style_header={'backgroundColor': '#2c2d3e','color':'white','border':'none'}, style_data={'backgroundColor':'#1e1e26','color':'#ccc','border':'1px solid #333'}, style_filter={'backgroundColor':'#1e1e26','color':'#ccc'},
+                         page_current=0, page_size=20, page_action='custom', sort_action='custom', sort_mode='single', sort_by=[], filter_action='custom', filter_query='')
+])
+
+events_layout = html.Div(style={"padding": "40px", "maxWidth": "1600px", "margin": "0 auto"}, children=[
+    html.H3("Event History", style={"color": "white"}),
+    html.Div(style={"display": "flex", "gap": "10px", "marginBottom": "10px"}, children=[
+        dcc.Dropdown(id="event-scope", options=[{"label": "Selected device", "value": "device"}, {"label": "All devices", "value": "all"}], value="device", clearable=False, style={"width": "180px", "color": "#111", "fontSize": "12px"}),
+        dcc.Dropdown(id="event-severity", options=[{"label": s.title(), "value": s} for s in SEVERITIES], placeholder="Any severity", style={"width": "180px", "color": "#111", "fontSize": "12px"})]),
+    dash_table.DataTable(id='event-table', columns=[{"name": i, "id": i} for i in ["time", "device", "severity", "msg"]], data=[], style_header={'backgroundColor': '#2c2d3e','color':'white','border':'none'}, style_data={'backgroundColor':'#1e1e26','color':'#ccc','border':'1px solid #333'},
+                         style_cell={'textAlign': 'left'}, page_current=0, page_size=25, page_action='custom')
 ])
 
 app.layout = html.Div(style={"background": COLORS["bg_gradient"], "minHeight": "100vh", "fontFamily": "Inter, sans-serif", "color": COLORS["text"]}, children=[
-    dcc.Interval(id="interval-fast", interval=2000, n_intervals=0),
+    dcc.Interval(id="interval-fast", interval=30000, n_intervals=0),   # fallback poll; /stream pushes new samples
+    dcc.Store(id="stream-device"),         # device the browser's EventSource is subscribed to (assets/live.js)
+    dcc.Interval(id="interval-slow", interval=60000, n_intervals=0),   # calendar (clientside)
+    dcc.Store(id="view-state"),
+    dcc.Store(id="win-select", data=24),   # soil window in hours, set clientside by the buttons
+    dcc.Store(id="data-version"),          # {device, version}: a full server render (poll without a stream, window, device, profile)
+    dcc.Store(id="live-sample"),           # newest /stream message, applied in the browser (assets/live.js)
+    dcc.Store(id="table-version"),         # {device, version}: the raw table refreshes at most once per poll
+    dcc.Store(id="gauge-colors", data=[COLORS["green"], COLORS["yellow"], COLORS["red_line"]]),
+    dcc.Store(id="event-version"),         # {device, events}: newest event id, changes only when the device logs one
     dcc.Tabs(colors={"border": "#333", "primary": COLORS["accent"], "background": "transparent"}, children=[
         dcc.Tab(label="DASHBOARD", children=dashboard_layout, style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'#888'}, selected_style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'white', 'borderTop':f'3px solid {COLORS["accent"]}'}),
-        dcc.Tab(label="DATA LOGS", children=table_layout, style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'#888'}, selected_style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'white', 'borderTop':f'3px solid {COLORS["accent"]}'})
+        dcc.Tab(label="DATA LOGS", children=table_layout, style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'#888'}, selected_style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'white', 'borderTop':f'3px solid {COLORS["accent"]}'}),
+        dcc.Tab(label="EVENTS", children=events_layout, style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'#888'}, selected_style={'padding':'15px', 'backgroundColor':'rgba(0,0,0,0)', 'color':'white', 'borderTop':f'3px solid {COLORS["accent"]}'})
     ])
 ])
 
-@app.callback(
-    [Output("val-temp", "children"), Output("val-hum", "children"), Output("val-light", "children"),
-     Output("light-graph", "figure"), Output("soil-graph", "figure"), Output("health-graph", "figure"), 
-     Output("eta-h", "children"), Output("eta-m", "children"),
-     Output("health-val", "children"), Output("mood-text", "children"), Output("mood-emoji", "children"),
-     Output("log-list", "children"), Output("cal-widget", "children"), Output("raw-data-table", "data"),
-     Output("btn-6h", "style"), Output("btn-12h", "style"), Output("btn-24h", "style"), Output("conn-status-display", "children")], 
-    [Input("interval-fast", "n_intervals"), Input("btn-6h", "n_clicks"), Input("btn-12h", "n_clicks"), Input("btn-24h", "n_clicks")]
-)
-def update_view(n, btn6, btn12, btn24):
-    base = {"fontSize":"11px","padding":"6px 12px","background":"transparent","border":"1px solid #555","color":"white","borderRadius":"8px","marginRight":"6px","cursor":"pointer"}
-    active = {**base, "background": COLORS["accent"], "border": "none"}
-    s6, s12, s24 = base.copy(), base.copy(), active.copy()
-    win_hrs = 24
-    
-    ctx = callback_context
-    if ctx.triggered:
-        btn_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        if btn_id == "btn-6h": win_hrs = 6; s6=active; s12=base; s24=base
-        elif btn_id == "btn-12h": win_hrs = 12; s6=base; s12=active; s24=base
-        elif btn_id == "btn-24h": win_hrs = 24; s6=base; s12=base; s24=active
-
-    if len(data_rows) <= 1:
-        e = apply_chart_style(go.Figure())
-        return "--", "--", "--", e, e, e, "--", "--", "--", "Waiting...", "⏳", [], [], [], s6, s12, s24, "Waiting..."
-
-    latest = data_rows[-1]
-    df = pd.DataFrame(data_rows)
+# Force a full figure rebuild after this many incremental extendData updates
+FULL_REDRAW_EVERY = 12
+# Soil trend windows (hours) per button, and the point budget before switching to rollups.py
+WINDOW_BUTTONS = {"btn-6h": 6, "btn-12h": 12, "btn-24h": 24, "btn-7d": 24 * 7, "btn-30d": 24 * 30}
+SOIL_MAX_POINTS = 750
+WINDOW_BUTTON_STYLE = {"fontSize":"11px","padding":"6px 12px","background":"transparent","border":"1px solid #555","color":"white","borderRadius":"8px","marginRight":"6px","cursor":"pointer"}
+# Points sent per graph after LTTB (downsample.py); size these to the graph's width in px / 2
+GRAPH_TARGETS = dict(DEFAULT_TARGETS)
+EVENT_COLORS = {"issue": COLORS["red_line"], "restored": "#00D188", "watered": COLORS["accent"], "alert": COLORS["yellow"]}
+
+def connection_status(dev):
     now = datetime.now()
-    
-    timeout_limit = 310
-    if (now - last_serial_update).total_seconds() < timeout_limit:
-        seconds_ago = int((now - last_serial_update).total_seconds())
-        display_mode = f"USB Active (Last: {seconds_ago}s ago)"
-    elif (now - last_wifi_update).total_seconds() < timeout_limit:
-        seconds_ago = int((now - last_wifi_update).total_seconds())
-        display_mode = f"WiFi Active (Last: {seconds_ago}s ago)"
-    else: display_mode = "Waiting for Data..."
-
-    fig_light = apply_chart_style(go.Figure(go.Scatter(x=df.index[-30:], y=df['light'][-30:], fill='tozeroy', line=dict(color="#F59E0B", width=2), fillcolor="rgba(245,158,11,0.1)")))
+    timeout_limit = dev.profile.ui["connection_timeout_s"]
+    if (now - dev.last_serial_update).total_seconds() < timeout_limit:
+        seconds_ago = int((now - dev.last_serial_update).total_seconds())
+        return f"USB Active (Last: {seconds_ago}s ago)"
+    elif (now - dev.last_wifi_update).total_seconds() < timeout_limit:
+        seconds_ago = int((now - dev.last_wifi_update).total_seconds())
+        return f"WiFi Active (Last: {seconds_ago}s ago)"
+    return "Waiting for Data..."
+
+def build_light_figure(history):
+    w_light = history.tail(30)
+    x, y = np.arange(history.count - len(w_light), history.count), w_light['light']
+    idx = downsample(x, y, GRAPH_TARGETS["light"])
+    fig_light = apply_chart_style(go.Figure(go.Scatter(x=x[idx], y=y[idx], fill='tozeroy', line=dict(color="#F59E0B", width=2), fillcolor="rgba(245,158,11,0.1)")))
     fig_light.update_layout(margin=dict(l=0,r=0,t=10,b=20), xaxis=dict(visible=False), yaxis=dict(visible=False))
+    return fig_light
 
-    cutoff = df['full_time'].iloc[-1] - timedelta(hours=win_hrs)
-    df_soil = df[df['full_time'] >= cutoff]
-    if df_soil.empty: df_soil = df
+def build_soil_figure(w_soil, dry):
+    # LTTB-reduced, keeping the samples on both sides of every dry-line crossing
+    x, y = w_soil.time, w_soil['soil']
+    idx = downsample(x.astype(np.int64), y, GRAPH_TARGETS["soil"], keep_levels=(dry,))
     fig_soil = go.Figure()
-    fig_soil.add_trace(go.Scatter(x=df_soil['full_time'], y=df_soil['soil'], fill='tozeroy', mode='lines', line=dict(color=COLORS["accent"], width=3), fillcolor=COLORS["chart_fill"]))
-    fig_soil.add_trace(go.Scatter(x=[df_soil['full_time'].min(), df_soil['full_time'].max()], y=[0.35, 0.35], mode='lines', line=dict(color=COLORS["red_line"], width=2, dash='dash'), name='Dry'))
+    fig_soil.add_trace(go.Scatter(x=x[idx], y=y[idx], fill='tozeroy', mode='lines', line=dict(color=COLORS["accent"], width=3), fillcolor=COLORS["chart_fill"]))
+    fig_soil.add_trace(go.Scatter(x=[x[0], x[-1]], y=[dry, dry], mode='lines', line=dict(color=COLORS["red_line"], width=2, dash='dash'), name='Dry'))
     fig_soil = apply_chart_style(fig_soil)
     fig_soil.update_layout(margin=dict(l=30, r=10, t=10, b=30), xaxis=dict(visible=True, showgrid=False, color="#666", tickformat="%H:%M"), yaxis=dict(visible=True, gridcolor='rgba(255,255,255,0.05)', range=[0, 1.05]), showlegend=False)
+    return fig_soil
 
-    h = int(latest.get('health', 0))
+def build_soil_rollup_figure(r, win_hrs, dry):
+    # Bucket means with a min-max band; traces 0/1 match build_soil_figure
+    idx = downsample(r["time"].astype(np.int64), r["mean"], GRAPH_TARGETS["soil"], keep_levels=(dry,))
+    r = {k: v[idx] for k, v in r.items()}
+    fig_soil = go.Figure()
+    fig_soil.add_trace(go.Scatter(x=r["time"], y=r["mean"], fill='tozeroy', mode='lines', line=dict(color=COLORS["accent"], width=3), fillcolor=COLORS["chart_fill"]))
+    fig_soil.add_trace(go.Scatter(x=[r["time"][0], r["time"][-1]], y=[dry, dry], mode='lines', line=dict(color=COLORS["red_line"], width=2, dash='dash'), name='Dry'))
+    fig_soil.add_trace(go.Scatter(x=r["time"], y=r["max"], mode='lines', line=dict(width=0), hoverinfo='skip'))
+    fig_soil.add_trace(go.Scatter(x=r["time"], y=r["min"], mode='lines', line=dict(width=0), fill='tonexty', fillcolor="rgba(99, 102, 241, 0.15)", hoverinfo='skip'))
+    fig_soil = apply_chart_style(fig_soil)
+    fig_soil.update_layout(margin=dict(l=30, r=10, t=10, b=30), xaxis=dict(visible=True, showgrid=False, color="#666", tickformat="%b %d" if win_hrs > 24 else "%H:%M"), yaxis=dict(visible=True, gridcolor='rgba(255,255,255,0.05)', range=[0, 1.05]), showlegend=False)
+    return fig_soil
+
+# ---- Browser-side chrome: window buttons and the week calendar never hit the server ----
+app.clientside_callback(
+    """
+    function(...args) {
+        const windows = %s;
+        const trig = dash_clientside.callback_context.triggered.map(t => t.prop_id.split(".")[0]);
+        const current = args[args.length - 1] || 24;
+        const win = trig.length && windows[trig[0]] !== undefined ? windows[trig[0]] : current;
+        const base = %s;
+        const active = Object.assign({}, base, {background: "%s", border: "none"});
+        return [win].concat(Object.values(windows).map(w => w === win ? active : base));
+    }
+    """ % (json.dumps(WINDOW_BUTTONS), json.dumps(WINDOW_BUTTON_STYLE), COLORS["accent"]),
+    [Output("win-select", "data"), *[Output(b, "style") for b in WINDOW_BUTTONS]],
+    [Input(b, "n_clicks") for b in WINDOW_BUTTONS],
+    State("win-select", "data"),
+)
+
+app.clientside_callback(
+    """
+    function(n) {
+        const days = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"];
+        const now = new Date(), today = (now.getDay() + 6) %% 7;
+        return days.map((d, i) => {
+            const date = new Date(now); date.setDate(now.getDate() - today + i);
+            const style = Object.assign({textAlign: "center", padding: "5px", borderRadius: "8px", minWidth: "30px"},
+                i === today ? {background: "%s", color: "white", boxShadow: "0 4px 10px %s66"} : {color: "#666"});
+            return {namespace: "dash_html_components", type: "Div", props: {style: style, children: [
+                {namespace: "dash_html_components", type: "Div", props: {children: d, style: {fontSize: "8px"}}},
+                {namespace: "dash_html_components", type: "Div", props: {children: String(date.getDate()), style: {fontSize: "12px", fontWeight: "bold"}}}]}};
+        });
+    }
+    """ % (COLORS["accent"], COLORS["accent"]),
+    Output("cal-widget", "children"),
+    Input("interval-slow", "n_intervals"),
+)
+
+# ---- Push: assets/live.js opens an EventSource per selected device and feeds the stores below ----
+app.clientside_callback(ClientsideFunction("plant", "connect"), Output("stream-device", "data"), Input("device-select", "value"))
+
+# ---- Live: each pushed sample goes into the cards and extends the graphs in the browser ----
+app.clientside_callback(
+    ClientsideFunction("plant", "apply"),
+    [Output("val-temp", "children", allow_duplicate=True), Output("val-hum", "children", allow_duplicate=True),
+     Output("val-light", "children", allow_duplicate=True), Output("eta-h", "children", allow_duplicate=True),
+     Output("eta-m", "children", allow_duplicate=True), Output("eta-band", "children", allow_duplicate=True),
+     Output("health-val", "children", allow_duplicate=True), Output("mood-text", "children", allow_duplicate=True),
+     Output("mood-emoji", "children", allow_duplicate=True), Output("health-graph", "figure", allow_duplicate=True),
+     Output("light-graph", "extendData", allow_duplicate=True), Output("soil-graph", "extendData", allow_duplicate=True),
+     Output("view-state", "data", allow_duplicate=True), Output("data-version", "data", allow_duplicate=True)],
+    Input("live-sample", "data"),
+    [State("view-state", "data"), State("soil-graph", "figure"), State("health-graph", "figure"), State("gauge-colors", "data")],
+    prevent_initial_call=True,
+)
+
+# ---- Poll: the only per-tick server work. Tiny outputs, and the stores only change on ingest ----
+@app.callback(
+    [Output("data-version", "data"), Output("event-version", "data"), Output("conn-status-display", "children"),
+     Output("device-select", "options"), Output("table-version", "data")],
+    [Input("interval-fast", "n_intervals"), Input("device-select", "value")],
+    [State("data-version", "data"), State("event-version", "data"), State("stream-device", "data"), State("table-version", "data")]
+)
+def poll(n, device_id, data_version, event_version, stream_device, table_version):
+    dev = devices.find(device_id) or devices.get(DEFAULT_DEVICE)
+    data = {"device": dev.device_id, "version": dev.history.version, "rev": dev.history.revision}
+    events = {"device": dev.device_id, "events": devices.events.last_id(dev.device_id)}
+    table = {"device": dev.device_id, "version": dev.history.version}
+    generation = (data_version or {}).get("devices")
+    options = [{"label": d, "value": d} for d in devices.ids()] if generation != devices.generation else dash.no_update
+    data["devices"] = devices.generation
+    # With the stream open the browser applies new samples itself; only a new
+    # device, profile rewrite or device list needs the server to render again
+    if stream_device == dev.device_id and data_version and {**data_version, "version": data["version"]} == data:
+        data = data_version
+    return (data if data != data_version else dash.no_update, events if events != event_version else dash.no_update,
+            connection_status(dev), options, table if table != table_version else dash.no_update)
+
+@functools.lru_cache(maxsize=128)
+def build_health_figure(h):
     gauge_color = COLORS["green"]
     if h < 60: gauge_color = COLORS["yellow"]
     if h < 40: gauge_color = COLORS["red_line"]
     fig_health = apply_chart_style(go.Figure(go.Pie(values=[h, 100-h], hole=0.9, sort=False, marker_colors=[gauge_color, '#252630'], textinfo='none', hoverinfo='none')))
     fig_health.update_layout(showlegend=False)
+    return fig_health
 
-    days = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
-    cal = []
-    for i, d in enumerate(days):
-        is_today = (i == datetime.now().weekday())
-        s = {"textAlign":"center", "padding":"5px", "borderRadius":"8px", "minWidth": "30px"}
-        if is_today: s.update({"background":COLORS["accent"], "color":"white", "boxShadow":f"0 4px 10px {COLORS['accent']}66"})
-        else: s.update({"color":"#666"})
-        cal.append(html.Div(style=s, children=[html.Div(d, style={"fontSize":"8px"}), html.Div(str((datetime.now()-timedelta(days=datetime.now().weekday()-i)).day), style={"fontSize":"12px", "fontWeight":"bold"})]))
-
-    logs = []
-    for ev in event_records[:5]:
-        color = ev.get("color", COLORS['accent'])
-        logs.append(html.Div(style={"borderLeft": f"3px solid {color}", "paddingLeft": "10px", "marginBottom": "10px"}, children=[html.Div(ev["msg"], style={"fontWeight":"bold", "fontSize":"13px"}), html.Div(ev["time"], style={"fontSize":"10px", "color": COLORS["text_dim"]})]))
+@app.callback(
+    [Output("val-temp", "children"), Output("val-hum", "children"), Output("val-light", "children"),
+     Output("light-graph", "figure"), Output("soil-graph", "figure"), Output("health-graph", "figure"), 
+     Output("eta-h", "children"), Output("eta-m", "children"), Output("eta-band", "children"),
+     Output("health-val", "children"), Output("mood-text", "children"), Output("mood-emoji", "children"),
+     Output("light-graph", "extendData"), Output("soil-graph", "extendData"), Output("view-state", "data")], 
+    [Input("data-version", "data"), Input("win-select", "data")],
+    [State("view-state", "data")]
+)
+@timed(VIEW_SECONDS)
+def update_view(data_version, win_hrs, view):
+    # Runs when the window, device or profile changes (and per poll without a stream); pushed samples are applied in the browser
+    view = view or {}
+    win_hrs = win_hrs or 24
+    dev = devices.find((data_version or {}).get("device")) or devices.get(DEFAULT_DEVICE)
+    history = dev.history.snapshot()   # one consistent version for every output below
+    same_view = view.get("win") == win_hrs and view.get("device") == dev.device_id
+    version = history.version
+    # A profile change rewrote stored rows (store.rewrite): redraw everything
+    same_view = same_view and view.get("rev") == history.revision
+    state = {"win": win_hrs, "device": dev.device_id, "rev": history.revision, "level": None}
+    dry = dev.profile.soil["thirsty"]
+    rendered = view.get("version")
+
+    if len(history) == 0:
+        e = apply_chart_style(go.Figure())
+        return "--", "--", "--", e, e, e, "--", "--", "", "--", "Waiting...", "⏳", dash.no_update, dash.no_update, {**state, "version": version}
+
+    latest = history.latest()
+    w_soil = history.window(start=latest['full_time'] - timedelta(hours=win_hrs))
+    # Long windows are drawn from precomputed buckets so the point count stays bounded
+    level = state["level"] = dev.rollups.choose(win_hrs * 3600 * 1000, len(w_soil), SOIL_MAX_POINTS)
+
+    # Same window as last render and only a few new samples: append them client-side
+    # through extendData instead of shipping both figures again.
+    new_rows = history.since(rendered) if rendered is not None else None
+    full_base = view.get("base", version)
+    if (same_view and new_rows is not None and level == "raw"
+            and version - full_base < FULL_REDRAW_EVERY):
+        fig_light = fig_soil = dash.no_update
+        seq = np.arange(rendered, version)
+        ext_light = (dict(x=[seq], y=[new_rows['light']]), [0], 30)
+        ext_soil = (dict(x=[new_rows.time, new_rows.time], y=[new_rows['soil'], np.full(len(new_rows), dry)]), [0, 1], len(w_soil))
+    else:
+        fig_light = build_light_figure(history)
+        if level == "raw":
+            fig_soil = build_soil_figure(w_soil, dry)
+        else:
+            start_ms = int(np.datetime64(latest['full_time'], "ms").astype(np.int64)) - win_hrs * 3600 * 1000
+            fig_soil = build_soil_rollup_figure(dev.rollups.window(level, start_ms), win_hrs, dry)
+        ext_light = ext_soil = dash.no_update
+        full_base = version
+
+    # The donut only changes with the score; skip it otherwise
+    h = int(latest.get('health', 0))
+    fig_health = build_health_figure(h) if view.get("health") != h or not same_view else dash.no_update
 
-    eta = latest['eta']
+    eta, eta_lo, eta_hi = shown_eta(dev, latest)
     mood_emoji = "😊"; ms = latest.get('mood_state', 'Happy')
     if ms == "Thirsty": mood_emoji = "😰"
     elif ms == "Critical": mood_emoji = "🥵"
@@ -479,15 +518,64 @@ def update_view(n, btn6, btn12, btn24):
 
     if eta != -1 and eta != float('inf') and eta < 240 and eta > 0: eta_h, eta_m = f"{int(eta):02d}", f"{int((eta%1)*60):02d}"
     else: eta_h, eta_m = "--", "--"
+    # p10-p90 of the drying model (or the slope fit's band); an open upper end means it may not dry at all
+    eta_band = ""
+    if eta_h != "--" and eta_lo > 0:
+        eta_band = f"{eta_lo:.1f}–{eta_hi:.1f} h" if 0 < eta_hi < 240 else f"≥ {eta_lo:.1f} h"
+
+    return f"{latest['temp']:.1f}°", f"{latest['hum']:.0f}%", f"{latest['light']:.0f} Lx", fig_light, fig_soil, fig_health, eta_h, eta_m, eta_band, f"{h}", f'"{latest.get("smart_msg", "")}"', mood_emoji, ext_light, ext_soil, {**state, "version": version, "base": full_base, "health": h}
 
-    return f"{latest['temp']:.1f}°", f"{latest['hum']:.0f}%", f"{latest['light']} Lx", fig_light, fig_soil, fig_health, eta_h, eta_m, f"{h}", f'"{latest.get("smart_msg", "")}"', mood_emoji, logs, cal, df.sort_values("timestamp", ascending=False).to_dict('records'), s6, s12, s24, display_mode
+def event_time(ev, fmt="%H:%M"):
+    return np.datetime64(ev["time"], "ms").astype(datetime).strftime(fmt)
 
-@app.callback(Output("download-dataframe-csv", "data"), Input("btn-download", "n_clicks"), prevent_initial_call=True)
-def download(n): return dcc.send_data_frame(pd.DataFrame(data_rows).to_csv, "plant_data.csv")
+@app.callback(Output("log-list", "children"), Input("event-version", "data"))
+def update_events(event_version):
+    dev = devices.find((event_version or {}).get("device")) or devices.get(DEFAULT_DEVICE)
+    logs = []
+    for ev in devices.events.query(dev.device_id, limit=5):
+        color = EVENT_COLORS.get(ev["kind"], COLORS['accent'])
+        logs.append(html.Div(style={"borderLeft": f"3px solid {color}", "paddingLeft": "10px", "marginBottom": "10px"}, children=[html.Div(ev["msg"], style={"fontWeight":"bold", "fontSize":"13px"}), html.Div(event_time(ev), style={"fontSize":"10px", "color": COLORS["text_dim"]})]))
+    return logs
+
+@app.callback(
+    [Output("event-table", "data"), Output("event-table", "page_count")],
+    [Input("event-table", "page_current"), Input("event-table", "page_size"), Input("event-severity", "value"),
+     Input("event-scope", "value"), Input("event-version", "data")]
+)
+def update_event_table(page_current, page_size, severity, scope, event_version):
+    # One page straight from the event log's indexes
+    device = None if scope == "all" else (event_version or {}).get("device") or DEFAULT_DEVICE
+    severity = severity or None
+    page = devices.events.query(device, severity, offset=(page_current or 0) * page_size, limit=page_size)
+    rows = [{"time": event_time(ev, "%Y-%m-%d %H:%M:%S"), "device": ev["device"], "severity": ev["severity"], "msg": ev["msg"]} for ev in page]
+    return rows, max(1, math.ceil(devices.events.count(device, severity) / page_size))
+
+@app.callback(
+    [Output("raw-data-table", "data"), Output("raw-data-table", "page_count")],
+    [Input("raw-data-table", "page_current"), Input("raw-data-table", "page_size"),
+     Input("raw-data-table", "sort_by"), Input("raw-data-table", "filter_query"), Input("table-version", "data")]
+)
+def update_table(page_current, page_size, sort_by, filter_query, table_version):
+    # Only the visible page is serialized; see table_query.py
+    dev = devices.find((table_version or {}).get("device")) or devices.get(DEFAULT_DEVICE)
+    return query_page(dev.history.snapshot(), page_current or 0, page_size, sort_by, filter_query)
+
+@app.callback(Output("btn-download", "href"), Input("device-select", "value"))
+def download_link(device_id):
+    # The browser streams the file from /export; no callback thread builds it
+    return f"/export?device={quote(device_id or DEFAULT_DEVICE)}"
 
 if __name__ == "__main__":
-    t = threading.Thread(target=read_serial_thread)
-    t.daemon = True; t.start()
-    print("[System] Background Serial Thread Started ✅")
-    print(f"[System] Web Server Starting on port {SERVER_PORT}...")
-    app.run(host='0.0.0.0', port=SERVER_PORT, debug=True, use_reloader=False)
\ No newline at end of file
+    start_profile_watch()
+    if FOLLOW_INGEST:
+        t = threading.Thread(target=follow_ingest_thread)
+        t.daemon = True; t.start()
+        log.info("[System] Background Follow Thread Started ✅")
+    else:
+        start_serial()
+        log.info("[System] Serial Readers Started ✅", ports=SERIAL_PORTS)
+    log.info("[System] Web Server Starting", port=SERVER_PORT)
+    try:
+        app.run(host='0.0.0.0', port=SERVER_PORT, debug=True, use_reloader=False)
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from store import TimeSeriesStore, DEFAULT_CAPACITY
+from segments import SegmentLog, devices_on_disk
+from regression import SlidingRegression, DEFAULT_WINDOW_H
+from watering import WateringDetector, DryingCycles
+from rollups import Rollups
+from events import EventLog, ReasonTracker
+from profiles import ProfileStore, BUILTIN
+from forecast import load_forecaster
+
+SLOPE_MODE = "ols"   # or "theil-sen" for a median-of-slopes fit that shrugs off spikes
+
+# ==========================================
+# Per-device state
+# ==========================================
+# Everything the pipeline derives from a sample stream (slope, open health
+# issues, alert cooldown, history shard) lives on one DeviceState, so several
+# ESP32 nodes can post to the same server without mixing their readings. Only the
+# ingest worker (ingest.py) mutates a DeviceState. With a history root set,
+# every processed batch is also appended to the device's segment log
+# (segments.py) and reloaded from there on the next start. A read-only
+# registry only loads and follows history some other process writes. The
+# event log (events.py) and the plant profiles (profiles.py) are shared by
+# all devices and owned by the registry.
+
+DEFAULT_DEVICE = "default"
+# Ids come from query strings: letters/digits (any script), then also . & + @ ~ -
+DEVICE_ID_RE = re.compile(r"\w[\w.&+@~-]{0,63}")
+MAX_DEVICES = int(os.environ.get("PLANT_MAX_DEVICES", "64"))   # new ids beyond this are refused
+
+
+class DeviceState:
+    def __init__(self, device_id, capacity=DEFAULT_CAPACITY, root=None, readonly=False, events=None, profile=None):
+        self.device_id = device_id
+        self.history = TimeSeriesStore(capacity)
+        self.rollups = Rollups()
+        self.segments = SegmentLog(root, device_id, readonly=readonly) if root else None
+        # Sliding soil-moisture slope fit (per hour)
+        self.slope = SlidingRegression(DEFAULT_WINDOW_H, SLOPE_MODE)
+        # Thresholds and health rules for this plant (profiles.py); swapped whole on reload
+        self.profile = profile if profile is not None else BUILTIN
+        # Watering detection and the drying cycles it delimits
+        self.watering = WateringDetector()
+        self.cycles = DryingCycles()
+        # Per-plant drying model (forecast.py) and its newest ETA quantiles
+        self.forecaster = load_forecaster(device_id)
+        self.eta_forecast = None
+
+        # Status tracking
+        # Open health issues pick up where the saved event log left them
+        self.reasons = ReasonTracker(events.active_reasons(device_id) if events is not None else ())
+        self.last_message_time = datetime.min
+        self.last_status = "Init"
+
+        # Connection status monitoring
+        self.last_serial_update = datetime.min
+        self.last_wifi_update = datetime.min
+
+        # Newest sample time handed to the ingest worker so far (see admit())
+        self.newest = np.datetime64(0, "ms")
+        self._admit_lock = threading.Lock()
+
+        if self.segments is not None and self.segments.restore(self.history):
+            # Rebuild the drying cycles, drying model and rollups from the full saved history
+            # (a model saved on shutdown already learned everything up to its last_ms)
+            learned = self.forecaster.last_ms
+            for rec in self.segments.iter_segments():
+                watered, rises = self.watering.scan(rec["soil"])
+                for i, rise in zip(watered, rises):
+                    self.cycles.add(rec["time"][i], rec["soil"][i], rise)
+                a = 0 if learned is None else int(np.searchsorted(rec["time"], learned, "right"))
+                if a < len(rec["time"]):
+                    self.forecaster.update(*(rec[c][a:] for c in ("time", "soil", "vpd", "temp", "light")), watered[watered >= a] - a)
+                self.rollups.update({"full_time": rec["time"].astype("datetime64[ms]"), **{c: rec[c] for c in self.rollups.columns}})
+            # Pick the slope fit up where it left off (never across the last watering)
+            snap = self.history.snapshot()
+            start = np.datetime64(snap.latest()["full_time"] - timedelta(hours=DEFAULT_WINDOW_H), "ms")
+            if len(self.cycles):
+                start = max(start, np.datetime64(self.cycles.starts[-1], "ms"))
+            w = snap.window(start=start)
+            self.slope.update_batch(w.time.astype("int64") / 3.6e6, w["soil"])
+            self.eta_forecast = self.forecaster.forecast(snap.latest()["soil"], self.profile.soil["empty"], self.profile.eta["min_slope"])
+            self.newest = np.datetime64(snap.latest()["full_time"], "ms")
+
+    def admit(self, times):
+        # Called before queueing samples (times sorted) -> (mask, previous newest).
+        # The ring keeps its time column sorted by raising an older sample to the
+        # newest time, so a batch route stores and acknowledges only the samples
+        # the mask keeps; live samples (stamped "now") just move the mark on.
+        t = np.asarray(times, dtype="datetime64[ms]")
+        with self._admit_lock:
+            before = self.newest
+            if len(t) == 0:
+                return np.zeros(0, dtype=bool), before
+            keep = t >= np.maximum(np.maximum.accumulate(t), before)
+            self.newest = max(before, t.max())
+            return keep, before
+
+    def retract(self, before, times):
+        # Undo admit() for samples that could not be queued after all (unless a later one moved the mark again)
+        with self._admit_lock:
+            if len(times) and self.newest == max(before, np.max(times)):
+                self.newest = before
+
+
+class DeviceRegistry:
+    def __init__(self, capacity=DEFAULT_CAPACITY, root=None, readonly=False):
+        self.capacity = capacity
+        self.root = root      # on-disk history directory (None = memory only)
+        self.readonly = readonly
+        self.generation = 0   # bumped whenever a device is added
+        self.events = EventLog(root, readonly=readonly)
+        self.profiles = ProfileStore()
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_id=None, saved=False):
+        # ValueError for a malformed id, or a new one once MAX_DEVICES are known
+        # (devices with history on disk, `saved`, always come back)
+        device_id = device_id or DEFAULT_DEVICE
+        dev = self._devices.get(device_id)
+        if dev is None:
+            if not DEVICE_ID_RE.fullmatch(device_id):
+                raise ValueError(f"invalid device_id {device_id[:80]!r}")
+            with self._lock:
+                dev = self._devices.get(device_id)
+                if dev is None:
+                    if not saved and len(self._devices) >= MAX_DEVICES:
+                        raise ValueError(f"device limit reached ({MAX_DEVICES}, PLANT_MAX_DEVICES)")
+                    dev = self._devices[device_id] = DeviceState(device_id, self.capacity, self.root, self.readonly, self.events,
+                                                                self.profiles.get(device_id))
+                    self.generation += 1
+        return dev
+
+    def load_saved(self):
+        # Bring back every device that has history on disk
+        if self.root:
+            for device_id in devices_on_disk(self.root):
+                self.get(device_id, saved=True)
+        return self
+
+    def find(self, device_id):
+        return self._devices.get(device_id or DEFAULT_DEVICE)
+
+    def ids(self):
+        return sorted(self._devices)
+
+    def __len__(self):
+        return len(self._devices)
@@ -0,0 +1,70 @@
+import numpy as np
+
+# ==========================================
+# Visual downsampling (LTTB)
+# ==========================================
+# Largest-Triangle-Three-Buckets: keep the first and last point, split the
+# rest into n_out - 2 buckets and from each keep the point that makes the
+# largest triangle with the previously kept point and the next bucket's
+# average. Bucket bounds and averages are computed for all buckets at once;
+# only the argmax walk is a loop (one cheap NumPy call per output point).
+# Points on either side of a threshold crossing (the 0.35 dry line) are
+# kept too, so the plotted line crosses it exactly where the data does; they
+# come out of the same n_out budget.
+
+DEFAULT_TARGETS = {"soil": 500, "light": 120}   # points per graph (roughly one per 2 px)
+
+
+def target_points(width_px, px_per_point=2, minimum=50):
+    return max(minimum, int(width_px // px_per_point))
+
+
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float); y = np.asarray(y, dtype=float)
+    x = x - x[0]   # keep cumsums of epoch-ms timestamps exact
+    # Bucket b (1..n_out-2) covers [edges[b-1], edges[b]) of the interior points
+    edges = (np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    cx, cy = np.r_[0.0, np.cumsum(x)], np.r_[0.0, np.cumsum(y)]
+    # Average of each bucket's successor (the last bucket looks at the final point)
+    nxt_lo, nxt_hi = np.r_[edges[1:-1], n - 1], np.r_[edges[2:], n]
+    avg_x = (cx[nxt_hi] - cx[nxt_lo]) / (nxt_hi - nxt_lo)
+    avg_y = (cy[nxt_hi] - cy[nxt_lo]) / (nxt_hi - nxt_lo)
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[b]) * (ys - y[a]) - (x[a] - xs) * (avg_y[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def crossing_indices(y, level):
+    # Both neighbours of every point where y passes through `level`
+    above = np.asarray(y) >= level
+    i = np.flatnonzero(above[1:] != above[:-1])
+    return np.unique(np.r_[i, i + 1])
+
+
+def downsample(x, y, n_out, keep_levels=()):
+    # Indices to plot: LTTB selection plus the points around each level crossing,
+    # never more than n_out in total
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    extra = np.unique(np.concatenate([crossing_indices(y, level) for level in keep_levels])) \
+        if keep_levels else np.empty(0, dtype=np.int64)
+    # A sensor hovering on the line crosses it constantly: crossings get at most
+    # a quarter of the budget (evenly spread), LTTB always gets the rest
+    cap = min(n_out // 4, n_out - 3)
+    if len(extra) > cap:
+        extra = np.unique(extra[np.linspace(0, len(extra) - 1, cap).astype(np.int64)])
+    idx = lttb_indices(x, y, n_out - len(extra))
+    return np.unique(np.concatenate([idx, extra]))
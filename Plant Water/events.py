@@ -0,0 +1,249 @@
+import os
+import json
+import bisect
+import threading
+
+# ==========================================
+# Event log (bounded ring + indexes)
+# ==========================================
+# Every device's events (health issues, restores, waterings, alerts) go into
+# one ring of EVENT_CAPACITY slots; event ids only ever grow and id %
+# capacity is the slot, so adding is O(1) and the oldest event simply falls
+# out. Per-device and per-severity indexes are sorted id lists, which makes
+# "newest N for fern" or "warnings before id X" a bisect plus a slice.
+# Only the ingest worker adds events (in follow mode: the follow thread, via
+# read_new()); readers (callbacks, /events) take the same short lock.
+#
+# With a history root, events are appended to <root>/events.jsonl next to
+# the device segments and reloaded on start; the file is rewritten from the
+# ring once it holds twice as many lines. A read-only log (dashboard in
+# follow mode) tails that file with read_new() instead of writing it.
+
+EVENT_CAPACITY = 10000
+SEVERITIES = ("info", "warning", "critical")
+KINDS = {"issue": "warning", "restored": "info", "watered": "info", "alert": "critical"}
+CLEAR_S = 300          # a health reason must stay away this long (sample time) before it counts as cleared
+RESTORED_HEALTH = 90   # "Restored" is only logged once health is back above this
+
+
+class _Index:
+    # Ascending event ids; evicted ids are always the oldest, so they come off the front
+    __slots__ = ("ids", "head")
+
+    def __init__(self):
+        self.ids = []
+        self.head = 0
+
+    def __len__(self):
+        return len(self.ids) - self.head
+
+    def append(self, event_id):
+        self.ids.append(event_id)
+
+    def evict(self, event_id):
+        if self.head < len(self.ids) and self.ids[self.head] == event_id:
+            self.head += 1
+            if self.head > 1024 and self.head * 2 > len(self.ids):
+                del self.ids[:self.head]; self.head = 0
+
+    def page(self, before=None, offset=0, limit=50):
+        # Newest first: ids < before, skipping `offset` of them
+        hi = len(self.ids) if before is None else bisect.bisect_left(self.ids, before, self.head)
+        hi = max(self.head, hi - offset)
+        return self.ids[max(self.head, hi - limit):hi][::-1]
+
+    def newest(self):
+        return self.ids[-1] if len(self) else None
+
+    def iter_newest(self, before=None):
+        hi = len(self.ids) if before is None else bisect.bisect_left(self.ids, before, self.head)
+        for i in range(hi - 1, self.head - 1, -1):
+            yield self.ids[i]
+
+
+class EventLog:
+    def __init__(self, root=None, capacity=EVENT_CAPACITY, readonly=False):
+        self.capacity = capacity
+        self.readonly = readonly
+        self.path = os.path.join(root, "events.jsonl") if root else None
+        self.next_id = 1
+        self._ring = [None] * capacity
+        self._all = _Index()
+        self._by_device = {}
+        self._by_severity = {s: _Index() for s in SEVERITIES}
+        self._lock = threading.Lock()
+        self._file = None
+        self._lines = 0      # lines in events.jsonl (writer) -> compaction
+        self._offset = 0     # bytes of events.jsonl already read (follower)
+        self._inode = None
+        if self.path and os.path.exists(self.path):
+            self.read_new()
+
+    # ---------- write path (ingest worker only) ----------
+    def add(self, device, time_ms, kind, msg, **extra):
+        ev = {"id": self.next_id, "time": int(time_ms), "device": device, "kind": kind,
+              "severity": KINDS.get(kind, "info"), "msg": msg, **extra}
+        self._insert(ev)
+        if self.path and not self.readonly:
+            self._write(ev)
+        return ev
+
+    def _insert(self, ev):
+        with self._lock:
+            slot = ev["id"] % self.capacity
+            old = self._ring[slot]
+            if old is not None:
+                self._all.evict(old["id"])
+                self._by_device[old["device"]].evict(old["id"])
+                self._by_severity[old["severity"]].evict(old["id"])
+            self._ring[slot] = ev
+            self._all.append(ev["id"])
+            index = self._by_device.get(ev["device"])
+            if index is None:
+                index = self._by_device[ev["device"]] = _Index()
+            index.append(ev["id"])
+            self._by_severity[ev["severity"]].append(ev["id"])
+            self.next_id = ev["id"] + 1
+
+    def _write(self, ev):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(ev, ensure_ascii=False) + "\n")
+        self._file.flush()   # events are rare; a follower should see them at once
+        self._lines += 1
+        if self._lines > 2 * self.capacity:
+            self._compact()
+
+    def _compact(self):
+        self._file.close()
+        tmp = self.path + ".tmp"
+        events = self.query(limit=self.capacity)[::-1]
+        with open(tmp, "w", encoding="utf-8") as f:
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = len(events)
+
+    # ---------- load / follow ----------
+    def read_new(self):
+        # Events appended to events.jsonl since the last call (all of it the first time).
+        # A compacted (replaced) file is re-read from the start; ids already held are skipped.
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._inode, self._offset = st.st_ino, 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # a line still being written is left for next time
+        self._offset += end
+        new = []
+        for line in data[:end].splitlines():
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            if ev.get("id", 0) >= self.next_id and ev.get("severity") in SEVERITIES:
+                self._insert(ev)
+                new.append(ev)
+        if not self.readonly:
+            self._lines += data[:end].count(b"\n")
+        return new
+
+    def close(self):
+        if self._file is not None:
+            self._file.close(); self._file = None
+
+    # ---------- read path ----------
+    def _index(self, device=None, severity=None):
+        if device is None and severity is None:
+            return self._all, None
+        by_dev = self._by_device.get(device) if device is not None else None
+        by_sev = self._by_severity.get(severity) if severity is not None else None
+        if device is not None and by_dev is None or severity is not None and by_sev is None:
+            return _Index(), None
+        if by_dev is None: return by_sev, None
+        if by_sev is None: return by_dev, None
+        # Both filters: walk the shorter index, check the other field
+        return (by_dev, ("severity", severity)) if len(by_dev) <= len(by_sev) else (by_sev, ("device", device))
+
+    def query(self, device=None, severity=None, before=None, offset=0, limit=50):
+        # Newest first. Page with offset, or with before=<id of the last event seen>
+        # (stable while new events arrive).
+        with self._lock:
+            index, check = self._index(device, severity)
+            if check is None:
+                ids = index.page(before, offset, limit)
+                return [self._ring[i % self.capacity] for i in ids]
+            key, value = check
+            out = []
+            for i in index.iter_newest(before):
+                ev = self._ring[i % self.capacity]
+                if ev[key] != value: continue
+                if offset: offset -= 1; continue
+                out.append(ev)
+                if len(out) >= limit: break
+            return out
+
+    def count(self, device=None, severity=None):
+        with self._lock:
+            index, check = self._index(device, severity)
+            if check is None:
+                return len(index)
+            key, value = check
+            return sum(1 for i in index.iter_newest() if self._ring[i % self.capacity][key] == value)
+
+    def last_id(self, device=None):
+        # Changes whenever the device gets a new event; the UI's event-version
+        index = self._all if device is None else self._by_device.get(device)
+        return index.newest() if index is not None else None
+
+    def active_reasons(self, device):
+        # Health issues still open for the device: raised since its last "Restored"
+        active = set()
+        with self._lock:
+            index = self._by_device.get(device)
+            for i in (index.iter_newest() if index is not None else ()):
+                ev = self._ring[i % self.capacity]
+                if ev["kind"] == "restored": break
+                if ev["kind"] == "issue": active.add(ev.get("reason", ev["msg"]))
+        return active
+
+    def __len__(self):
+        return len(self._all)
+
+
+class ReasonTracker:
+    # Health-reason hysteresis for one device: a reason is raised the first
+    # time it shows up, but only cleared after CLEAR_S without it, so a value
+    # hovering on a threshold gives one event instead of one per crossing.
+    # Reasons are identified by their template ("High Temp ({value:.1f}°C)"),
+    # not the text shown, so a reading drifting inside one band stays one issue.
+    def __init__(self, active=(), clear_s=CLEAR_S):
+        self.active = set(active)
+        self.absent_since = {}   # reason -> ms it was last seen missing
+        self.clear_ms = clear_s * 1000
+
+    def update(self, t_ms, reasons, health):
+        # -> [(time_ms, "issue", reason) | (time_ms, "restored", None)]
+        out = []
+        cleared = [r for r, t0 in self.absent_since.items() if t_ms - t0 >= self.clear_ms]
+        if cleared:
+            for r in cleared:
+                self.active.discard(r); del self.absent_since[r]
+            if not self.active and not reasons and health > RESTORED_HEALTH:
+                out.append((t_ms, "restored", None))
+        for r in reasons:
+            if r in self.absent_since:
+                del self.absent_since[r]   # came back before clearing: same episode
+            elif r not in self.active:
+                self.active.add(r)
+                out.append((t_ms, "issue", r))
+        for r in self.active:
+            if r not in reasons and r not in self.absent_since:
+                self.absent_since[r] = t_ms
+        return out
@@ -0,0 +1,175 @@
+import io
+import zlib
+import numpy as np
+import pandas as pd
+from store import ROW_COLUMNS, CATEGORY_COLUMNS, TEMPLATE_COLUMNS, Window, render
+from segments import REC_DTYPE
+from logs import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # parquet export is optional
+    pa = pq = None
+HAVE_PARQUET = pq is not None
+
+# ==========================================
+# Streaming export
+# ==========================================
+# History is read in fixed-size chunks (from the append-only segments when a
+# device persists to disk, otherwise from a store snapshot) and each chunk is
+# encoded and yielded on its own, so memory stays flat however long the
+# requested range is.
+
+CHUNK_ROWS = 20000
+log = get_logger("export")
+FORMATS = {"csv": ("text/csv", ".csv"), "gzip": ("application/gzip", ".csv.gz"),
+           "parquet": ("application/vnd.apache.parquet", ".parquet")}
+
+
+def parse_columns(spec):
+    # "soil,temp" -> validated tuple in ROW_COLUMNS order (None / "" = all)
+    if not spec:
+        return ROW_COLUMNS
+    wanted = {c.strip() for c in spec.split(",") if c.strip()}
+    unknown = wanted - set(ROW_COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(sorted(unknown))}")
+    return tuple(c for c in ROW_COLUMNS if c in wanted)
+
+
+def _records_frame(rec, labels, columns):
+    ft = pd.DatetimeIndex(rec["time"].astype("datetime64[ms]"))
+    data = {}
+    for c in columns:
+        if c == "timestamp":
+            data[c] = ft.strftime("%H:%M:%S")
+        elif c == "full_time":
+            data[c] = ft
+        elif c in TEMPLATE_COLUMNS:
+            data[c] = render(labels[c], rec[c], rec) if len(labels[c]) else np.full(len(rec), "")
+        elif c in CATEGORY_COLUMNS:
+            data[c] = np.asarray(labels[c], dtype=object)[rec[c]] if len(labels[c]) else np.full(len(rec), "")
+        else:
+            data[c] = np.asarray(rec[c])
+    return pd.DataFrame(data)
+
+
+def _schema_frame(columns, device_column):
+    # One placeholder row carrying every column's type (parquet needs a schema even with no rows)
+    frame = _records_frame(np.zeros(1, dtype=REC_DTYPE), {c: [""] for c in CATEGORY_COLUMNS}, columns)
+    if device_column:
+        frame.insert(0, "device_id", "")
+    return frame
+
+
+def _segment_chunks(seg, start, end, columns, chunk_rows):
+    # Labels are looked up per chunk: ingest keeps appending (and adding
+    # category codes) while a long export streams
+    parts, have = [], 0
+    for rec in seg.iter_segments(start, end):
+        # Segments are small (one hour); gather them into chunk_rows-sized frames
+        parts.append(rec); have += len(rec)
+        while have >= chunk_rows:
+            block = np.concatenate(parts)
+            yield _records_frame(block[:chunk_rows], seg.labels(block[:chunk_rows]), columns)
+            parts, have = [block[chunk_rows:]], have - chunk_rows
+    if have:
+        block = np.concatenate(parts)
+        yield _records_frame(block, seg.labels(block), columns)
+
+
+def _store_chunks(store, start, end, columns, chunk_rows):
+    snap = store.snapshot()
+    w = snap.window(start, end)
+    for lo in range(w.lo, w.hi, chunk_rows):
+        part = Window(store, lo, min(lo + chunk_rows, w.hi))
+        frame = part.to_frame()
+        if not snap.valid:
+            # The ring lapped this export; stop rather than emit overwritten rows
+            log.warning("⚠️ [Export] History moved on during export, stopped early")
+            return
+        yield frame[list(columns)]
+
+
+def iter_frames(devs, start=None, end=None, columns=ROW_COLUMNS, chunk_rows=CHUNK_ROWS):
+    # DataFrame chunks for one or more devices (a device_id column is added for several)
+    for dev in devs:
+        if dev.segments is not None:
+            chunks = _segment_chunks(dev.segments, start, end, columns, chunk_rows)
+        else:
+            chunks = _store_chunks(dev.history, start, end, columns, chunk_rows)
+        for frame in chunks:
+            if len(devs) > 1:
+                frame.insert(0, "device_id", dev.device_id)
+            yield frame
+
+
+def iter_csv(frames, columns):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header)
+        header = False
+    if header:
+        # Nothing in range: still a valid CSV with its header line
+        yield ",".join(columns) + "\n"
+
+
+def iter_gzip(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for text in chunks:
+        data = z.compress(text.encode("utf-8"))
+        if data: yield data
+    yield z.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file that hands its bytes out as they arrive; tell() keeps
+    # counting from the start so the parquet footer offsets stay right
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def iter_parquet(frames, schema_frame=None):
+    # One row group per chunk, drained from the sink after each group
+    if pq is None:
+        raise RuntimeError("parquet export needs pyarrow")
+    sink, writer = _ChunkSink(), None
+    for frame in frames:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is None and schema_frame is not None:
+        # Nothing in range: still a valid file with the columns and no rows
+        writer = pq.ParquetWriter(sink, pa.Table.from_pandas(schema_frame, preserve_index=False).schema)
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def stream_export(devs, fmt="csv", start=None, end=None, columns=ROW_COLUMNS, chunk_rows=CHUNK_ROWS):
+    frames = iter_frames(devs, start, end, columns, chunk_rows)
+    header = (("device_id",) if len(devs) > 1 else ()) + tuple(columns)
+    if fmt == "parquet":
+        return iter_parquet(frames, _schema_frame(columns, len(devs) > 1))
+    if fmt == "gzip":
+        return iter_gzip(iter_csv(frames, header))
+    return iter_csv(frames, header)
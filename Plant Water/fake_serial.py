@@ -0,0 +1,93 @@
+import os
+import pty
+import tty
+import time
+import random
+import argparse
+import threading
+from replay import load_traces
+
+# ==========================================
+# Fake serial device (POSIX pty)
+# ==========================================
+# Opens a pseudo-terminal and writes the firmware's serial lines into it, so
+# the real SerialReader / pyserial stack can be exercised without a board:
+#   python fake_serial.py --rate 5             -> prints e.g. /dev/pts/7
+#   PLANT_SERIAL_PORTS=/dev/pts/7 python dashboard.py
+# Lines are replayed from the CSV logs. --split writes each line in random
+# pieces to exercise the line framing; --noise mixes in garbage lines.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def firmware_lines(pattern=os.path.join(HERE, "plant_data*.csv")):
+    # "T,RH,light,soil,status,slope,eta,health" (the ms field is added as each
+    # line is sent) from the logs, read like replay.py reads them
+    lines = []
+    for tr in load_traces(pattern):
+        for t, h, l, s in zip(tr["temp"], tr["hum"], tr["light"], tr["soil"]):
+            lines.append(f"{t:.2f},{h:.2f},{l:.0f},{s:.3f},OK,0.0,-1,80")
+    return lines
+
+
+class FakeSerialDevice:
+    def __init__(self, rate=1.0, split=False, noise=0.0, lines=None, seed=None):
+        self.rate = rate          # lines per second (0 = as fast as the pty drains)
+        self.split = split
+        self.noise = noise        # fraction of garbage lines
+        self.lines = lines or firmware_lines()
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)   # no echo / newline translation, like a real UART
+        self.port = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-serial", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(2)
+        os.close(self._master); os.close(self._slave)
+
+    def write(self, data):
+        os.write(self._master, data)
+
+    def _run(self):
+        t0 = time.monotonic()
+        i = 0
+        while not self._stop.is_set():
+            line = self.lines[i % len(self.lines)]
+            i += 1
+            ms = int((time.monotonic() - t0) * 1000)
+            data = (f"#!{self.rng.random():.6f}@@" if self.rng.random() < self.noise else f"{ms},{line}") + "\r\n"
+            data = data.encode()
+            if self.split:
+                cut = sorted(self.rng.sample(range(1, len(data)), min(3, len(data) - 1)))
+                for a, b in zip([0] + cut, cut + [len(data)]):
+                    self.write(data[a:b]); time.sleep(0.001)
+            else:
+                self.write(data)
+            self.sent += 1
+            if self.rate:
+                self._stop.wait(max(0.0, t0 + self.sent / self.rate - time.monotonic()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake plant node on a pty")
+    parser.add_argument("--rate", type=float, default=1.0, help="lines per second")
+    parser.add_argument("--split", action="store_true", help="write lines in random fragments")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of garbage lines")
+    a = parser.parse_args()
+    dev = FakeSerialDevice(a.rate, a.split, a.noise).start()
+    print(f"🔌 [Fake Serial] {dev.port} ({a.rate} lines/s); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   sent {dev.sent}")
+    except KeyboardInterrupt:
+        dev.stop()
@@ -0,0 +1,303 @@
+import os
+import json
+import math
+import argparse
+from collections import deque
+import numpy as np
+from segments import _dir_name
+from logs import get_logger
+
+# ==========================================
+# Drying forecaster (per plant)
+# ==========================================
+# The drying rate (soil fraction lost per hour) is modelled as a decay whose
+# speed depends on the air:
+#   -ds/dt = a + c * s,   a = b0 + b1 * vpd + b2 * (temp - 20) / 10 + b3 * light / 1000,   c = b4
+# fitted by recursive least squares with forgetting, one observation per
+# hour of drying: the least-squares soil slope within that hour against the
+# hour's mean vpd / temp / light / soil. Hours containing a watering, and the
+# SETTLE_H after one, are skipped. Each observation is an O(k²) update, so the
+# model is refit as data arrives and never from scratch. When a drying cycle
+# completes (the next watering), its mean residual feeds the cycle-to-cycle
+# spread behind the quantiles.
+#
+# forecast() is plain Python on 5-vectors (a few µs, cheap enough for every
+# ingest): `a` under the last 24 hours' mean conditions, the predictive spread
+# of the rate, and the time the decay takes to reach `target` at the 10 / 50 /
+# 90 % quantiles of `a` (faster drying -> earlier ETA; -1 = never gets there,
+# like eta_batch).
+#
+#   python forecast.py plant_data*.csv                  prequential backtest (vs the old formula), one plant per log
+#   python forecast.py plant_data4.csv --save fern      fit and save forecasts/fern.json (warm start for "fern")
+#
+# The server saves every device's model on shutdown (runtime.shutdown) with
+# the newest sample time it has learned; on the next start only history after
+# that time is fed to it again.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FORECAST_DIR = os.environ.get("PLANT_FORECAST_DIR", os.path.join(HERE, "forecasts"))
+FEATURES = ("bias", "vpd", "temp", "light", "soil")
+BLOCK_MS = 3600 * 1000    # one observation per hour
+MIN_BLOCK_N = 4           # samples in an hour to fit its slope
+MIN_BLOCK_SPAN_H = 0.25
+SMALL_BATCH = 16          # batches up to this size skip the NumPy grouping
+SETTLE_H = 1.0            # drainage after a watering is not drying
+FORGET = 0.999            # per hour: ~6 weeks of memory
+CYCLE_FORGET = 0.9        # per cycle
+PRIOR_VAR = 0.01          # RLS P0 = PRIOR_VAR * I: ridge toward 0 (a few days of data to move it)
+MIN_BLOCKS = 6            # hours learned before forecast() answers
+DAY_BLOCKS = 24           # conditions forecast() assumes: mean of the last 24 hours
+Z90 = 1.2816              # 10 / 90 % normal quantile
+log = get_logger("forecast")
+
+
+def features(vpd, temp, light, soil):
+    return (1.0, vpd, (temp - 20.0) / 10.0, light / 1000.0, soil)
+
+
+class DryingForecaster:
+    def __init__(self):
+        k = len(FEATURES)
+        self.beta = [0.0] * k
+        self.P = [[PRIOR_VAR if i == j else 0.0 for j in range(k)] for i in range(k)]
+        self.s2 = 0.0        # residual variance of an hourly rate
+        self.c2 = 0.0        # variance of a cycle's mean residual
+        self.blocks = 0      # hours learned
+        self.cycles = 0      # completed cycles with enough hours to count
+        self._cycle_sum = self._cycle_n = 0
+        self._settle_ms = None
+        self.last_ms = None  # newest sample time fed to update()
+        self._block = None   # [key, n, st, ss, stt, sts, sv, stemp, slight, dirty]
+        self._day = deque(maxlen=DAY_BLOCKS)
+        self._day_sum = [0.0, 0.0, 0.0]   # vpd, temp, light features
+
+    # ---------- learning ----------
+    def update(self, t_ms, soil, vpd, temp, light, watered=()):
+        # One batch of samples in time order; `watered`: indices where a watering was detected
+        t_ms = np.asarray(t_ms).astype(np.int64)
+        cols = [np.asarray(c, dtype=float) for c in (soil, vpd, temp, light)]
+        if len(t_ms):
+            self.last_ms = int(t_ms[-1]) if self.last_ms is None else max(self.last_ms, int(t_ms[-1]))
+        a = 0
+        for i in [int(i) for i in watered] + [len(t_ms)]:
+            if i > a:
+                self._observe(t_ms[a:i], *(c[a:i] for c in cols))
+            if i < len(t_ms):
+                self._watered(int(t_ms[i]))
+            a = i
+
+    def _watered(self, t_ms):
+        if self._block is not None:
+            self._block[9] = True
+        if self._cycle_n >= 3:
+            m = self._cycle_sum / self._cycle_n
+            self.cycles += 1
+            w = max(1.0 - CYCLE_FORGET, 1.0 / self.cycles)
+            self.c2 += w * (m * m - self.c2)
+        self._cycle_sum = self._cycle_n = 0
+        self._settle_ms = t_ms + SETTLE_H * 3.6e6
+
+    def _observe(self, t, soil, vpd, temp, light):
+        # Per-hour sums of the batch (reduceat), folded into the open block;
+        # a few live samples are cheaper to add one by one
+        if len(t) <= SMALL_BATCH:
+            for i in range(len(t)):
+                ti = int(t[i]); key = ti // BLOCK_MS
+                th = (ti - key * BLOCK_MS) / 3.6e6; si = float(soil[i])
+                self._fold(key, 1, (th, si, th * th, th * si, float(vpd[i]), float(temp[i]), float(light[i])))
+            return
+        keys = t // BLOCK_MS
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        th = (t - keys * BLOCK_MS) / 3.6e6
+        sums = [np.add.reduceat(x, first) for x in (th, soil, th * th, th * soil, vpd, temp, light)]
+        counts = np.diff(np.r_[first, len(t)])
+        for g, key in enumerate(keys[first].tolist()):
+            self._fold(key, int(counts[g]), [float(x[g]) for x in sums])
+
+    def _fold(self, key, n, sums):
+        b = self._block
+        if b is None or key != b[0]:
+            if b is not None and key < b[0]:
+                return   # a late sample for an hour already closed
+            if b is not None:
+                self._close(b)
+            b = self._block = [key, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, False]
+        b[1] += n
+        for j in range(7):
+            b[2 + j] += sums[j]
+
+    def _close(self, b):
+        key, n, st, ss, stt, sts, sv, stemp, slight, dirty = b
+        x = features(sv / n, stemp / n, slight / n, ss / n)
+        # Conditions of every hour (drying or not) are what the next day is assumed to look like
+        if len(self._day) == DAY_BLOCKS:
+            old = self._day[0]
+            for j in range(3): self._day_sum[j] -= old[j]
+        self._day.append(x[1:4])
+        for j in range(3): self._day_sum[j] += x[j + 1]
+        den = n * stt - st * st
+        # sqrt(den) / n is the sd of the sample times; evenly spread over S hours it is S / 3.46
+        if dirty or n < MIN_BLOCK_N or den <= 0 or math.sqrt(den) / n < MIN_BLOCK_SPAN_H / 3.46:
+            return
+        if self._settle_ms is not None and key * BLOCK_MS < self._settle_ms:
+            return
+        e = self._learn(x, -(n * sts - st * ss) / den)
+        self._cycle_sum += e; self._cycle_n += 1
+
+    def _learn(self, x, y):
+        # RLS with forgetting; returns the a-priori residual
+        k = len(x)
+        P, beta = self.P, self.beta
+        Px = [sum(P[i][j] * x[j] for j in range(k)) for i in range(k)]
+        den = FORGET + sum(x[i] * Px[i] for i in range(k))
+        e = y - sum(beta[i] * x[i] for i in range(k))
+        for i in range(k):
+            beta[i] += Px[i] / den * e
+        self.P = [[(P[i][j] - Px[i] * Px[j] / den) / FORGET for j in range(k)] for i in range(k)]
+        self.blocks += 1
+        w = max(1.0 - FORGET, 1.0 / self.blocks)
+        self.s2 += w * (e * e * FORGET / den - self.s2)
+        return e
+
+    # ---------- forecasting ----------
+    @property
+    def ready(self):
+        return self.blocks >= MIN_BLOCKS and len(self._day) > 0
+
+    def rate(self, soil):
+        # (a, c, predictive sd of the rate at `soil`) under the last day's conditions
+        d = len(self._day)
+        x = (1.0, self._day_sum[0] / d, self._day_sum[1] / d, self._day_sum[2] / d, soil)
+        b, P = self.beta, self.P
+        a = b[0] + b[1] * x[1] + b[2] * x[2] + b[3] * x[3]
+        q = 0.0
+        for i in range(5):
+            row = P[i]
+            q += x[i] * (row[0] + row[1] * x[1] + row[2] * x[2] + row[3] * x[3] + row[4] * soil)
+        return a, b[4], math.sqrt(max(self.s2 * q, 0.0) + (self.c2 if self.cycles >= 2 else self.s2))
+
+    def forecast(self, soil, target, min_rate=0.0005):
+        # -> (p10, p50, p90) hours until soil <= target, or None until enough has been learned
+        if not self.ready:
+            return None
+        if soil <= target:
+            return (0.0, 0.0, 0.0)
+        a, c, sd = self.rate(soil)
+        out = []
+        for z in (Z90, 0.0, -Z90):
+            az = a + z * sd
+            # The rate is linear in s, so positive at both ends = positive all the way down
+            if min(az + c * soil, az + c * target) <= min_rate:
+                out.append(-1.0)       # not drying now, or stops before it gets there
+            elif abs(c) > 1e-6:
+                out.append(math.log((soil + az / c) / (target + az / c)) / c)
+            else:
+                out.append((soil - target) / (az + c * (soil + target) / 2))
+        return tuple(out)
+
+    def summary(self):
+        mean, sd = self.rate(0.5)[::2] if self.ready else (None, None)
+        return {"coef": dict(zip(FEATURES, self.beta)), "hours": self.blocks, "cycles": self.cycles,
+                "rate": mean, "rate_sd": sd, "ready": self.ready}
+
+    # ---------- warm start ----------
+    def to_dict(self):
+        return {"beta": self.beta, "P": self.P, "s2": self.s2, "c2": self.c2, "blocks": self.blocks, "cycles": self.cycles,
+                "day": [list(x) for x in self._day], "last_ms": self.last_ms, "settle_ms": self._settle_ms,
+                "cycle": [self._cycle_sum, self._cycle_n], "block": self._block}
+
+    @classmethod
+    def from_dict(cls, d):
+        f = cls()
+        f.beta, f.P = [float(v) for v in d["beta"]], [[float(v) for v in row] for row in d["P"]]
+        f.s2, f.c2, f.blocks, f.cycles = float(d["s2"]), float(d["c2"]), int(d["blocks"]), int(d["cycles"])
+        for x in d.get("day", []):
+            f._day.append(tuple(x))
+        f._day_sum = [sum(x[j] for x in f._day) for j in range(3)]
+        # The rest was added for saving on shutdown; a --save fit starts without it
+        f.last_ms, f._settle_ms, f._block = d.get("last_ms"), d.get("settle_ms"), d.get("block")
+        f._cycle_sum, f._cycle_n = d.get("cycle", (0, 0))
+        return f
+
+
+def model_path(device_id):
+    # Same sanitising as the history directory: device_id comes from query strings
+    return os.path.join(FORECAST_DIR, f"{_dir_name(device_id)}.json")
+
+
+def load_forecaster(device_id):
+    # A saved fit (python forecast.py ... --save <device_id>) or a fresh model
+    path = model_path(device_id)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return DryingForecaster.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            log.error("⚠️ [Forecast] Bad saved model, starting fresh", file=path, error=e)
+    return DryingForecaster()
+
+
+def save_forecaster(device_id, f):
+    # Written whole and renamed, so a crash mid-write leaves the previous fit
+    os.makedirs(FORECAST_DIR, exist_ok=True)
+    path = model_path(device_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(f.to_dict(), fh)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def backtest(tr, f=None, drop=0.03):
+    # Prequential: every sample is forecast with what was learned before it, to
+    # `drop` below its soil level, against the hours the log actually took to
+    # get there. The old ETA formula (pipeline.eta_batch on a 1 h slope) is
+    # scored on the same samples.
+    from pipeline import calculate_vpd_batch, eta_batch
+    from profiles import merge, PlantProfile
+    from regression import SlidingRegression, DEFAULT_WINDOW_H
+    from watering import WateringDetector
+    f = f or DryingForecaster()
+    slope = SlidingRegression(DEFAULT_WINDOW_H)
+    t = tr["full_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    soil, temp, hum, light = (tr[c].to_numpy(dtype=float) for c in ("soil", "temp", "hum", "light"))
+    vpd = calculate_vpd_batch(temp, hum)
+    watered = set(WateringDetector().scan(soil)[0].tolist())
+    rows = []
+    for i in range(len(t)):
+        w = [0] if i in watered else ()
+        f.update(t[i:i + 1], soil[i:i + 1], vpd[i:i + 1], temp[i:i + 1], light[i:i + 1], w)
+        if w: slope.reset()
+        sl = slope.update_batch(t[i:i + 1] / 3.6e6, soil[i:i + 1])[0]
+        nxt = min([j for j in watered if j > i], default=len(t))
+        hit = np.flatnonzero(soil[i:nxt] <= soil[i] - drop)
+        q = f.forecast(soil[i], soil[i] - drop)
+        if q is None or not len(hit): continue
+        old = eta_batch(soil[i:i + 1], sl, vpd[i:i + 1], PlantProfile(merge({"health": "default", "soil": {"empty": soil[i] - drop}})))
+        rows.append((q, float(old[0]), (t[i + hit[0]] - t[i]) / 3.6e6))
+    return f, rows
+
+
+if __name__ == "__main__":
+    from replay import load_trace
+    parser = argparse.ArgumentParser(description="Fit / backtest the per-plant drying model on CSV logs")
+    parser.add_argument("logs", nargs="+", help="CSV logs (any layout replay.py reads)")
+    parser.add_argument("--drop", type=float, default=0.03, help="backtest: forecast the time to lose this much soil moisture")
+    parser.add_argument("--save", metavar="DEVICE_ID", help="fit one model on all logs, in order, and save it as the device's warm start")
+    a = parser.parse_args()
+    shared = DryingForecaster() if a.save else None
+    for path in a.logs:
+        f, rows = backtest(load_trace(path), shared, a.drop)
+        s = f.summary()
+        print(f"🌿 {os.path.basename(path)}: {s['hours']} drying hours, {s['cycles']} cycles, "
+              + "  ".join(f"{k} {v:+.5f}" for k, v in s["coef"].items()))
+        if not rows:
+            print("   nothing to score (never dried that much, or too few hours learned)")
+            continue
+        actual = np.array([h for _, _, h in rows])
+        p50, old = np.array([q[1] for q, _, _ in rows]), np.array([o for _, o, _ in rows])
+        inside = np.mean([q[0] <= h and (q[2] < 0 or h <= q[2]) for q, _, h in rows])
+        mae = lambda eta: f"{np.abs(eta[eta > 0] - actual[eta > 0]).mean():5.2f} h ({np.mean(eta <= 0):.0%} none)" if (eta > 0).any() else "  -- (all none)"
+        print(f"   {len(rows)} forecasts, actual median {np.median(actual):.1f} h  model p50 MAE {mae(p50)}  "
+              f"p10-p90 coverage {inside:.0%}  old formula MAE {mae(old)}")
+    if a.save:
+        print(f"💾 {save_forecaster(a.save, shared)}")
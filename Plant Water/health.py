@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import tomllib
+import argparse
+import functools
+import numpy as np
+
+# ==========================================
+# Health scoring rules (per-species profiles)
+# ==========================================
+# A profile (health_profiles/<name>.toml, see default.toml for the format)
+# describes soil, temperature and light as ordered bands, weights, a day
+# window and the reason strings. It is compiled once into per-factor band
+# tables: scoring a batch is a first-match band lookup per factor (masked
+# assignment, np.select semantics), a table lookup for the score, and the
+# reason labels are built once per distinct band combination rather than
+# once per sample. Jitter is a hash of (sample time, seed), so rescoring the
+# same history gives the same numbers.
+#
+#   PLANT_HEALTH_PROFILE=refine_ui                     every device
+#   PLANT_HEALTH_PROFILES="fern=default,cactus=refine_ui"   per device id
+#   health = "refine_ui" in plants/<device_id>.toml      same, hot-reloaded (profiles.py)
+#   python health.py plant_data4.csv --profile default refine_ui   rescore a log
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(HERE, "health_profiles")
+DEFAULT_PROFILE = os.environ.get("PLANT_HEALTH_PROFILE", "default")
+DEVICE_PROFILES = dict(item.split("=", 1) for item in os.environ.get("PLANT_HEALTH_PROFILES", "").split(",") if "=" in item)
+FACTORS = ("soil", "temp", "light")
+BOUNDS = {"lt": np.less, "le": np.less_equal, "gt": np.greater, "ge": np.greater_equal}
+BAND_KEYS = set(BOUNDS) | {"score", "reason"}
+
+
+class _Regime:
+    # One set of bands (a factor's, or its day / night half)
+    def __init__(self, where, spec, rows_score, rows_reason):
+        self.bands = []
+        self.rows = []
+        for band in spec.get("bands", []):
+            unknown = set(band) - BAND_KEYS
+            if unknown:
+                raise ValueError(f"{where}: unknown band keys {sorted(unknown)}")
+            self.bands.append([(BOUNDS[k], float(band[k])) for k in BOUNDS if k in band])
+            self.rows.append(len(rows_score))
+            rows_score.append(float(band.get("score", np.nan)))   # NaN -> ramp / default
+            rows_reason.append(band.get("reason", ""))
+        self.ramp = spec.get("ramp")
+        if "default" not in spec and self.ramp is None:
+            raise ValueError(f"{where}: needs a default score or a ramp")
+        self.default = float(spec.get("default", np.nan))
+        self.default_row = len(rows_score)
+        rows_score.append(self.default)
+        rows_reason.append("")
+
+    def index(self, x):
+        # np.select semantics (first matching band wins), filled from the last band
+        # back so an earlier band overwrites a later one; cheaper for small batches
+        idx = np.full(len(x), self.default_row)
+        for bounds, row in zip(reversed(self.bands), reversed(self.rows)):
+            if not bounds:
+                idx[:] = row; continue
+            c = bounds[0][0](x, bounds[0][1])
+            for op, v in bounds[1:]:
+                c &= op(x, v)
+            idx[c] = row
+        return idx
+
+    def fallback(self, x):
+        # Score for bands without one (and the default row when it has none)
+        if self.ramp is None:
+            return self.default
+        r = self.ramp
+        return np.clip(100 - np.abs(x - r["center"]) * r["slope"], r.get("floor", 0), r.get("ceil", 100))
+
+
+class FactorRules:
+    def __init__(self, name, spec, factor=None):
+        rows_score, rows_reason = [], []
+        if "day" in spec or "night" in spec:
+            self.day = _Regime(f"{name}.day", spec["day"], rows_score, rows_reason)
+            self.night = _Regime(f"{name}.night", spec["night"], rows_score, rows_reason)
+        else:
+            self.day = self.night = _Regime(name, spec, rows_score, rows_reason)
+        self.scores = np.array(rows_score)
+        self.reasons = rows_reason
+        self.templated = ["{" in r for r in rows_reason]
+        # What the store keeps: {value} named after the factor ({temp:.1f}), so a
+        # joined label can be filled from the row's readings (store.fill)
+        factor = factor or name.rsplit(".", 1)[-1]
+        self.labels = [r.replace("{value", "{" + factor) for r in rows_reason]
+
+    def __len__(self):
+        return len(self.scores)
+
+    def evaluate(self, x, is_day):
+        # -> (band row per sample, score per sample)
+        if self.day is self.night:
+            idx = self.day.index(x)
+            fallback = self.day.fallback(x)
+        else:
+            idx = np.where(is_day, self.day.index(x), self.night.index(x))
+            fallback = np.where(is_day, self.day.fallback(x), self.night.fallback(x))
+        score = self.scores[idx]
+        return idx, np.where(np.isnan(score), fallback, score)
+
+
+class HealthRules:
+    def __init__(self, profile, name="profile"):
+        self.name = profile.get("name", name)
+        missing = [f for f in FACTORS if f not in profile]
+        if missing:
+            raise ValueError(f"{self.name}: missing {missing}")
+        self.factors = {f: FactorRules(f"{self.name}.{f}", profile[f], f) for f in FACTORS}
+        self.weights = {f: float(profile.get("weights", {}).get(f, 0)) for f in FACTORS}
+        day = profile.get("day", {})
+        self.day_start, self.day_end = day.get("start", 8), day.get("end", 18)
+        self.bias = float(profile.get("bias", 0))
+        self.jitter = float(profile.get("jitter", 0))
+        self.seed = int(profile.get("seed", 0))
+
+    def score(self, soil, temp, light, hours, times=None, reasons=True):
+        # Columnar: health, h_soil, h_temp, h_light, and (reasons=True) the
+        # joined reason labels (templates, see FactorRules.labels) plus
+        # per-sample {template: text} reasons
+        # A missing temperature / light reading scores as 0, as the old dashboard did
+        cols = {"soil": soil, "temp": np.nan_to_num(temp, nan=0.0), "light": np.nan_to_num(light, nan=0.0)}
+        is_day = (hours >= self.day_start) & (hours <= self.day_end)
+        idx, out = {}, {}
+        total = np.full(len(soil), self.bias)
+        for f, rules in self.factors.items():
+            idx[f], s = rules.evaluate(cols[f], is_day)
+            total += s * self.weights[f]
+            out[f"h_{f}"] = s.astype(int)
+        if self.jitter:
+            total += self._jitter(len(total), times)
+        out["health"] = np.clip(total, 0, 100).astype(int)
+        if reasons:
+            out["reasons"], out["reason_list"] = self._reasons(idx, cols)
+        return out
+
+    def _jitter(self, n, times):
+        if times is None:
+            u = np.random.default_rng(self.seed).random(n)
+        else:
+            u = unit_hash(np.asarray(times, dtype="datetime64[ms]").astype(np.int64), self.seed)
+        return (2 * u - 1) * self.jitter
+
+    def _reasons(self, idx, cols):
+        # Every sample with the same band in each factor has the same reasons:
+        # the joined label is built once per combination and stays a template.
+        # reason_list maps each reason's template (its identity, e.g. for the
+        # event hysteresis) to the text shown for that sample, so only samples
+        # in a {value} band are formatted one by one
+        key = np.zeros(len(cols["soil"]), dtype=np.int64)
+        for f in FACTORS:
+            key = key * len(self.factors[f]) + idx[f]
+        uniq, first, inv = np.unique(key, return_index=True, return_inverse=True)
+        joined = np.empty(len(uniq), dtype=object)
+        lists, templated = [], np.zeros(len(uniq), dtype=bool)
+        for k, i in enumerate(first):
+            rows = [(self.factors[f], idx[f][i]) for f in FACTORS]
+            joined[k] = ", ".join(rules.labels[r] for rules, r in rows if rules.reasons[r])
+            templated[k] = any(rules.templated[r] for rules, r in rows)
+            parts = [rules.reasons[r] for rules, r in rows if rules.reasons[r]]
+            lists.append(dict(zip(parts, parts)))
+        reason_list = [lists[k] for k in inv]
+        for i in np.flatnonzero(templated[inv]):
+            reason_list[i] = {self.factors[f].reasons[idx[f][i]]: self.factors[f].reasons[idx[f][i]].format(value=cols[f][i])
+                              for f in FACTORS if self.factors[f].reasons[idx[f][i]]}
+        return joined[inv], reason_list
+
+
+def unit_hash(x, seed=0):
+    # splitmix64 of int64 keys -> uniform floats in [0, 1), the same for the same key and seed
+    with np.errstate(over="ignore"):
+        z = x.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def profile_path(name):
+    return name if name.endswith(".toml") else os.path.join(PROFILE_DIR, f"{name}.toml")
+
+
+def read_rules(name=DEFAULT_PROFILE):
+    with open(profile_path(name), "rb") as f:
+        return HealthRules(tomllib.load(f), os.path.splitext(os.path.basename(name))[0])
+
+
+@functools.lru_cache(maxsize=None)
+def load_rules(name=DEFAULT_PROFILE):
+    # Read once per process; ProfileStore (profiles.py) re-reads edited files itself
+    return read_rules(name)
+
+
+if __name__ == "__main__":
+    from replay import load_trace
+    from pipeline import hour_of_day
+    parser = argparse.ArgumentParser(description="Rescore logged readings with one or more health profiles")
+    parser.add_argument("logs", nargs="+", help="CSV logs (any layout replay.py reads)")
+    parser.add_argument("--profile", nargs="+", default=[DEFAULT_PROFILE], help="profile names or .toml paths")
+    a = parser.parse_args()
+    for path in a.logs:
+        tr = load_trace(path)
+        times = tr["full_time"].to_numpy().astype("datetime64[ms]")
+        soil, temp, light = (tr[c].to_numpy(dtype=float) for c in ("soil", "temp", "light"))
+        hours = hour_of_day(times)
+        print(f"🌿 {os.path.basename(path)}: {len(tr)} rows")
+        for name in a.profile:
+            rules = load_rules(name)
+            t0 = time.perf_counter()
+            h = rules.score(soil, temp, light, hours, times)
+            ms = (time.perf_counter() - t0) * 1000
+            # Counted per template: "High Temp (<temp>°C)" is one reason whatever the reading
+            top = sorted(((int(n), re.sub(r"\{(\w+)[^}]*\}", r"<\1>", r)) for r, n in zip(*np.unique(h["reasons"].astype(str), return_counts=True)) if r),
+                         reverse=True)[:3]
+            print(f"   {rules.name:<12} health mean {h['health'].mean():5.1f}  min {h['health'].min():3d}  ({ms:.1f} ms)  "
+                  + ", ".join(f"{r} ×{n}" for n, r in top))
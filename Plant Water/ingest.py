@@ -0,0 +1,52 @@
+import queue
+import threading
+from logs import get_logger
+
+# ==========================================
+# Single-writer ingest queue
+# ==========================================
+# The serial thread and the Flask routes only decode and enqueue. One worker
+# thread applies every job, so device state and history shards have exactly
+# one writer; dashboard callbacks read through TimeSeriesStore.snapshot()
+# and never take a lock that ingest needs.
+
+log = get_logger("ingest")
+
+
+class IngestQueue:
+    def __init__(self, maxsize=10000):
+        self._q = queue.Queue(maxsize)
+        self._thread = None
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, fn, *args, **kwargs):
+        # Never blocks the producer; False means the queue is full and the job was dropped
+        try:
+            self._q.put_nowait((fn, args, kwargs))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def depth(self):
+        return self._q.qsize()
+
+    def join(self):
+        # Wait until everything submitted so far has been applied
+        self._q.join()
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._q.get()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                log.error("❌ [Ingest Error]", error=e, job=getattr(fn, "__name__", fn))
+            finally:
+                self._q.task_done()
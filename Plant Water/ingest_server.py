@@ -0,0 +1,264 @@
+import asyncio
+import argparse
+import json
+import math
+import time
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from datetime import datetime
+from batch_ingest import parse_binary_batch, parse_csv_batch, device_times, ack_bitmap
+from pipeline import make_batch
+import runtime
+from runtime import devices, ingest, ingest_samples, HISTORY_DIR
+import metrics
+from metrics import STAGE_SECONDS, INVALID_SAMPLES, STALE_SAMPLES
+from logs import get_logger
+
+# ==========================================
+# Async ingest server (high-frequency fleets)
+# ==========================================
+# A separate process that only takes samples in: one asyncio loop decodes and
+# validates every request, samples are grouped per device and handed to the
+# same pipeline (runtime.ingest_samples, on the ingest worker) as one batch,
+# and the pipeline appends them to the segment log. Pending samples are
+# flushed whenever the worker has caught up (at most MAX_WAIT_MS apart), so
+# under load the batches simply grow instead of the queue. The dashboard
+# runs next to it with PLANT_FOLLOW_INGEST=1 and tails those segments.
+#
+#   HTTP  GET  /update_sensor?temp=&hum=&soil=&light=&device_id=   (same as the Flask route)
+#         POST /update_sensor_batch?device_id=&now_ms=             (CSV lines or packed `Sample`s)
+#         GET  /stats, /metrics (Prometheus)
+#   UDP   one or more firmware CSV lines per datagram, optionally led by a
+#         "device_id=fern&now_ms=123456" line
+#
+# Run:  python ingest_server.py
+#       PLANT_FOLLOW_INGEST=1 python dashboard.py
+
+HTTP_PORT = 8060
+UDP_PORT = 8061
+FLUSH_MS = 20              # how often pending samples are looked at
+MAX_WAIT_MS = 1000         # flush even if the worker is still busy
+MAX_BATCH = 5000           # flush a device early once this many samples are pending
+BUSY_DEPTH = 1000          # ingest queue depth at which requests get 503
+MAX_BODY = 1 << 20
+STATS_EVERY_S = 10
+
+log = get_logger("ingest_server")
+_PARSE = STAGE_SECONDS.labels(stage="parse")
+
+
+def safe_float(values):
+    # Same leniency as the Flask route: missing / garbage / NaN -> 0
+    try:
+        v = float(values[0])
+        return 0.0 if math.isnan(v) else v
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+
+
+class IngestServer:
+    def __init__(self):
+        self._rows = {}     # device_id -> [(time, temp, hum, soil, light)] from single GETs, local time like the Flask route
+        self._chunks = {}   # device_id -> [batch] from CSV / binary posts and datagrams
+        self._pending = {}  # device_id -> samples waiting
+        self.stats = {"requests": 0, "datagrams": 0, "received": 0, "accepted": 0, "batches": 0, "busy": 0, "dropped": 0, "stale": 0}
+
+    # ---------- batching ----------
+    def busy(self):
+        return ingest.depth() >= BUSY_DEPTH
+
+    def add_row(self, device_id, row):
+        self._rows.setdefault(device_id, []).append(row)
+        self._count(device_id, 1)
+
+    def add_batch(self, device_id, batch):
+        if len(batch["time"]):
+            self._chunks.setdefault(device_id, []).append(batch)
+            self._count(device_id, len(batch["time"]))
+
+    def _count(self, device_id, n):
+        self.stats["accepted"] += n
+        self._pending[device_id] = self._pending.get(device_id, 0) + n
+        if self._pending[device_id] >= MAX_BATCH:
+            self.flush(device_id)
+
+    def flush(self, device_id=None):
+        for d in ([device_id] if device_id is not None else list(self._pending)):
+            self._pending.pop(d, None)
+            chunks = self._chunks.pop(d, [])
+            rows = self._rows.pop(d, None)
+            if rows:
+                t, temp, hum, soil, light = zip(*rows)
+                chunks.append(make_batch(np.array(t, dtype="datetime64[ms]"), temp, hum, soil, light))
+            if not chunks: continue
+            batch = {k: np.concatenate([c[k] for c in chunks]) for k in ("time", "temp", "hum", "soil", "light")}
+            if any("status" in c for c in chunks):   # CSV posts carry the node's status, GETs and packed records don't
+                batch["status"] = np.concatenate([c.get("status", np.full(len(c["time"]), None, dtype=object)) for c in chunks])
+            order = np.argsort(batch["time"], kind="stable")
+            batch = {k: v[order] for k, v in batch.items()}
+            dev = devices.get(d)
+            if ingest.submit(ingest_samples, dev, batch, "Async"):
+                dev.last_wifi_update = datetime.now()
+                self.stats["batches"] += 1
+            else:
+                self.stats["dropped"] += len(order)
+
+    async def flush_loop(self):
+        last, seen = time.monotonic(), 0
+        flushed = time.monotonic()
+        while True:
+            await asyncio.sleep(FLUSH_MS / 1000)
+            if self._pending and (ingest.depth() == 0 or time.monotonic() - flushed >= MAX_WAIT_MS / 1000):
+                self.flush()
+                flushed = time.monotonic()
+            if time.monotonic() - last >= STATS_EVERY_S:
+                rate = (self.stats["accepted"] - seen) / (time.monotonic() - last)
+                if rate:
+                    log.info("⚡ [Ingest] rate", samples_per_s=round(rate), queue=ingest.depth(), dropped=self.stats['dropped'])
+                last, seen = time.monotonic(), self.stats["accepted"]
+
+    # ---------- decoding ----------
+    def accept_csv(self, device_id, text, now_ms=None, binary=None, source="Async"):
+        with _PARSE.time():
+            batch, valid = parse_binary_batch(binary) if binary is not None else parse_csv_batch(text)
+            times = device_times(batch["ms"], now_ms)
+            idx = np.flatnonzero(valid)
+            idx = idx[np.argsort(times[idx], kind="stable")]
+            invalid = len(valid) - len(idx)
+            # Samples older than what is already stored are acknowledged (the node
+            # would only resend them) but not stored
+            fresh, _ = devices.get(device_id).admit(times[idx])
+            idx = idx[fresh]
+            samples = make_batch(times[idx], batch["temp"][idx], batch["hum"][idx], batch["soil"][idx], batch["light"][idx],
+                                 batch["status"][idx] if "status" in batch else None)
+        self.stats["received"] += len(valid)
+        if invalid: INVALID_SAMPLES.labels(source=source).inc(invalid)
+        stale = len(fresh) - len(idx)
+        if stale:
+            self.stats["stale"] += stale
+            STALE_SAMPLES.labels(source=source).inc(stale)
+        self.add_batch(device_id, samples)
+        return valid, stale
+
+    def route(self, method, target, headers, body):
+        # -> (status, content type, payload)
+        url = urlsplit(target)
+        args = parse_qs(url.query)
+        device_id = (args.get("device_id") or [None])[0]
+        if url.path == "/update_sensor" and method == "GET":
+            if self.busy():
+                self.stats["busy"] += 1
+                return 503, "text/plain", b"Busy"
+            now = np.datetime64(datetime.now(), "ms")
+            devices.get(device_id).admit([now])
+            self.stats["received"] += 1
+            self.add_row(device_id, (now, safe_float(args.get("temp")), safe_float(args.get("hum")),
+                                     safe_float(args.get("soil")), safe_float(args.get("light"))))
+            return 200, "text/plain", b"OK"
+        if url.path == "/update_sensor_batch" and method == "POST":
+            if self.busy():
+                self.stats["busy"] += 1
+                return 503, "text/plain", b"Busy"
+            now_ms = (args.get("now_ms") or [None])[0]
+            binary = body if headers.get("content-type", "").startswith("application/octet-stream") else None
+            valid, stale = self.accept_csv(device_id, body.decode("utf-8", errors="replace") if binary is None else None, now_ms, binary)
+            reply = {"received": int(len(valid)), "accepted": int(valid.sum()) - stale, "stale": stale, "ack": ack_bitmap(valid)}
+            return 200, "application/json", json.dumps(reply).encode()
+        if url.path == "/stats":
+            return 200, "application/json", json.dumps({**self.stats, "queue": ingest.depth(), "devices": devices.ids()}).encode()
+        if url.path == "/metrics":
+            return 200, metrics.CONTENT_TYPE, metrics.render().encode()
+        return 404, "text/plain", b"Not found"
+
+    # ---------- HTTP/1.1 (keep-alive) ----------
+    async def handle_http(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    k, sep, v = line.partition(":")
+                    if sep: headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    writer.write(b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                body = await reader.readexactly(length) if length else b""
+                self.stats["requests"] += 1
+                try:
+                    status, ctype, payload = self.route(method, target, headers, body)
+                except ValueError as e:   # malformed device_id, device limit (devices.py)
+                    status, ctype, payload = 400, "text/plain", f"Bad request: {e}".encode()
+                except Exception as e:
+                    log.error("❌ [Async Ingest Error]", error=e)
+                    status, ctype, payload = 400, "text/plain", b"Error"
+                conn = headers.get("connection", "").lower()
+                keep = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: {ctype}\r\n"
+                             f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode() + payload)
+                if not keep: break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class UdpIngest(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server.stats["datagrams"] += 1
+        try:
+            text = data.decode("utf-8", errors="replace")
+            device_id, now_ms = None, None
+            first, _, rest = text.partition("\n")
+            if "device_id=" in first or "now_ms=" in first:
+                args = parse_qs(first.strip())
+                device_id = (args.get("device_id") or [None])[0]
+                now_ms = (args.get("now_ms") or [None])[0]
+                text = rest
+            if self.server.busy():
+                self.server.stats["busy"] += 1
+                return
+            self.server.accept_csv(device_id, text, now_ms, source="UDP")
+        except Exception as e:
+            log.error("❌ [UDP Ingest Error]", error=e)
+
+
+async def serve(host="0.0.0.0", http_port=HTTP_PORT, udp_port=UDP_PORT):
+    srv = IngestServer()
+    runtime.start_profile_watch()
+    http = await asyncio.start_server(srv.handle_http, host, http_port)
+    log.info("[System] Async ingest", http=f"{host}:{http_port}", udp=f"{host}:{udp_port}" if udp_port else "off", history=HISTORY_DIR)
+    if udp_port:
+        await asyncio.get_running_loop().create_datagram_endpoint(lambda: UdpIngest(srv), local_addr=(host, udp_port))
+    flusher = asyncio.create_task(srv.flush_loop())
+    try:
+        async with http:
+            await http.serve_forever()
+    finally:
+        flusher.cancel()
+        srv.flush()
+        runtime.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async sensor ingest; run the dashboard with PLANT_FOLLOW_INGEST=1 next to it")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT)
+    parser.add_argument("--udp-port", type=int, default=UDP_PORT, help="0 disables UDP")
+    a = parser.parse_args()
+    if runtime.FOLLOW_INGEST:
+        raise SystemExit("PLANT_FOLLOW_INGEST is set: that is the dashboard's mode, the ingest server writes the history")
+    try:
+        asyncio.run(serve(a.host, a.http_port, a.udp_port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,129 @@
+import asyncio
+import argparse
+import os
+import socket
+import time
+import numpy as np
+from replay import load_traces
+
+# ==========================================
+# Load generator for ingest_server.py
+# ==========================================
+# Replays the plant_data*.csv logs (cycled as often as needed) from N fake
+# devices and reports the samples/s the server actually took:
+#   python loadgen.py --mode get   --devices 20 --connections 32 --samples 50000
+#   python loadgen.py --mode batch --devices 20 --batch 200 --rate 5000
+#   python loadgen.py --mode udp   --devices 200 --batch 20
+# get   one GET /update_sensor per sample over keep-alive connections
+# batch POST /update_sensor_batch with --batch CSV lines in the firmware format
+# udp   datagrams of --batch firmware lines
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_logs(pattern=os.path.join(HERE, "plant_data*.csv")):
+    # Readings from every log as one array per column (schemas normalised by replay.py)
+    traces = load_traces(pattern)
+    return {c: np.concatenate([tr[c].to_numpy(dtype=float) for tr in traces]) for c in ("temp", "hum", "light", "soil")}
+
+
+def csv_lines(log, idx, ms):
+    # Firmware serial format: "ms,T,RH,light,soil,status,slope,eta,health"
+    return [f"{int(m)},{log['temp'][i]:.2f},{log['hum'][i]:.2f},{log['light'][i]:.0f},{log['soil'][i]:.3f},OK,0,-1,0"
+            for i, m in zip(idx, ms)]
+
+
+class Pacer:
+    # Shared token bucket: `rate` samples/s across all workers (0 = as fast as possible)
+    def __init__(self, rate):
+        self.rate = rate
+        self.start = time.monotonic()
+        self.sent = 0
+
+    async def take(self, n):
+        self.sent += n
+        if self.rate:
+            delay = self.sent / self.rate - (time.monotonic() - self.start)
+            if delay > 0: await asyncio.sleep(delay)
+
+
+async def http_worker(host, port, jobs, pacer, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            method, path, body, n = jobs.pop()
+            await pacer.take(n)
+            t0 = time.perf_counter()
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: text/csv\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(next((ln.split(b":", 1)[1] for ln in head.split(b"\r\n") if ln.lower().startswith(b"content-length")), b"0"))
+            if length: await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            if not head.startswith(b"HTTP/1.1 200"): errors.append(head.split(b"\r\n", 1)[0])
+    finally:
+        writer.close()
+
+
+def build_jobs(log, mode, devices, samples, batch):
+    # One job per request, round-robin over the devices; millis() keeps counting
+    # across replays of the log so every device sees a steady clock
+    n = len(log["soil"])
+    jobs = []
+    per_dev = {d: 0 for d in range(devices)}
+    step = 1 if mode == "get" else batch
+    for k in range(0, samples, step):
+        d = (k // step) % devices
+        i0 = per_dev[d]
+        idx = np.arange(i0, i0 + step) % n
+        ms = (np.arange(i0, i0 + step) * 1000.0)   # 1 sample/s of device time
+        per_dev[d] += step
+        dev = f"node-{d:03d}"
+        if mode == "get":
+            i = idx[0]
+            path = f"/update_sensor?device_id={dev}&temp={log['temp'][i]:.2f}&hum={log['hum'][i]:.2f}&soil={log['soil'][i]:.3f}&light={log['light'][i]:.0f}"
+            jobs.append(("GET", path, b"", 1))
+        else:
+            body = "\n".join(csv_lines(log, idx, ms)).encode()
+            if mode == "batch":
+                jobs.append(("POST", f"/update_sensor_batch?device_id={dev}&now_ms={int(ms[-1])}", body, step))
+            else:
+                jobs.append(("UDP", f"device_id={dev}&now_ms={int(ms[-1])}\n".encode() + body, None, step))
+    jobs.reverse()   # workers pop() from the end
+    return jobs
+
+
+async def run(a):
+    log = load_logs(a.logs)
+    jobs = build_jobs(log, a.mode, a.devices, a.samples, a.batch)
+    total = sum(j[3] for j in jobs)
+    pacer = Pacer(a.rate)
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    if a.mode == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for _, payload, _, n in reversed(jobs):
+            await pacer.take(n)
+            sock.sendto(payload, (a.host, a.udp_port))
+        sock.close()
+    else:
+        await asyncio.gather(*[http_worker(a.host, a.port, jobs, pacer, latencies, errors) for _ in range(a.connections)])
+    elapsed = time.perf_counter() - t0
+    print(f"📈 [Loadgen] {a.mode}: {total} samples in {elapsed:.2f}s = {total / elapsed:.0f} samples/s from {a.devices} devices")
+    if latencies:
+        p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+        print(f"   requests {len(latencies)}, latency p50 {p50:.2f} ms, p99 {p99:.2f} ms, errors {len(errors)}" + (f" (first: {errors[0].decode()})" if errors else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the CSV logs against ingest_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--udp-port", type=int, default=8061)
+    parser.add_argument("--mode", choices=("get", "batch", "udp"), default="batch")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100, help="samples per POST / datagram")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="samples/s, 0 = as fast as possible")
+    parser.add_argument("--logs", default=os.path.join(HERE, "plant_data*.csv"))
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+
+# ==========================================
+# Leveled, rate-limited structured logging
+# ==========================================
+#   log = get_logger("ingest")
+#   log.info("📡 [WiFi] sample", device="fern", soil=0.41)
+#   -> 2026-01-05 10:00:00 INFO  ingest 📡 [WiFi] sample device=fern soil=0.41
+# PLANT_LOG_LEVEL picks the level (default INFO), PLANT_LOG_FORMAT=json
+# writes one JSON object per line. Every (logger, event) pair has a token
+# bucket of RATE_BURST lines refilled at RATE_PER_S, so a busy ingest path
+# prints about one line a second instead of one per sample; what was held
+# back is reported as suppressed=N on the next line that gets through.
+# Disabled levels return before any formatting happens.
+
+LOG_LEVEL = os.environ.get("PLANT_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("PLANT_LOG_FORMAT", "text")
+RATE_PER_S = 1.0
+RATE_BURST = 10
+
+
+class StructFormatter(logging.Formatter):
+    def __init__(self, fmt="text"):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        name = record.name.rsplit(".", 1)[-1]
+        if self.fmt == "json":
+            return json.dumps({"time": ts, "level": record.levelname, "logger": name, "event": record.getMessage(), **fields},
+                              ensure_ascii=False, default=str)
+        parts = [f"{ts} {record.levelname:<5} {name} {record.getMessage()}"]
+        for k, v in fields.items():
+            v = f"{v:.4g}" if isinstance(v, float) else str(v)
+            parts.append(f"{k}={json.dumps(v, ensure_ascii=False) if (' ' in v or '=' in v or not v) else v}")
+        return " ".join(parts)
+
+
+class StructLogger:
+    def __init__(self, name, rate=RATE_PER_S, burst=RATE_BURST):
+        self.logger = logging.getLogger(f"plant.{name}")
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}   # event -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def _allow(self, event):
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(event)
+            if b is None:
+                b = self._buckets[event] = [self.burst, now, 0]
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate); b[1] = now
+            if b[0] < 1:
+                b[2] += 1
+                return None
+            b[0] -= 1
+            suppressed, b[2] = b[2], 0
+            return suppressed
+
+    def log(self, level, event, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._allow(event)
+        if suppressed is None:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(level, event, extra={"fields": fields})
+
+    def debug(self, event, **fields): self.log(logging.DEBUG, event, **fields)
+    def info(self, event, **fields): self.log(logging.INFO, event, **fields)
+    def warning(self, event, **fields): self.log(logging.WARNING, event, **fields)
+    def error(self, event, **fields): self.log(logging.ERROR, event, **fields)
+
+
+_configured = False
+
+
+def get_logger(name):
+    global _configured
+    if not _configured:
+        root = logging.getLogger("plant")
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(StructFormatter(LOG_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+        _configured = True
+    return StructLogger(name)
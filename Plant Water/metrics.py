@@ -0,0 +1,214 @@
+import bisect
+import functools
+import threading
+import time
+
+# ==========================================
+# In-process metrics (Prometheus text format)
+# ==========================================
+# Counters, gauges and histograms with the same names and label rules as the
+# Prometheus client, served by GET /metrics (render()). An update is a dict
+# lookup plus an add under a per-metric lock; a timed stage is two
+# perf_counter() calls. Values that already live elsewhere (queue depths,
+# serial reader counters) are read only when /metrics is scraped, through
+# set_function(). All metrics are defined below so the full list is in one place.
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_registry = []
+
+
+class _Timer:
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+
+
+class _Child:
+    # One label combination, pre-resolved so the hot path skips the key building
+    __slots__ = ("metric", "key")
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, n=1):
+        self.metric._inc(self.key, n)
+
+    def set(self, v):
+        self.metric._set(self.key, v)
+
+    def observe(self, v):
+        self.metric._observe(self.key, v)
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._children = {}
+        self._fn = None
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _Child(self, key)
+        return child
+
+    def set_function(self, fn):
+        # fn() -> a number, or {label value tuple: number}; called at scrape time
+        self._fn = fn
+        return self
+
+    def _samples(self):
+        if self._fn is not None:
+            v = self._fn()
+            return list(v.items()) if isinstance(v, dict) else [((), v)]
+        with self._lock:
+            return list(self._values.items())
+
+    def _label_str(self, key, extra=""):
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra: pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, v in self._samples():
+            lines.append(f"{self.name}{self._label_str(key)} {_num(v)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n=1, **labels):
+        self._inc(tuple(str(labels.get(k, "")) for k in self.labelnames), n)
+
+    def _inc(self, key, n):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, v, **labels):
+        self._set(tuple(str(labels.get(k, "")) for k in self.labelnames), v)
+
+    def _set(self, key, v):
+        with self._lock:
+            self._values[key] = v
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, v, **labels):
+        self._observe(tuple(str(labels.get(k, "")) for k in self.labelnames), v)
+
+    def time(self, **labels):
+        return self.labels(**labels).time()
+
+    def _observe(self, key, v):
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            h[0][i] += 1
+            h[1] += v
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total) in self._samples():
+            cum = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                bound = 'le="' + _num(le) + '"'
+                lines.append(f"{self.name}_bucket{self._label_str(key, bound)} {cum}")
+            lines.append(f"{self.name}_sum{self._label_str(key)} {_num(total)}")
+            lines.append(f"{self.name}_count{self._label_str(key)} {cum}")
+        return lines
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v):
+    if v == float("inf"): return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def timed(hist, **labels):
+    # Decorator: observe every call's duration
+    child = hist.labels(**labels)
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+def render():
+    out = []
+    for m in _registry:
+        try:
+            out.extend(m.render())
+        except Exception:
+            continue   # a failing callback must not take the whole scrape down
+    return "\n".join(out) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------- ingest pipeline ----------
+STAGE_SECONDS = Histogram("plant_stage_seconds", "Time per ingest stage and batch (parse, vpd_slope, forecast, health, events, store, publish)", ("stage",))
+SAMPLES = Counter("plant_samples_total", "Samples ingested", ("device", "source"))
+BATCH_SIZE = Histogram("plant_batch_samples", "Samples per ingested batch", buckets=(1, 2, 5, 10, 50, 100, 500, 1000, 5000))
+INGEST_QUEUE = Gauge("plant_ingest_queue_depth", "Jobs waiting for the ingest worker")
+INGEST_DROPPED = Counter("plant_ingest_dropped_total", "Jobs rejected because the ingest queue was full")
+INVALID_SAMPLES = Counter("plant_invalid_samples_total", "Samples rejected by validation", ("source",))
+STALE_SAMPLES = Counter("plant_stale_samples_total", "Batched samples older than the stored history (not acknowledged)", ("source",))
+
+# ---------- serial ----------
+SERIAL_BYTES = Counter("plant_serial_bytes_total", "Bytes read from serial ports", ("port",))
+SERIAL_LINES = Counter("plant_serial_lines_total", "Complete lines framed from serial ports", ("port",))
+SERIAL_DROPPED = Counter("plant_serial_lines_dropped_total", "Serial lines dropped (not 9 fields or bad numbers)", ("port",))
+SERIAL_RECONNECTS = Counter("plant_serial_reconnects_total", "Serial port reconnects", ("port",))
+
+# ---------- alerts / UI ----------
+ALERT_QUEUE = Gauge("plant_alert_queue_depth", "Telegram alerts queued or waiting for a rate-limit token")
+ALERTS_SENT = Counter("plant_alerts_sent_total", "Telegram messages sent (a digest counts once)")
+ALERTS_DROPPED = Counter("plant_alerts_dropped_total", "Telegram alerts dropped (full queue, or too many pending for a chat)")
+VIEW_SECONDS = Histogram("plant_update_view_seconds", "update_view render time")
+SSE_CLIENTS = Gauge("plant_sse_clients", "Open /stream subscriptions")
+SSE_DROPPED = Counter("plant_sse_dropped_total", "/stream subscribers dropped for not keeping up")
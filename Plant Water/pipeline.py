@@ -0,0 +1,153 @@
+import numpy as np
+from metrics import STAGE_SECONDS
+from health import load_rules
+from profiles import BUILTIN
+
+# ==========================================
+# Vectorized processing pipeline
+# ==========================================
+# One code path for every transport: the serial reader, /update_sensor and
+# /update_sensor_batch all build a columnar batch and call process_samples().
+# Everything except the per-device carry-over (the sliding slope fit in
+# regression.py, the watering detector in watering.py) is plain NumPy over the whole batch, so backfilling thousands
+# of buffered samples costs about the same as a handful of live ones.
+# Thresholds come from the device's plant profile (profiles.py); BUILTIN
+# holds the values this code always used.
+
+_VPD_SLOPE = STAGE_SECONDS.labels(stage="vpd_slope")
+_HEALTH = STAGE_SECONDS.labels(stage="health")
+_FORECAST = STAGE_SECONDS.labels(stage="forecast")
+ETA_BAND_Z = 1.645   # eta_lo / eta_hi = ETA at slope -/+ z standard errors (~90%)
+
+
+def make_batch(times, temp, hum, soil, light, status=None):
+    # Raw readings as float columns; NaN / missing readings count as 0 like before
+    clean = lambda v: np.nan_to_num(np.atleast_1d(np.asarray(v, dtype=float)), nan=0.0, posinf=0.0, neginf=0.0)
+    batch = {"time": np.atleast_1d(np.asarray(times, dtype="datetime64[ms]")),
+             "temp": clean(temp), "hum": clean(hum), "soil": clean(soil), "light": clean(light)}
+    if status is not None:   # the node's own status; None where it didn't report one
+        batch["status"] = np.atleast_1d(np.asarray(status, dtype=object))
+    return batch
+
+
+def calculate_vpd_batch(temp, hum):
+    # 0 wherever either reading is missing
+    temp = np.asarray(temp, dtype=float); hum = np.asarray(hum, dtype=float)
+    with np.errstate(all="ignore"):
+        es = 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
+        vpd = np.round(es * (1 - (hum / 100.0)), 3)
+    return np.where((temp == 0) | (hum == 0) | ~np.isfinite(vpd), 0.0, vpd)
+
+
+def soil_status_batch(soil, p=BUILTIN):
+    return np.select([soil < p.soil["thirsty"], soil > p.soil["too_wet"]], ["Thirsty", "Too Wet"], "OK").astype(object)
+
+
+def hour_of_day(times):
+    return (times.astype("datetime64[h]") - times.astype("datetime64[D]")).astype(np.int64)
+
+
+def slope_batch(dev, times, soil, restarts=()):
+    # Least-squares slope (per hour) over the device's sliding window, plus its standard error.
+    # The fit starts over at each index in `restarts` (waterings).
+    t_h = times.astype(np.int64) / 3.6e6
+    bounds = [0] + [int(i) for i in restarts if i > 0] + [len(soil)]
+    if len(restarts) and restarts[0] == 0:
+        dev.slope.reset()
+    slopes, errs = [], []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if a: dev.slope.reset()
+        sl, se = dev.slope.update_batch(t_h[a:b], soil[a:b])
+        slopes.append(sl); errs.append(se)
+    return np.concatenate(slopes), np.concatenate(errs)
+
+
+def watering_batch(dev, times, soil):
+    # Detect waterings and open a drying cycle for each one
+    idx, rises = dev.watering.scan(soil)
+    for i, rise in zip(idx, rises):
+        dev.cycles.add(times[i].astype(np.int64), soil[i], rise)
+    return idx, rises
+
+
+def eta_batch(soil, avg_slope, vpd, p=BUILTIN):
+    dry_factor = 1.0 + (vpd * p.eta["vpd_factor"])
+    with np.errstate(all="ignore"):
+        raw_eta = (soil - p.soil["empty"]) / np.abs(avg_slope)
+    return np.where(avg_slope < -p.eta["min_slope"], raw_eta / dry_factor, -1.0)
+
+
+def eta_band_batch(soil, slope, slope_se, vpd, z=ETA_BAND_Z, p=BUILTIN):
+    # Steeper slope -> earlier bound; a shallower slope that no longer dries -> -1 (open-ended)
+    return eta_batch(soil, slope - z * slope_se, vpd, p), eta_batch(soil, slope + z * slope_se, vpd, p)
+
+
+def forecast_batch(dev, times, soil, vpd, temp, light, watered):
+    # Feed the device's drying model (forecast.py), then forecast from the newest sample:
+    # dev.eta_forecast = (p10, p50, p90) hours to the profile's empty level, or None
+    p = dev.profile
+    dev.forecaster.update(times.astype(np.int64), soil, vpd, temp, light, watered)
+    dev.eta_forecast = dev.forecaster.forecast(float(soil[-1]), p.soil["empty"], p.eta["min_slope"])
+
+
+def get_smart_advice_batch(soil, light, eta, temp, hours, p=BUILTIN):
+    a, s = p.advice, p.soil
+    is_night = (light < a["night_light"]) | (hours >= a["night_start"]) | (hours < a["night_end"])
+    heat = temp > a["heat"]
+    water = (soil < s["water"]) | ((eta > 0) & (eta < p.eta["water_within_h"]))
+    conds = [heat, soil < s["critical"], water & is_night, water, soil > s["full"], is_night]
+    # The heat message stays a template (store.TEMPLATE_COLUMNS): filled from the row's temp when shown
+    msg = np.select(conds, ["🔥 Heat Wave! Temp is {temp:.1f}°C", "CRITICAL: Water NOW! 🩸", "Wait until morning 🌙", "Time to water! 💧",
+                            "Fully Hydrated 🌊", "Plantie is sleeping 💤"], "Plantie is growing 🌱").astype(object)
+    mood = np.select(conds, ["Critical", "Critical", "Sleepy", "Thirsty", "Happy", "Sleepy"], "Happy").astype(object)
+    return msg, mood
+
+
+def calculate_health_batch(soil, temp, hum, light, hours, rules=None, times=None):
+    # Tuple form of HealthRules.score (health.py); the default profile unless `rules` is given
+    h = (rules or load_rules()).score(soil, temp, light, hours, times)
+    return h["health"], h["h_soil"], h["h_temp"], h["h_light"], h["reason_list"]
+
+
+def process_samples(dev, batch):
+    # Columnar results for one device's batch, in time order
+    times, soil, temp, hum, light = batch["time"], batch["soil"], batch["temp"], batch["hum"], batch["light"]
+    hours = hour_of_day(times)
+    p = dev.profile   # one profile for the whole batch, even if a reload swaps it meanwhile
+    status = soil_status_batch(soil, p)
+    reported = np.zeros(len(soil), dtype=bool)
+    if "status" in batch:
+        reported = np.not_equal(batch["status"], None)
+        status = np.where(reported, batch["status"], status).astype(object)
+    with _VPD_SLOPE.time():
+        vpd = calculate_vpd_batch(temp, hum)
+        watered, rises = watering_batch(dev, times, soil)
+        avg_slope, slope_se = slope_batch(dev, times, soil, watered)
+        eta = eta_batch(soil, avg_slope, vpd, p)
+        eta_lo, eta_hi = eta_band_batch(soil, avg_slope, slope_se, vpd, p=p)
+    with _FORECAST.time():
+        forecast_batch(dev, times, soil, vpd, temp, light, watered)
+    with _HEALTH.time():
+        smart_msg, mood_state = get_smart_advice_batch(soil, light, eta, temp, hours, p)
+        health = p.health.score(soil, temp, light, hours, times)
+    return {"full_time": times, "temp": temp, "hum": hum, "light": light, "soil": soil,
+            "status": status, "status_dev": reported.astype(float), "vpd": vpd, "slopeh": avg_slope, "eta": eta, "eta_lo": eta_lo, "eta_hi": eta_hi,
+            "slope_se": slope_se, **health,
+            "smart_msg": smart_msg, "mood_state": mood_state, "watered": watered, "watered_rise": rises}
+
+
+def rederive(p, w):
+    # Stored rows (a store Window) -> the columns that depend on the plant
+    # profile, recomputed under `p`. Readings, slope and a status the node
+    # reported (status_dev) stay as recorded.
+    times, soil, temp, light = w.time, w["soil"], w["temp"], w["light"]
+    hours = hour_of_day(times)
+    status = w.labels("status")
+    status = np.where(w["status_dev"] == 1, status, soil_status_batch(soil, p)).astype(object)
+    eta = eta_batch(soil, w["slopeh"], w["vpd"], p)
+    eta_lo, eta_hi = eta_band_batch(soil, w["slopeh"], w["slope_se"], w["vpd"], p=p)
+    smart_msg, mood_state = get_smart_advice_batch(soil, light, eta, temp, hours, p)
+    health = p.health.score(soil, temp, light, hours, times)
+    del health["reason_list"]
+    return {"status": status, "eta": eta, "eta_lo": eta_lo, "eta_hi": eta_hi,
+            "smart_msg": smart_msg, "mood_state": mood_state, **health}
@@ -0,0 +1,222 @@
+import os
+import copy
+import json
+import time
+import tomllib
+import threading
+from health import load_rules, read_rules, profile_path, DEFAULT_PROFILE, DEVICE_PROFILES, PROFILE_DIR
+from logs import get_logger
+
+# ==========================================
+# Per-plant profiles (hot-reloaded)
+# ==========================================
+# Every threshold the server applies (status, ETA, advice, alert cooldown,
+# connection timeout, which health profile) comes from plants/default.toml,
+# overridden key by key by plants/<device_id>.toml. A ProfileStore polls the
+# mtimes of those files and of health_profiles/*.toml every POLL_S; a changed
+# file is parsed and validated first, and only a valid one replaces the last
+# good version (an invalid edit is logged and ignored, for plant files and
+# health profiles alike). Each device then gets
+# a new immutable PlantProfile; nothing is edited in place, so a batch always
+# sees one consistent set of thresholds. The dashboard swaps it in on the
+# ingest worker and rederives the rows in memory (see apply_profile()).
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PLANT_DIR = os.environ.get("PLANT_PROFILE_DIR", os.path.join(HERE, "plants"))
+POLL_S = 2.0
+
+# Built-in values, and the schema: a profile may only set these keys
+DEFAULTS = {
+    "health": None,   # None: PLANT_HEALTH_PROFILES / PLANT_HEALTH_PROFILE (health.py)
+    "soil": {"thirsty": 0.35, "too_wet": 0.85, "empty": 0.25, "critical": 0.30, "water": 0.40, "full": 0.90},
+    "eta": {"min_slope": 0.0005, "vpd_factor": 0.2, "water_within_h": 24},
+    "advice": {"heat": 30.0, "night_light": 100, "night_start": 22, "night_end": 7},
+    "alerts": {"cooldown_s": 30},
+    "ui": {"connection_timeout_s": 310},
+}
+
+log = get_logger("profiles")
+
+
+def merge(*layers):
+    out = copy.deepcopy(DEFAULTS)
+    for layer in layers:
+        for k, v in layer.items():
+            if isinstance(v, dict) and isinstance(out.get(k), dict): out[k].update(v)
+            else: out[k] = v
+    return out
+
+
+def check_keys(raw, where):
+    for k, v in raw.items():
+        if k not in DEFAULTS:
+            raise ValueError(f"{where}: unknown setting {k!r}")
+        if k == "health":
+            if not isinstance(v, str): raise ValueError(f"{where}: health must be a profile name")
+            continue
+        if not isinstance(v, dict):
+            raise ValueError(f"{where}: [{k}] must be a table")
+        for key, x in v.items():
+            if key not in DEFAULTS[k]:
+                raise ValueError(f"{where}: unknown setting {k}.{key}")
+            if isinstance(x, bool) or not isinstance(x, (int, float)):
+                raise ValueError(f"{where}: {k}.{key} must be a number")
+
+
+def validate(values, where, rules=load_rules):
+    s, e, a = values["soil"], values["eta"], values["advice"]
+    if not 0 <= s["empty"] <= s["critical"] <= s["water"] <= 1:
+        raise ValueError(f"{where}: soil needs 0 <= empty <= critical <= water <= 1")
+    if not 0 <= s["thirsty"] < s["too_wet"] <= 1 or not 0 <= s["full"] <= 1:
+        raise ValueError(f"{where}: soil needs 0 <= thirsty < too_wet <= 1 and full <= 1")
+    if e["min_slope"] <= 0 or e["vpd_factor"] < 0 or e["water_within_h"] <= 0:
+        raise ValueError(f"{where}: eta needs min_slope > 0, vpd_factor >= 0, water_within_h > 0")
+    if not (0 <= a["night_start"] <= 24 and 0 <= a["night_end"] <= 24):
+        raise ValueError(f"{where}: advice night hours must be 0-24")
+    if values["alerts"]["cooldown_s"] < 0 or values["ui"]["connection_timeout_s"] <= 0:
+        raise ValueError(f"{where}: alerts.cooldown_s >= 0 and ui.connection_timeout_s > 0")
+    try:
+        rules(values["health"])
+    except (OSError, ValueError, KeyError) as err:
+        raise ValueError(f"{where}: health profile {values['health']!r}: {err}")
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PlantProfile:
+    # Validated thresholds for one plant; replaced whole, never modified
+    def __init__(self, values, stamp=None, health=None):
+        self.values = values
+        self.soil = values["soil"]
+        self.eta = values["eta"]
+        self.advice = values["advice"]
+        self.alerts = values["alerts"]
+        self.ui = values["ui"]
+        self.health_name = values["health"]
+        self.health = health if health is not None else load_rules(self.health_name)
+        # Equal keys = same behaviour (the health file's stamp covers edits to it)
+        self.key = (json.dumps(values, sort_keys=True), stamp)
+
+
+class ProfileStore:
+    def __init__(self, root=PLANT_DIR, poll_s=POLL_S):
+        self.root = root
+        self.poll_s = poll_s
+        self.version = 0           # bumped whenever some device's profile is swapped
+        self._stamps = {}          # path -> (mtime_ns, size) at the last poll
+        self._files = {}           # plant file stem -> last valid contents
+        self._rules = {}           # health profile name -> (last valid HealthRules, its file's stamp)
+        self._profiles = {}        # device_id -> PlantProfile handed out
+        self._lock = threading.Lock()
+        self._thread = None
+        self.poll()
+
+    def get(self, device_id):
+        p = self._profiles.get(device_id)
+        if p is None:
+            with self._lock:
+                p = self._profiles.get(device_id)
+                if p is None:
+                    p = self._profiles[device_id] = self._build(device_id)
+        return p
+
+    def rules(self, name):
+        # Health rules as last read successfully (first use reads the file)
+        if name not in self._rules:
+            self._rules[name] = (read_rules(name), _stamp(profile_path(name)))
+        return self._rules[name][0]
+
+    def _build(self, device_id):
+        base = self._files.get("default", {})
+        health = {"health": DEVICE_PROFILES.get(device_id, DEFAULT_PROFILE)}
+        values = merge(health, base, self._files.get(device_id, {}))
+        try:
+            validate(values, f"{device_id}.toml", self.rules)
+        except ValueError as e:
+            # Valid on its own but not on top of the current default.toml
+            log.error("⚠️ [Profiles] Plant file does not fit the defaults, using default.toml", device=device_id, error=e)
+            values = merge(health, base)
+        rules = self.rules(values["health"])
+        return PlantProfile(values, self._rules[values["health"]][1], rules)
+
+    def _reload_rules(self, changed, stamps):
+        # Edited health profiles that are in use: only a valid file replaces the rules
+        for name in list(self._rules):
+            path = profile_path(name)
+            if path not in changed or path not in stamps: continue
+            try:
+                self._rules[name] = (read_rules(name), stamps[path])
+            except (OSError, ValueError, KeyError) as e:
+                log.error("⚠️ [Profiles] Invalid health profile, keeping the last good version", file=os.path.basename(path), error=e)
+                continue
+            log.info("🌱 [Profiles] Loaded", file=os.path.basename(path))
+
+    def _scan(self):
+        stamps = {}
+        for d in (self.root, PROFILE_DIR):
+            if not os.path.isdir(d): continue
+            for entry in os.scandir(d):
+                if entry.name.endswith(".toml"):
+                    stamps[entry.path] = _stamp(entry)
+        return stamps
+
+    def poll(self):
+        # -> ids of the devices whose profile changed (the new one is already in get())
+        stamps = self._scan()
+        if stamps == self._stamps:
+            return []
+        changed = {p for p in stamps.keys() | self._stamps.keys() if stamps.get(p) != self._stamps.get(p)}
+        self._reload_rules(changed, stamps)
+        plant_files = sorted((p for p in changed if os.path.dirname(p) == self.root),
+                             key=lambda p: os.path.basename(p) != "default.toml")   # default first
+        for path in plant_files:
+            stem = os.path.basename(path)[:-len(".toml")]
+            if path not in stamps:
+                self._files.pop(stem, None)
+                log.info("🌱 [Profiles] Removed", file=os.path.basename(path))
+                continue
+            try:
+                with open(path, "rb") as f:
+                    raw = tomllib.load(f)
+                check_keys(raw, os.path.basename(path))
+                base = {} if stem == "default" else self._files.get("default", {})
+                health = {"health": DEVICE_PROFILES.get(stem, DEFAULT_PROFILE)}
+                validate(merge(health, base, raw), os.path.basename(path), self.rules)
+            except (OSError, ValueError) as e:
+                log.error("⚠️ [Profiles] Invalid, keeping the last good version", file=os.path.basename(path), error=e)
+                continue
+            self._files[stem] = raw
+            log.info("🌱 [Profiles] Loaded", file=os.path.basename(path))
+        swapped = []
+        with self._lock:
+            for device_id, old in list(self._profiles.items()):
+                new = self._build(device_id)
+                if new.key != old.key:
+                    self._profiles[device_id] = new
+                    swapped.append(device_id)
+        # Only now: if a build raised, the next poll sees the same changes again
+        self._stamps = stamps
+        if swapped:
+            self.version += 1
+        return swapped
+
+    def start(self, on_change):
+        # on_change(device_ids) on the watcher thread after every swap
+        def run():
+            while True:
+                time.sleep(self.poll_s)
+                try:
+                    swapped = self.poll()
+                    if swapped: on_change(swapped)
+                except Exception as e:
+                    log.error("❌ [Profiles Error]", error=e)
+        if self._thread is None:
+            self._thread = threading.Thread(target=run, name="profile-watch", daemon=True)
+            self._thread.start()
+        return self
+
+
+BUILTIN = PlantProfile(merge({"health": DEFAULT_PROFILE}))
@@ -0,0 +1,174 @@
+import math
+import bisect
+from collections import deque
+import numpy as np
+
+# ==========================================
+# Sliding-window slope estimator
+# ==========================================
+# Least-squares slope of soil moisture (per hour) over the last `window_h`
+# hours, kept as running sums so each new sample is O(1) instead of
+# re-averaging a buffer. Times are stored relative to an origin that is moved
+# forward now and then, so the sums never grow large enough to lose precision.
+#
+# mode="theil-sen" reports the median of all pairwise slopes in the window
+# instead (robust to single bad readings); the pairwise slopes are kept in a
+# sorted list that is updated as points enter and leave, capped at
+# `max_points` points.
+#
+# update_batch() does the same fit for a whole NumPy batch at once (rolling
+# sums via cumsum + searchsorted) and leaves the state exactly as if each
+# sample had been added one by one. A NaN reading is skipped by both: it
+# reports the slope as of the sample before it.
+
+DEFAULT_WINDOW_H = 1.0     # 12 samples at the firmware's 5-minute interval
+MIN_SPAN_H = 0.0001        # same guard as the old finite difference
+REBASE_H = 24.0
+
+
+class SlidingRegression:
+    def __init__(self, window_h=DEFAULT_WINDOW_H, mode="ols", max_points=64):
+        if mode not in ("ols", "theil-sen"):
+            raise ValueError(f"unknown slope mode: {mode}")
+        self.window_h = window_h
+        self.mode = mode
+        self.max_points = max_points
+        self.points = deque()   # (t_h relative to origin, y)
+        self.origin = None      # absolute hours
+        self._reset_sums()
+        self._pairs = []        # sorted pairwise slopes (theil-sen only)
+
+    def _reset_sums(self):
+        self.n = 0
+        self.st = self.sy = self.stt = self.sty = self.syy = 0.0
+
+    def __len__(self):
+        return len(self.points)
+
+    def reset(self):
+        # Forget the window (e.g. after a watering; see watering.py)
+        self.points.clear()
+        self.origin = None
+        self._reset_sums()
+        self._pairs = []
+
+    # ---------- scalar path ----------
+    def add(self, t_h, y):
+        # t_h: absolute time in hours (e.g. epoch ms / 3.6e6)
+        if not (math.isfinite(t_h) and math.isfinite(y)):
+            return self.slope()
+        if self.origin is None:
+            self.origin = t_h
+        elif t_h - self.origin > REBASE_H:
+            self._rebase(t_h)
+        x = t_h - self.origin
+        if self.points:
+            x = max(x, self.points[-1][0])   # out-of-order readings count as "now"
+        while self.points and (x - self.points[0][0] > self.window_h or
+                               (self.mode != "ols" and len(self.points) >= self.max_points)):
+            self._evict()
+        if self.mode != "ols":
+            for px, py in self.points:
+                if x - px >= MIN_SPAN_H:
+                    bisect.insort(self._pairs, (y - py) / (x - px))
+        self.points.append((x, y))
+        self.n += 1; self.st += x; self.sy += y
+        self.stt += x * x; self.sty += x * y; self.syy += y * y
+        return self.slope()
+
+    def _evict(self):
+        x, y = self.points.popleft()
+        self.n -= 1; self.st -= x; self.sy -= y
+        self.stt -= x * x; self.sty -= x * y; self.syy -= y * y
+        if self.mode != "ols":
+            for px, py in self.points:
+                if px - x >= MIN_SPAN_H:
+                    del self._pairs[bisect.bisect_left(self._pairs, (py - y) / (px - x))]
+
+    def _rebase(self, t_h):
+        # Move the origin to now and recompute the sums from the window
+        shift = t_h - self.origin
+        self.origin = t_h
+        pts = [(x - shift, y) for x, y in self.points]
+        self.points = deque(pts)
+        self._reset_sums()
+        for x, y in pts:
+            self.n += 1; self.st += x; self.sy += y
+            self.stt += x * x; self.sty += x * y; self.syy += y * y
+        if self.mode != "ols":
+            # Shifted times round differently; rebuild so evictions still find their pairs
+            self._pairs = sorted((yj - yi) / (xj - xi) for i, (xi, yi) in enumerate(pts)
+                                 for xj, yj in pts[i + 1:] if xj - xi >= MIN_SPAN_H)
+
+    def _ols(self):
+        sxx = self.stt - self.st * self.st / self.n if self.n else 0.0
+        if self.n < 2 or sxx < MIN_SPAN_H ** 2:
+            return 0.0, sxx
+        return (self.sty - self.st * self.sy / self.n) / sxx, sxx
+
+    def slope(self):
+        if self.mode != "ols":
+            k = len(self._pairs)
+            if not k:
+                return 0.0
+            return self._pairs[k // 2] if k % 2 else 0.5 * (self._pairs[k // 2 - 1] + self._pairs[k // 2])
+        return self._ols()[0]
+
+    def stderr(self):
+        # Standard error of the least-squares slope (0 while under-determined)
+        b, sxx = self._ols()
+        if self.n < 3 or sxx < MIN_SPAN_H ** 2:
+            return 0.0
+        syy = self.syy - self.sy * self.sy / self.n
+        sse = max(syy - b * b * sxx, 0.0)
+        return float(np.sqrt(sse / (self.n - 2) / sxx))
+
+    # ---------- batch path ----------
+    def update_batch(self, t_h, y):
+        # Slope and its standard error after each sample of a time-ordered batch
+        t_h = np.asarray(t_h, dtype=float); y = np.asarray(y, dtype=float)
+        ok = np.isfinite(t_h) & np.isfinite(y)
+        if not ok.all():
+            # Fit the finite samples; the others repeat the result before them
+            prev = (self.slope(), self.stderr())
+            b, se = self.update_batch(t_h[ok], y[ok])
+            last = np.cumsum(ok) - 1
+            seen = last >= 0
+            out_b, out_se = np.full(len(y), prev[0]), np.full(len(y), prev[1])
+            out_b[seen], out_se[seen] = b[last[seen]], se[last[seen]]
+            return out_b, out_se
+        if len(y) == 0:
+            return np.empty(0), np.empty(0)
+        if self.mode != "ols":
+            slopes, errs = np.empty(len(y)), np.empty(len(y))
+            for i in range(len(y)):
+                slopes[i] = self.add(t_h[i], y[i]); errs[i] = self.stderr()
+            return slopes, errs
+
+        if self.origin is None:
+            self.origin = t_h[0]
+        prior_x = np.fromiter((p[0] for p in self.points), dtype=float, count=len(self.points))
+        prior_y = np.fromiter((p[1] for p in self.points), dtype=float, count=len(self.points))
+        x = np.maximum.accumulate(np.concatenate([prior_x, t_h - self.origin]))
+        yy = np.concatenate([prior_y, y])
+        # Sums centered on the batch's last point for precision (slope and residuals are shift-invariant)
+        x0 = x[-1]; xc = x - x0
+        cs = lambda v: np.concatenate([[0.0], np.cumsum(v)])
+        c_t, c_y, c_tt, c_ty, c_yy = cs(xc), cs(yy), cs(xc * xc), cs(xc * yy), cs(yy * yy)
+        end = np.arange(len(prior_x), len(x)) + 1
+        start = np.searchsorted(x, x[end - 1] - self.window_h, "left")
+        n = (end - start).astype(float)
+        st, sy = c_t[end] - c_t[start], c_y[end] - c_y[start]
+        stt, sty, syy = c_tt[end] - c_tt[start], c_ty[end] - c_ty[start], c_yy[end] - c_yy[start]
+        with np.errstate(all="ignore"):
+            sxx = stt - st * st / n
+            ok = (n >= 2) & (sxx >= MIN_SPAN_H ** 2)
+            b = np.where(ok, (sty - st * sy / n) / sxx, 0.0)
+            sse = np.maximum(syy - sy * sy / n - b * b * sxx, 0.0)
+            se = np.where(ok & (n >= 3), np.sqrt(sse / (n - 2) / sxx), 0.0)
+
+        # Keep only the current window and rebuild the running sums from it
+        keep = int(start[-1])
+        self.points = deque(zip(x[keep:].tolist(), yy[keep:].tolist()))
+        self._rebase(self.origin + x[-1] if x[-1] > REBASE_H else self.origin)
+        return b, np.nan_to_num(se)
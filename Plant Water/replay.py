@@ -0,0 +1,320 @@
+import os
+import glob
+import json
+import time
+import argparse
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+from urllib.parse import urlencode
+
+# ==========================================
+# Replay / simulation harness
+# ==========================================
+# Streams the recorded CSV logs (or a synthetic fleet cloned from them) back
+# into the ingest layer and reports what came out:
+#   direct  IngestQueue + ingest_samples with the recorded timestamps
+#   http    /update_sensor (or /update_sensor_batch with --batch) via the Flask test client
+#   serial  firmware lines into a pty per device, read by serial_ingest.SerialReader
+#   url     a running dashboard or ingest_server.py (--url), over HTTP
+# Pace with --speed 1 (recorded gaps), --speed 60 (a minute per second) or
+# --speed 0 (as fast as the target takes it). The report has throughput,
+# end-to-end latency (sent -> visible in the device's store) and how far the
+# recomputed eta / health are from what the log recorded. In-process targets
+# use a memory-only registry and never send Telegram alerts (--alerts to allow).
+#
+#   python replay.py --target direct --speed 0
+#   python replay.py --target http --fleet 50 --speed 600 --json replay.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("direct", "http", "serial", "url")
+ALIASES = {"temperature": "temp", "humidity": "hum", "eta_hours": "eta"}
+FIRMWARE_EPOCH = pd.Timestamp("2025-11-20 09:00")   # firmware dumps only carry millis(); start them here
+HEALTH_TOLERANCE = 5
+
+
+def load_trace(path):
+    # Any of our log layouts -> full_time, temp, hum, light, soil, status, eta_rec, health_rec
+    df = pd.read_csv(path)
+    df = df.drop(columns=[c for c in df if c.startswith("Unnamed")]).rename(columns=ALIASES)
+    if "full_time" in df:
+        t = pd.to_datetime(df["full_time"], errors="coerce")
+    else:
+        t = FIRMWARE_EPOCH + pd.to_timedelta(pd.to_numeric(df["timestamp"], errors="coerce"), unit="ms")
+    out = pd.DataFrame({"full_time": t})
+    for c in ("temp", "hum", "light", "soil"):
+        out[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0) if c in df else 0.0
+    out["status"] = df["status"].astype(str) if "status" in df else "OK"
+    out["eta_rec"] = pd.to_numeric(df["eta"], errors="coerce") if "eta" in df else np.nan
+    out["health_rec"] = pd.to_numeric(df["health"], errors="coerce") if "health" in df else np.nan
+    out = out[out["full_time"].notna()].sort_values("full_time", kind="stable").reset_index(drop=True)
+    out["trace"] = os.path.basename(path)
+    return out
+
+
+def load_traces(pattern=os.path.join(HERE, "plant_data*.csv")):
+    return [load_trace(p) for p in sorted(glob.glob(pattern))]
+
+
+def build_fleet(traces, fleet=0, jitter=0.0, seed=0):
+    # fleet=0: each trace is its own device, on its recorded clock. Otherwise
+    # `fleet` devices cycle through the traces, all shifted to start together,
+    # with optional seeded noise on the readings.
+    rng = np.random.default_rng(seed)
+    t0 = min(tr["full_time"].iloc[0] for tr in traces)
+    parts = []
+    for k in range(fleet or len(traces)):
+        tr = traces[k % len(traces)].copy()
+        if fleet:
+            tr["full_time"] = tr["full_time"] - tr["full_time"].iloc[0] + t0 + pd.Timedelta(milliseconds=int(rng.integers(0, 1000)))
+            if jitter:
+                for c, scale in (("soil", 0.01), ("temp", 0.2), ("hum", 0.5), ("light", 10)):
+                    tr[c] = tr[c] + rng.normal(0, scale * jitter, len(tr))
+        tr["device_id"] = f"replay-{k:03d}" if fleet else os.path.splitext(tr["trace"].iloc[0])[0].replace(" ", "_")
+        parts.append(tr)
+    return pd.concat(parts).sort_values("full_time", kind="stable").reset_index(drop=True)
+
+
+class VisibilityProbe:
+    # Marks when each sent sample shows up in its device's store (history.version)
+    def __init__(self, registry, poll_s=0.005):
+        self.registry = registry
+        self.poll_s = poll_s
+        self.sent = {}        # device_id -> [send time] in send order
+        self.base = {}        # device_id -> store version before the replay
+        self.latencies = []
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="replay-probe", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def mark(self, device_id, n, t):
+        with self._lock:
+            if device_id not in self.sent:
+                dev = self.registry.find(device_id)
+                self.base[device_id] = dev.history.version if dev else 0
+                self.sent[device_id] = []
+                self._seen[device_id] = 0
+            self.sent[device_id].extend([t] * n)
+
+    def _check(self):
+        now = time.perf_counter()
+        with self._lock:
+            for d, times in self.sent.items():
+                dev = self.registry.find(d)
+                if dev is None: continue
+                visible = min(dev.history.version - self.base[d], len(times))
+                if visible > self._seen[d]:
+                    self.latencies.extend(now - t for t in times[self._seen[d]:visible])
+                    self._seen[d] = visible
+
+    def pending(self):
+        with self._lock:
+            return sum(len(t) for t in self.sent.values()) - sum(self._seen.values())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._check()
+            time.sleep(self.poll_s)
+
+    def stop(self, timeout=10):
+        end = time.perf_counter() + timeout
+        while self.pending() and time.perf_counter() < end:
+            time.sleep(0.01)
+        self._stop.set(); self._thread.join()
+        self._check()
+
+
+def divergence(fleet, registry, base):
+    # Recomputed vs recorded eta / health, row by row per device
+    h_err, eta_err, eta_agree, rows = [], [], [], 0
+    for d, sent in fleet.groupby("device_id", sort=False):
+        dev = registry.find(d)
+        if dev is None: continue
+        w = dev.history.snapshot().tail(dev.history.version - base.get(d, 0))
+        n = min(len(w), len(sent))
+        rows += n
+        h_new, eta_new = w["health"][:n], w["eta"][:n]
+        h_rec, e_rec = sent["health_rec"].to_numpy()[:n], sent["eta_rec"].to_numpy()[:n]
+        ok = np.isfinite(h_rec)
+        h_err.append(np.abs(h_new[ok] - h_rec[ok]))
+        has_new = np.isfinite(eta_new) & (eta_new > 0)
+        has_rec = np.isfinite(e_rec) & (e_rec > 0)
+        eta_agree.append(has_new == has_rec)
+        both = has_new & has_rec
+        eta_err.append(np.abs(eta_new[both] - e_rec[both]))
+    h_err = np.concatenate(h_err) if h_err else np.empty(0)
+    eta_err = np.concatenate(eta_err) if eta_err else np.empty(0)
+    eta_agree = np.concatenate(eta_agree) if eta_agree else np.empty(0, dtype=bool)
+    pct = lambda a, q: float(np.percentile(a, q)) if len(a) else None
+    return {"rows": rows,
+            "health_mae": float(h_err.mean()) if len(h_err) else None,
+            "health_p95_abs": pct(h_err, 95),
+            f"health_within_{HEALTH_TOLERANCE}": float((h_err <= HEALTH_TOLERANCE).mean()) if len(h_err) else None,
+            "eta_estimate_agreement": float(eta_agree.mean()) if len(eta_agree) else None,
+            "eta_median_abs_h": pct(eta_err, 50),
+            "eta_p95_abs_h": pct(eta_err, 95)}
+
+
+class Replayer:
+    def __init__(self, target="direct", speed=0.0, batch=1, url=None, alerts=False, history=""):
+        self.target = target
+        self.speed = speed
+        self.batch = max(1, batch)
+        self.url = url
+        if target != "url":
+            # In-process: a memory-only (or scratch) registry, never the live history
+            os.environ["PLANT_HISTORY_DIR"] = history
+            os.environ.pop("PLANT_FOLLOW_INGEST", None)
+            import dashboard
+            import runtime
+            self.dash = dashboard
+            if not alerts:
+                runtime.send_telegram_message = lambda message: None
+        self.fakes = {}
+        self.readers = []
+
+    # ---------- senders: (device_id, rows DataFrame) -> None ----------
+    def _send_direct(self, d, rows):
+        from pipeline import make_batch
+        dash = self.dash
+        dev = dash.devices.get(d)
+        batch = make_batch(rows["full_time"].to_numpy("datetime64[ms]"), rows["temp"].to_numpy(), rows["hum"].to_numpy(),
+                           rows["soil"].to_numpy(), rows["light"].to_numpy(), rows["status"].to_numpy(object))
+        while not dash.ingest.submit(dash.ingest_samples, dev, batch, "Replay"):
+            time.sleep(0.001)   # queue full: wait instead of dropping, the replay is the producer
+
+    def _csv_body(self, rows):
+        ms = (rows["full_time"] - rows["full_time"].iloc[0]).dt.total_seconds().mul(1000).astype(np.int64)
+        return "\n".join(f"{m},{r.temp},{r.hum},{r.light},{r.soil},{r.status},0,-1,0" for m, r in zip(ms, rows.itertuples()))
+
+    def _get_path(self, d, r):
+        return "/update_sensor?" + urlencode({"device_id": d, "temp": r.temp, "hum": r.hum, "soil": r.soil, "light": r.light})
+
+    def _send_http(self, d, rows, get):
+        if len(rows) == 1:
+            r = get(self._get_path(d, rows.iloc[0]), None)
+        else:
+            last = int((rows["full_time"].iloc[-1] - rows["full_time"].iloc[0]).total_seconds() * 1000)
+            r = get("/update_sensor_batch?" + urlencode({"device_id": d, "now_ms": last}), self._csv_body(rows))
+        if r != 200:
+            self.errors += 1
+
+    def _send_serial(self, d, rows):
+        ms = (rows["full_time"] - rows["full_time"].iloc[0]).dt.total_seconds().mul(1000).astype(np.int64)
+        data = "".join(f"{m},{r.temp},{r.hum},{r.light},{r.soil},{r.status},0,-1,0\r\n" for m, r in zip(ms, rows.itertuples()))
+        self.fakes[d].write(data.encode())
+
+    def _sender(self, fleet):
+        if self.target == "direct":
+            return self._send_direct
+        if self.target == "http":
+            client = self.dash.server.test_client()
+            def local(path, body):
+                return (client.get(path) if body is None else client.post(path, data=body, content_type="text/csv")).status_code
+            return lambda d, rows: self._send_http(d, rows, local)
+        if self.target == "url":
+            import requests
+            session = requests.Session()
+            def remote(path, body):
+                url = self.url.rstrip("/") + path
+                return (session.get(url, timeout=10) if body is None else session.post(url, data=body, headers={"Content-Type": "text/csv"}, timeout=10)).status_code
+            return lambda d, rows: self._send_http(d, rows, remote)
+        # serial: one fake pty device and one reader per replayed device
+        from fake_serial import FakeSerialDevice
+        from serial_ingest import SerialReader
+        for d in fleet["device_id"].unique():
+            self.fakes[d] = FakeSerialDevice(lines=["-"])
+            self.readers.append(SerialReader(self.fakes[d].port, d, 115200, self.dash.on_serial_batch).start())
+        while not all(r.connected for r in self.readers):
+            time.sleep(0.01)
+        time.sleep(0.05)   # past the reader's reset_input_buffer()
+        return self._send_serial
+
+    def run(self, fleet):
+        self.errors = 0
+        send = self._sender(fleet)
+        probe = VisibilityProbe(self.dash.devices).start() if self.target != "url" else None
+        lat = []
+        t_rec = fleet["full_time"].to_numpy("datetime64[ms]").astype(np.int64)
+        t_rec = (t_rec - t_rec[0]) / 1000.0
+        dev_ids = fleet["device_id"].to_numpy(object)
+        quiet = contextlib.redirect_stdout(open(os.devnull, "w")) if self.target != "url" else contextlib.nullcontext()
+        start = time.perf_counter()
+        with quiet:
+            i, n = 0, len(fleet)
+            while i < n:
+                if self.speed:
+                    delay = start + t_rec[i] / self.speed - time.perf_counter()
+                    if delay > 0: time.sleep(delay)
+                # Up to --batch consecutive rows of the same device go as one request / write
+                j = i + 1
+                while j < n and j - i < self.batch and dev_ids[j] == dev_ids[i] and (not self.speed or t_rec[j] / self.speed <= time.perf_counter() - start):
+                    j += 1
+                d = dev_ids[i]
+                t0 = time.perf_counter()
+                if probe is not None: probe.mark(d, j - i, t0)
+                send(d, fleet.iloc[i:j])
+                lat.append(time.perf_counter() - t0)
+                i = j
+            if probe is not None:
+                self.dash.ingest.join()
+                probe.stop()
+        elapsed = time.perf_counter() - start
+        for r in self.readers: r.stop()
+        for f in self.fakes.values(): f.stop()
+
+        ms = lambda a, q: round(float(np.percentile(a, q)) * 1000, 3) if len(a) else None
+        latencies = np.array(probe.latencies if probe is not None else lat)
+        report = {"target": self.target, "speed": self.speed or "max", "batch": self.batch,
+                  "devices": int(fleet["device_id"].nunique()), "samples": int(n), "seconds": round(elapsed, 3),
+                  "samples_per_s": round(n / elapsed, 1), "errors": self.errors,
+                  "latency": {"kind": "visible in store" if probe is not None else "request round trip",
+                              "p50_ms": ms(latencies, 50), "p90_ms": ms(latencies, 90), "p99_ms": ms(latencies, 99),
+                              "max_ms": round(float(latencies.max()) * 1000, 3) if len(latencies) else None}}
+        if probe is not None:
+            report["visible"] = len(probe.latencies)
+            report["dropped"] = self.dash.ingest.dropped
+            report["divergence"] = divergence(fleet, self.dash.devices, probe.base)
+            # Only the direct target replays the recorded clock; elsewhere the server stamps arrival time
+            report["divergence"]["times"] = "recorded" if self.target == "direct" else "arrival"
+        return report
+
+
+def print_report(r):
+    print(f"▶️ [Replay] {r['target']} @ {r['speed']}{'' if r['speed'] == 'max' else 'x'}: {r['samples']} samples from {r['devices']} devices in {r['seconds']}s = {r['samples_per_s']} samples/s (errors {r['errors']})")
+    L = r["latency"]
+    print(f"   latency ({L['kind']}): p50 {L['p50_ms']} ms, p90 {L['p90_ms']} ms, p99 {L['p99_ms']} ms, max {L['max_ms']} ms")
+    if "divergence" in r:
+        D = r["divergence"]
+        fmt = lambda v: "n/a" if v is None else f"{v:.3f}"
+        print(f"   divergence over {D['rows']} rows ({D['times']} times): health MAE {fmt(D['health_mae'])}, "
+              f"within ±{HEALTH_TOLERANCE} {fmt(D[f'health_within_{HEALTH_TOLERANCE}'])}, "
+              f"eta agreement {fmt(D['eta_estimate_agreement'])}, eta |Δ| median {fmt(D['eta_median_abs_h'])} h")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the recorded CSV logs through the ingest layer")
+    parser.add_argument("--target", choices=TARGETS, default="direct")
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, N = N times faster, 0 = max")
+    parser.add_argument("--batch", type=int, default=1, help="consecutive samples per request / write")
+    parser.add_argument("--fleet", type=int, default=0, help="synthetic devices cloned from the logs (0 = one per log)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="noise on the cloned readings (1 = typical sensor noise)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--logs", default=os.path.join(HERE, "plant_data*.csv"))
+    parser.add_argument("--url", default="http://127.0.0.1:8050", help="server for --target url")
+    parser.add_argument("--history", default="", help="scratch history dir for in-process targets (default: memory only)")
+    parser.add_argument("--alerts", action="store_true", help="let Critical samples send Telegram alerts")
+    parser.add_argument("--json", help="also write the report here")
+    a = parser.parse_args()
+    fleet = build_fleet(load_traces(a.logs), a.fleet, a.jitter, a.seed)
+    report = Replayer(a.target, a.speed, a.batch, a.url, a.alerts, a.history).run(fleet)
+    print_report(report)
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
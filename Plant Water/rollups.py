@@ -0,0 +1,120 @@
+import numpy as np
+
+# ==========================================
+# Multi-resolution rollups
+# ==========================================
+# min / max / mean / last per fixed time bucket (5 min, 1 h, 1 day), updated
+# on ingest with reduceat over the batch, so a 30-day view reads a few hundred
+# precomputed buckets instead of every raw sample. Buckets live in the same
+# mirrored ring layout as store.py: a window is always one contiguous slice.
+# Only the newest bucket is ever modified in place (it is still filling up).
+
+ROLLUP_COLUMNS = ("soil", "temp", "hum", "light")
+LEVELS = (("5min", 5 * 60 * 1000, 12 * 24 * 14),      # name, bucket ms, buckets kept (2 weeks)
+          ("1h", 3600 * 1000, 24 * 400),              # ~13 months
+          ("1d", 24 * 3600 * 1000, 365 * 10))         # 10 years
+
+
+class RollupLevel:
+    def __init__(self, name, bucket_ms, capacity, columns=ROLLUP_COLUMNS):
+        self.name = name
+        self.bucket_ms = bucket_ms
+        self.capacity = capacity
+        self.count = 0   # buckets ever opened
+        size = 2 * capacity
+        self._key = np.zeros(size, dtype=np.int64)   # bucket number (epoch ms // bucket_ms)
+        self._agg = {c: {"min": np.zeros(size), "max": np.zeros(size), "sum": np.zeros(size),
+                         "n": np.zeros(size, dtype=np.int64), "last": np.zeros(size)} for c in columns}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def update(self, t_ms, cols):
+        # t_ms: non-decreasing epoch ms for the batch; cols: {column: values}
+        keys = np.asarray(t_ms, dtype=np.int64) // self.bucket_ms
+        if len(keys) == 0:
+            return
+        if self.count:
+            keys = np.maximum(keys, self._key[(self.count - 1) % self.capacity])
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[first[1:], len(keys)]
+        groups = {}
+        for c, agg in self._agg.items():
+            v = np.asarray(cols[c], dtype=float)
+            groups[c] = {"min": np.minimum.reduceat(v, first), "max": np.maximum.reduceat(v, first),
+                         "sum": np.add.reduceat(v, first), "n": ends - first, "last": v[ends - 1]}
+        ukeys = keys[first]
+
+        skip = 0
+        if self.count and ukeys[0] == self._key[(self.count - 1) % self.capacity]:
+            # Fold the first group into the bucket that is still open
+            p = (self.count - 1) % self.capacity
+            for c, agg in self._agg.items():
+                g = groups[c]
+                for q in (p, p + self.capacity):
+                    agg["min"][q] = min(agg["min"][q], g["min"][0]); agg["max"][q] = max(agg["max"][q], g["max"][0])
+                    agg["sum"][q] += g["sum"][0]; agg["n"][q] += g["n"][0]; agg["last"][q] = g["last"][0]
+            skip = 1
+
+        m = len(ukeys)
+        i = max(skip, m - self.capacity)
+        while i < m:
+            p = (self.count + i - skip) % self.capacity
+            k = min(m - i, self.capacity - p)
+            for q in (p, p + self.capacity):
+                self._key[q:q + k] = ukeys[i:i + k]
+                for c, agg in self._agg.items():
+                    for f, arr in agg.items():
+                        arr[q:q + k] = groups[c][f][i:i + k]
+            i += k
+        self.count += m - skip
+
+    def window(self, start_ms=None, end_ms=None, column="soil"):
+        # {"time", "mean", "min", "max", "last"} for the buckets overlapping [start_ms, end_ms]
+        n = len(self)
+        hi = self.count % self.capacity + self.capacity
+        lo = hi - n
+        keys = self._key[lo:hi]
+        i0 = 0 if start_ms is None else int(np.searchsorted(keys, start_ms // self.bucket_ms, "left"))
+        i1 = n if end_ms is None else int(np.searchsorted(keys, end_ms // self.bucket_ms, "right"))
+        sl = slice(lo + i0, lo + max(i0, i1))
+        agg = self._agg[column]
+        with np.errstate(all="ignore"):
+            mean = agg["sum"][sl] / agg["n"][sl]
+        # Buckets are plotted at their midpoint
+        t = (self._key[sl] * self.bucket_ms + self.bucket_ms // 2).astype("datetime64[ms]")
+        return {"time": t, "mean": mean, "min": agg["min"][sl].copy(), "max": agg["max"][sl].copy(), "last": agg["last"][sl].copy()}
+
+    def points_in(self, span_ms):
+        return span_ms // self.bucket_ms + 1
+
+
+class Rollups:
+    def __init__(self, levels=LEVELS, columns=ROLLUP_COLUMNS):
+        self.columns = columns
+        self.levels = {name: RollupLevel(name, ms, cap, columns) for name, ms, cap in levels}
+        self._last_ms = None
+
+    def update(self, cols):
+        # Same columnar results the store gets (see pipeline.process_samples)
+        t_ms = np.asarray(cols["full_time"], dtype="datetime64[ms]").astype(np.int64)
+        if len(t_ms) == 0:
+            return
+        if self._last_ms is not None:
+            t_ms = np.maximum(t_ms, self._last_ms)
+        t_ms = np.maximum.accumulate(t_ms)
+        self._last_ms = t_ms[-1]
+        for level in self.levels.values():
+            level.update(t_ms, cols)
+
+    def choose(self, span_ms, raw_points, max_points):
+        # Finest resolution that keeps the graph under max_points ("raw" = the samples themselves)
+        if raw_points <= max_points:
+            return "raw"
+        for name, level in self.levels.items():
+            if level.points_in(span_ms) <= max_points:
+                return name
+        return list(self.levels)[-1]
+
+    def window(self, level, start_ms=None, end_ms=None, column="soil"):
+        return self.levels[level].window(start_ms, end_ms, column)
@@ -0,0 +1,222 @@
+import os
+import numpy as np
+from datetime import datetime
+from devices import DeviceRegistry
+from ingest import IngestQueue
+from pipeline import process_samples, watering_batch, forecast_batch, rederive
+from forecast import save_forecaster
+from alerts import AlertDispatcher
+from broadcast import Broadcaster
+from store import FLOAT_COLUMNS, CATEGORY_COLUMNS, fill
+import metrics
+from metrics import STAGE_SECONDS, SAMPLES, BATCH_SIZE
+from logs import get_logger
+
+# ==========================================
+# Ingest runtime (no UI)
+# ==========================================
+# What happens to samples once a route or serial reader has parsed them: the
+# device registry, the ingest worker, Telegram alerts, the live broadcaster and
+# the work done on the worker (pipeline, events, store, publish). dashboard.py
+# puts the Dash app on top of this; ingest_server.py uses it without Dash.
+
+# 🔑 Telegram Configuration
+TELEGRAM_TOKEN = "7507833046:AAFWv9bFPnWoaz-mSOjJ4142itB8I37NRXQ"
+TELEGRAM_CHAT_ID = "8414366426"
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")   # point at a stub server for testing
+
+# 💾 On-disk history (append-only segments, reloaded on start; empty = memory only)
+HISTORY_DIR = os.environ.get("PLANT_HISTORY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history"))
+# ⚡ UI only: ingest_server.py owns ingest and writes HISTORY_DIR, the dashboard tails it
+FOLLOW_INGEST = os.environ.get("PLANT_FOLLOW_INGEST") == "1"
+# 🌱 Plant profiles (plants/*.toml) are re-read when they change; stored rows are rederived in chunks this big
+RECOMPUTE_CHUNK = 5000
+
+# Global variables
+devices = DeviceRegistry(root=HISTORY_DIR, readonly=FOLLOW_INGEST).load_saved()   # device_id -> DeviceState (history shard, slope, events, cooldown)
+ingest = IngestQueue().start()   # the only writer of device state; routes and serial just enqueue
+alerts = AlertDispatcher(TELEGRAM_TOKEN, TELEGRAM_API_BASE).start()
+live = Broadcaster()   # SSE fan-out to open dashboards (/stream)
+LIVE_POINTS = 50       # newest points included in each /stream message
+log = get_logger("runtime")
+
+# 📈 /metrics: counters that already live on these objects are read at scrape time
+metrics.INGEST_QUEUE.set_function(ingest.depth)
+metrics.INGEST_DROPPED.set_function(lambda: ingest.dropped)
+metrics.ALERT_QUEUE.set_function(alerts.depth)
+metrics.ALERTS_SENT.set_function(lambda: alerts.sent)
+metrics.ALERTS_DROPPED.set_function(lambda: alerts.dropped)
+metrics.SSE_CLIENTS.set_function(lambda: len(live))
+metrics.SSE_DROPPED.set_function(lambda: live.dropped)
+_EVENTS = STAGE_SECONDS.labels(stage="events")
+_STORE = STAGE_SECONDS.labels(stage="store")
+_PUBLISH = STAGE_SECONDS.labels(stage="publish")
+
+# ==========================================
+# Ingest worker jobs
+# ==========================================
+
+def send_telegram_message(message):
+    # Queued; the dispatcher handles connection reuse, rate limiting and digests
+    log.info("📤 [Telegram] Queued", message=message)
+    alerts.send(message, TELEGRAM_CHAT_ID)
+
+def log_health_events(dev, res):
+    # Event log: issues as they appear, "Restored" once they have all stayed away
+    # for events.CLEAR_S (dev.reasons keeps a flapping reason from re-logging)
+    reasons = res["reasons"]
+    prev = np.empty(len(reasons), dtype=object)
+    prev[1:] = reasons[:-1]
+    # Only samples whose reasons differ from the previous one (and the newest, for
+    # pending clears) can change the set
+    times = res["full_time"].astype(np.int64)
+    idx = np.flatnonzero(reasons != prev)
+    if idx[-1] != len(reasons) - 1: idx = np.append(idx, len(reasons) - 1)
+    for i in idx:
+        # Keyed on the reason's template, so a value drifting inside one band is one issue
+        current = res["reason_list"][i]
+        for t, kind, reason in dev.reasons.update(int(times[i]), current, res["health"][i]):
+            if kind == "issue":
+                devices.events.add(dev.device_id, t, "issue", f"⚠️ {current[reason]}", reason=reason)
+            else:
+                devices.events.add(dev.device_id, t, "restored", "✅ Restored")
+
+def log_watering_events(dev, res):
+    for i, rise in zip(res["watered"], res["watered_rise"]):
+        devices.events.add(dev.device_id, res["full_time"][i].astype(np.int64), "watered", f"💧 Watered (+{rise:.2f})")
+        log.info("💧 [Watering] slope reset", device=dev.device_id, rise=round(float(rise), 3))
+
+def shown_eta(dev, latest):
+    # (eta, lo, hi) for the ETA card: the drying model's p50 and p10-p90 once it
+    # has learned enough (forecast.py), before that the slope ETA and its band
+    q = dev.eta_forecast
+    if q is None:
+        return float(latest["eta"]), float(latest["eta_lo"]), float(latest["eta_hi"])
+    return q[1], q[0], q[2]
+
+def publish_live(dev, res, new_events):
+    # Push the change to open dashboards; "version"/"events" match what poll() returns
+    version = {"device": dev.device_id, "version": dev.history.version, "rev": dev.history.revision, "devices": devices.generation}
+    latest = {c: float(res[c][-1]) for c in ("temp", "hum", "light", "soil", "eta", "eta_lo", "eta_hi", "health")}
+    latest["eta"], latest["eta_lo"], latest["eta_hi"] = shown_eta(dev, latest)
+    latest.update(time=str(res["full_time"][-1]), status=str(res["status"][-1]), smart_msg=fill(str(res["smart_msg"][-1]), res, -1), mood_state=str(res["mood_state"][-1]))
+    # The browser extends its graphs with these itself (assets/live.js, plant.apply);
+    # seq is the first point's sequence number, dry the soil graph's dry line
+    k = slice(-LIVE_POINTS, None)
+    points = {"time": res["full_time"][k].astype(str).tolist(), "soil": res["soil"][k].tolist(), "light": res["light"][k].tolist(),
+              "seq": version["version"] - len(res["soil"][k]), "dry": dev.profile.soil["thirsty"]}
+    live.publish("sample", {"version": version, "latest": latest, "points": points}, key=dev.device_id)
+    if new_events:
+        publish_events(dev.device_id)
+
+def publish_events(device_id):
+    live.publish("event", {"events": {"device": device_id, "events": devices.events.last_id(device_id)},
+                           "new": devices.events.query(device_id, limit=5)}, key=device_id)
+
+def ingest_samples(dev, batch, source):
+    # Runs on the ingest worker only (see ingest.py). Shared by serial and WiFi.
+    if len(batch["time"]) == 0: return
+    # Ring and segment files store these exact times; the pipeline sees them too
+    batch = {**batch, "time": dev.history.ordered(batch["time"])}
+    res = process_samples(dev, batch)
+    last_event = devices.events.last_id(dev.device_id)
+    with _EVENTS.time():
+        log_watering_events(dev, res)
+        log_health_events(dev, res)
+
+    # Telegram Trigger (newest sample only; a backfilled batch raises at most one alert)
+    smart_msg = fill(str(res["smart_msg"][-1]), res, -1)
+    time_since_last_msg = (datetime.now() - dev.last_message_time).total_seconds()
+    cooldown = dev.profile.alerts["cooldown_s"]
+    if res["mood_state"][-1] == "Critical":
+        if time_since_last_msg > cooldown:
+            send_telegram_message(f"🚨 ALERT ({source}, {dev.device_id}): {smart_msg}")
+            devices.events.add(dev.device_id, res["full_time"][-1].astype(np.int64), "alert", f"🚨 {smart_msg}")
+            dev.last_message_time = datetime.now()
+        else:
+            log.info("⏳ [Telegram] Cooling down", device=dev.device_id, wait_s=int(cooldown-time_since_last_msg))
+
+    dev.last_status = res["status"][-1]
+    with _STORE.time():
+        dev.history.extend(res)
+        dev.rollups.update(res)
+        if dev.segments is not None:
+            dev.segments.append(res)
+    with _PUBLISH.time():
+        publish_live(dev, res, devices.events.last_id(dev.device_id) != last_event)
+    n = len(res["soil"])
+    SAMPLES.labels(device=dev.device_id, source=source).inc(n)
+    BATCH_SIZE.observe(n)
+    icon = "🔌" if source == "USB" else "📡"
+    # Rate-limited: at a few hundred batches/s this is about one line a second
+    log.info(f"{icon} [{source}] sample", device=dev.device_id, T=float(res['temp'][-1]), S=float(res['soil'][-1]), msg=smart_msg, buffered=n-1)
+
+def apply_segment_records(dev, rec):
+    # Follow mode, on the ingest worker: ingest_server.py already ran the pipeline
+    # (sent the alerts, logged the events); rebuild the in-memory views from its records
+    cats = dev.segments.categories
+    res = {"full_time": rec["time"].astype("datetime64[ms]"), **{c: rec[c] for c in FLOAT_COLUMNS},
+           **{c: cats[c].decode(rec[c]) for c in CATEGORY_COLUMNS}}
+    watered, _ = watering_batch(dev, res["full_time"], res["soil"])   # drying cycles for /cycles
+    forecast_batch(dev, res["full_time"], res["soil"], res["vpd"], res["temp"], res["light"], watered)
+    dev.last_status = res["status"][-1]
+    dev.last_wifi_update = datetime.now()
+    dev.history.extend(res)
+    dev.rollups.update(res)
+    publish_live(dev, res, False)
+
+def apply_followed_events(new):
+    # Follow mode: events ingest_server.py appended to events.jsonl
+    for device_id in sorted({ev["device"] for ev in new}):
+        publish_events(device_id)
+
+def apply_profile(dev, profile):
+    # Ingest worker: new samples use the new profile from here on; stored rows
+    # are rederived newest first, one chunk per job so live ingest interleaves
+    dev.profile = profile
+    snap = dev.history.snapshot()
+    for hi in range(snap.count, snap.count - len(snap), -RECOMPUTE_CHUNK):
+        ingest.submit(rederive_rows, dev, profile, max(snap.count - len(snap), hi - RECOMPUTE_CHUNK), hi)
+    log.info("🌱 [Profiles] Applied", device=dev.device_id, health=profile.health_name, rows=len(snap))
+
+def rederive_rows(dev, profile, lo, hi):
+    if dev.profile is not profile:
+        return   # superseded by a newer edit, which queued its own chunks
+    w = dev.history.snapshot().rows(lo, hi)
+    if w is None or len(w) == 0:
+        return
+    cols = rederive(profile, w)
+    dev.history.rewrite(lo, cols)
+    if hi == dev.history.count:
+        dev.last_status = cols["status"][-1]
+    if dev.segments is not None and not devices.readonly:
+        # Rows in the ring and records on disk match one to one, counted from the newest
+        # (a follower leaves the files to the writer and only rederives its own copy)
+        dev.segments.rewrite_tail(dev.history.count - lo, cols)
+    live.publish("sample", {"version": {"device": dev.device_id, "version": dev.history.version, "rev": dev.history.revision,
+                                        "devices": devices.generation}}, key=dev.device_id)
+
+def on_profiles_changed(device_ids):
+    # Profile watcher thread (profiles.py): hand each swap to the ingest worker
+    for device_id in device_ids:
+        dev = devices.find(device_id)
+        if dev is not None:
+            ingest.submit(apply_profile, dev, devices.profiles.get(device_id))
+
+def save_forecasts():
+    # Each device's drying model, so a restart picks up where it left off (forecast.py)
+    for device_id in devices.ids():
+        save_forecaster(device_id, devices.find(device_id).forecaster)
+    log.info("💾 [Forecast] Saved", devices=len(devices))
+
+def shutdown():
+    # Finish what is queued, then save on the worker (the models' only writer).
+    # A follower rebuilds its models from the writer's history and saves nothing;
+    # nor does a memory-only run
+    if HISTORY_DIR and not FOLLOW_INGEST:
+        ingest.submit(save_forecasts)
+    ingest.join()
+
+def start_profile_watch():
+    devices.profiles.start(on_profiles_changed)
+    log.info("[System] Watching plant profiles", dir=devices.profiles.root)
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import time
+import bisect
+import numpy as np
+from store import FLOAT_COLUMNS, CATEGORY_COLUMNS, Categories
+from logs import get_logger
+
+# ==========================================
+# Append-only on-disk history
+# ==========================================
+# history/<device_id>/
+#   2025120109.seg   fixed-size binary records, one file per hour of samples
+#   index.json       segment list with first/last timestamp (for range lookups)
+#   labels.json      category code -> label tables for the *_code fields
+# Records are only ever appended (a plant profile change patches the derived
+# columns of the newest ones in place, see rewrite_tail()). On startup the segments are memory-mapped
+# and the newest rows are copied straight into the in-memory ring, with no CSV
+# parsing and no per-row Python work. A read-only log (the dashboard running
+# next to ingest_server.py) never writes and follows the files with read_new().
+
+REC_DTYPE = np.dtype([("time", "<i8")] + [(c, "<f8") for c in FLOAT_COLUMNS] + [(c, "<i4") for c in CATEGORY_COLUMNS])
+SEGMENT_SPAN = "h"   # rotation period (numpy datetime unit): "h" hourly, "D" daily
+INDEX_SAVE_S = 5     # a segment's "end" is rewritten at most this often (new segments: at once)
+log = get_logger("history")
+
+
+def _dir_name(device_id):
+    # device_id comes from query strings; keep it a single, harmless path component,
+    # and a different one per id: anything but letters, digits, _ and - is
+    # percent-encoded ("fern/1" -> "fern%2F1", "fern_1" stays)
+    return re.sub(r"[^\w-]", lambda m: "".join(f"%{b:02X}" for b in m.group().encode()), device_id) or "%"
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class SegmentLog:
+    def __init__(self, root, device_id, span=SEGMENT_SPAN, readonly=False):
+        self.device_id = device_id
+        self.dir = os.path.join(root, _dir_name(device_id))
+        self.span = span
+        self.readonly = readonly
+        if not readonly:
+            os.makedirs(self.dir, exist_ok=True)
+        self.index_path = os.path.join(self.dir, "index.json")
+        self.labels_path = os.path.join(self.dir, "labels.json")
+        self.segments = []   # [{"file", "start", "end"}] sorted by start (ms)
+        self._starts = []
+        self._files = {}     # file name -> its entry in segments
+        self._index_saved = 0.0
+        self.categories = {c: Categories() for c in CATEGORY_COLUMNS}
+        self._cursor = (0, 0)   # (segment, record) a follower has read up to
+        self._load()
+
+    def _load_labels(self):
+        # labels.json only ever grows, so re-encoding it keeps every code stable
+        if os.path.exists(self.labels_path):
+            with open(self.labels_path, encoding="utf-8") as f:
+                for c, labels in json.load(f).items():
+                    for label in labels: self.categories[c].encode(label)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self.segments = index["segments"]
+        self._starts = [s["start"] for s in self.segments]
+        self._files = {s["file"]: s for s in self.segments}
+
+    def _load(self):
+        self._load_labels()
+        self._load_index()
+        if self.readonly:
+            return
+        for seg in self.segments:
+            # Drop a partial trailing record left by a crash mid-write
+            path = os.path.join(self.dir, seg["file"])
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size % REC_DTYPE.itemsize:
+                with open(path, "r+b") as f: f.truncate(size - size % REC_DTYPE.itemsize)
+
+    def _save_index(self):
+        self._index_saved = time.monotonic()
+        _write_json(self.index_path, {"device_id": self.device_id, "dtype": REC_DTYPE.descr, "span": self.span, "segments": self.segments})
+
+    # ---------- write path (ingest worker only) ----------
+    def append(self, cols):
+        n = len(cols["full_time"])
+        if n == 0: return
+        rec = np.empty(n, dtype=REC_DTYPE)
+        # Same clamping as the ring (TimeSeriesStore.extend), so the files hold
+        # exactly its timestamps and only ever grow at the newest segment
+        times = np.asarray(cols["full_time"], dtype="datetime64[ms]")
+        if self.segments:
+            times = np.maximum(times, np.datetime64(self.segments[-1]["end"], "ms"))
+        times = np.maximum.accumulate(times)
+        rec["time"] = times.astype(np.int64)
+        for c in FLOAT_COLUMNS:
+            rec[c] = cols[c] if c in cols else np.nan
+        for c, codes in self._encode({c: cols.get(c, [""] * n) for c in CATEGORY_COLUMNS}).items():
+            rec[c] = codes
+
+        keys = times.astype(f"datetime64[{self.span}]")
+        bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        added = False
+        for part in np.split(np.arange(n), bounds):
+            key = keys[part[0]]
+            name = str(key).replace("-", "").replace("T", "") + ".seg"
+            with open(os.path.join(self.dir, name), "ab") as f:
+                f.write(rec[part].tobytes())
+            seg = self._files.get(name)
+            if seg is not None:
+                seg["end"] = max(seg["end"], int(rec["time"][part[-1]]))
+            else:
+                seg = self._files[name] = {"file": name, "start": int(rec["time"][part[0]]), "end": int(rec["time"][part[-1]])}
+                i = bisect.bisect_right(self._starts, seg["start"])
+                self.segments.insert(i, seg)
+                self._starts.insert(i, seg["start"])
+                added = True
+        # The records are the truth (restore / read_new go by file size);
+        # the index only has to list every file, so most appends skip it
+        if added or time.monotonic() - self._index_saved >= INDEX_SAVE_S:
+            self._save_index()
+
+    def _encode(self, labels):
+        # {column: labels} -> {column: codes}
+        out, new_labels = {}, False
+        for c, values in labels.items():
+            cat = self.categories[c]
+            before = len(cat.labels)
+            uniq, inv = np.unique(np.asarray(values).astype(str), return_inverse=True)
+            out[c] = np.array([cat.encode(str(u)) for u in uniq], dtype=np.int32)[inv.ravel()]
+            new_labels |= len(cat.labels) != before
+        if new_labels:
+            # Labels hit the disk before any record that refers to them
+            _write_json(self.labels_path, {c: cat.labels for c, cat in self.categories.items()})
+        return out
+
+    def rewrite_tail(self, back, cols):
+        # Overwrite some columns of the n records that end `back - n` records
+        # before the newest one (n = length of the columns), in place. The
+        # in-memory ring holds the newest records in the same order, so a row
+        # rederived there is patched here by its distance from the end.
+        n = len(next(iter(cols.values())))
+        cats = self._encode({c: v for c, v in cols.items() if c in CATEGORY_COLUMNS})
+        vals = {c: cats[c] if c in cats else np.asarray(v, dtype=float) for c, v in cols.items()}
+        skip, end = back - n, n   # newer records to pass over; cols[:end] still to write
+        for seg in reversed(self.segments):
+            if end <= 0: break
+            rec = self._map(seg, "r+")
+            if skip >= len(rec):
+                skip -= len(rec); continue
+            hi = len(rec) - skip
+            k = min(hi, end)
+            for c, v in vals.items():
+                rec[c][hi - k:hi] = v[end - k:end]
+            rec.flush()
+            skip, end = 0, end - k
+        return n - max(end, 0)
+
+    # ---------- read path ----------
+    def _map(self, seg, mode="r"):
+        path = os.path.join(self.dir, seg["file"])
+        if not os.path.exists(path) or os.path.getsize(path) < REC_DTYPE.itemsize:
+            return np.empty(0, dtype=REC_DTYPE)
+        return np.memmap(path, dtype=REC_DTYPE, mode=mode, shape=(os.path.getsize(path) // REC_DTYPE.itemsize,))
+
+    def iter_segments(self, start=None, end=None):
+        # Memory-mapped record arrays overlapping [start, end] (datetime64 or None)
+        lo = 0
+        if start is not None:
+            lo = max(0, bisect.bisect_right(self._starts, int(np.datetime64(start, "ms").astype(np.int64))) - 1)
+        hi_ms = None if end is None else int(np.datetime64(end, "ms").astype(np.int64))
+        for seg in self.segments[lo:]:
+            if hi_ms is not None and seg["start"] > hi_ms: break
+            rec = self._map(seg)
+            if start is not None or end is not None:
+                t = rec["time"]
+                i0 = 0 if start is None else int(np.searchsorted(t, np.datetime64(start, "ms").astype(np.int64), "left"))
+                i1 = len(t) if end is None else int(np.searchsorted(t, hi_ms, "right"))
+                rec = rec[i0:i1]
+            if len(rec): yield rec
+
+    def tail(self, n):
+        # The newest n records across segments (one copy, straight from the maps)
+        parts, have = [], 0
+        for seg in reversed(self.segments):
+            rec = self._map(seg)
+            if not parts: self._tail_end = len(rec)
+            parts.append(rec[max(0, len(rec) - (n - have)):])
+            have += len(parts[-1])
+            if have >= n: break
+        return np.concatenate(parts[::-1]) if parts else np.empty(0, dtype=REC_DTYPE)
+
+    def labels(self, rec=None):
+        # code -> label tables; given records, first reloads labels.json if they use
+        # codes the tables don't have yet (a follower's lag the writer's files)
+        if rec is not None and len(rec) and any(rec[c].max() >= len(self.categories[c].labels) for c in CATEGORY_COLUMNS):
+            self._load_labels()
+        return {c: list(cat.labels) for c, cat in self.categories.items()}
+
+    def read_new(self):
+        # Records another process appended since the last call (or since restore)
+        self._load_index()
+        parts = []
+        seg, off = self._cursor
+        for j in range(seg, len(self.segments)):
+            rec = self._map(self.segments[j])
+            if j > seg: off = 0
+            if len(rec) > off: parts.append(np.array(rec[off:]))
+            self._cursor = (j, len(rec))
+        # After the maps: the writer saves labels before the records that use them
+        self._load_labels()
+        return np.concatenate(parts) if parts else np.empty(0, dtype=REC_DTYPE)
+
+    def restore(self, store):
+        # Memory-map the newest segments and bulk-copy them into an empty store
+        rec = self.tail(store.capacity)
+        if self.segments:
+            # A follower continues right after the rows tail() just copied
+            self._cursor = (len(self.segments) - 1, self._tail_end)
+        if len(rec):
+            store.restore(rec["time"].astype("datetime64[ms]"), {c: rec[c] for c in FLOAT_COLUMNS},
+                          {c: rec[c] for c in CATEGORY_COLUMNS}, self.labels())
+        return len(rec)
+
+
+def devices_on_disk(root):
+    # Device ids with saved history (read back from each index, not the dir name)
+    ids = []
+    if os.path.isdir(root):
+        for d in sorted(os.listdir(root)):
+            path = os.path.join(root, d, "index.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    ids.append(json.load(f).get("device_id", d))
+    return ids
@@ -0,0 +1,140 @@
+import threading
+import numpy as np
+from datetime import datetime
+import serial
+from pipeline import make_batch
+from metrics import STAGE_SECONDS
+from logs import get_logger
+
+# ==========================================
+# Serial ingest (one reader thread per port)
+# ==========================================
+# Each port gets a thread that blocks in read() until bytes arrive (or
+# READ_TIMEOUT_S passes), so an idle link costs one wake-up per second instead
+# of a spinning in_waiting poll. Whatever a read returns is appended to a
+# bytearray and cut into lines; a line split across two reads is simply
+# completed by the next one. All complete lines from one read become one
+# batch on the shared ingest queue, tagged with the port's device id.
+
+CSV_FIELDS = 9            # "ms,T,RH,light,soil,status,slope,eta,health"
+READ_TIMEOUT_S = 1.0
+MAX_LINE = 512            # longer runs without a newline are line noise
+RECONNECT_S = 2
+
+log = get_logger("serial")
+_PARSE = STAGE_SECONDS.labels(stage="parse")
+
+
+class LineFramer:
+    def __init__(self, max_line=MAX_LINE):
+        self.buf = bytearray()
+        self.max_line = max_line
+        self.overflows = 0
+
+    def feed(self, data):
+        # Complete lines in `data` (plus what was buffered), without the line ending
+        self.buf += data
+        end = self.buf.rfind(b"\n")
+        if end < 0:
+            if len(self.buf) > self.max_line:
+                self.buf.clear(); self.overflows += 1
+            return []
+        lines = self.buf[:end].split(b"\n")
+        del self.buf[:end + 1]
+        return [ln.rstrip(b"\r") for ln in lines if ln.strip()]
+
+
+def parse_serial_lines(lines, now=None):
+    # Same rules as the old readline loop: 9 fields, 'nan' reads as 0, any
+    # unparsable number drops the line. Returns a pipeline batch (or None).
+    now = now or datetime.now()
+    rows, status = [], []
+    for line in lines:
+        parts = line.decode("utf-8", errors="replace").strip().split(",")
+        if len(parts) != CSV_FIELDS: continue
+        _, T_str, RH_str, light_str, soil_str, st, _, _, _ = parts
+        try:
+            rows.append((float(T_str) if T_str != 'nan' else 0, float(RH_str) if RH_str != 'nan' else 0,
+                         float(soil_str) if soil_str != 'nan' else 0, int(float(light_str)) if light_str != 'nan' else 0))
+        except ValueError: continue
+        status.append(st.strip() or None)
+    if not rows:
+        return None
+    temp, hum, soil, light = np.array(rows, dtype=float).T
+    return make_batch(np.full(len(rows), np.datetime64(now, "ms")), temp, hum, soil, light, status)
+
+
+class SerialReader:
+    def __init__(self, port, device_id, baud, on_batch, timeout=READ_TIMEOUT_S):
+        self.port = port
+        self.device_id = device_id
+        self.baud = baud
+        self.on_batch = on_batch   # on_batch(device_id, batch), called on the reader thread
+        self.timeout = timeout
+        self.framer = LineFramer()
+        self.stats = {"bytes": 0, "lines": 0, "samples": 0, "bad_lines": 0, "reads": 0, "reconnects": 0}
+        self.connected = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"serial-{self.port}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(self.timeout + 1)
+
+    def _run(self):
+        log.info("[System] Attempting to connect to serial", port=self.port, device=self.device_id)
+        while not self._stop.is_set():
+            try:
+                ser = serial.Serial(self.port, self.baud, timeout=self.timeout)
+            except (serial.SerialException, OSError):
+                self._stop.wait(RECONNECT_S); continue
+            log.info("✅ [System] Serial Connected", port=self.port)
+            self.connected = True
+            try:
+                ser.reset_input_buffer()
+                self.framer.buf.clear()   # a partial line from before the reconnect is stale
+                while not self._stop.is_set():
+                    # Blocks until at least one byte (or the timeout), then takes everything buffered
+                    data = ser.read(ser.in_waiting or 1)
+                    if not data: continue
+                    self.stats["reads"] += 1
+                    self.stats["bytes"] += len(data)
+                    self._handle(self.framer.feed(data))
+            except (serial.SerialException, OSError) as e:
+                log.error("[Serial Error]", port=self.port, error=e)
+                self.stats["reconnects"] += 1
+                self._stop.wait(1)
+            finally:
+                self.connected = False
+                try: ser.close()
+                except Exception: pass
+
+    def _handle(self, lines):
+        if not lines: return
+        self.stats["lines"] += len(lines)
+        with _PARSE.time():
+            batch = parse_serial_lines(lines)
+        n = 0 if batch is None else len(batch["time"])
+        self.stats["bad_lines"] += len(lines) - n
+        if n:
+            self.stats["samples"] += n
+            self.on_batch(self.device_id, batch)
+
+
+def parse_port_map(spec, default_device):
+    # "COM3" or "COM3=fern,/dev/ttyUSB1=cactus" -> {port: device_id}
+    ports = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        port, _, device_id = item.partition("=")
+        ports[port.strip()] = device_id.strip() or default_device
+    return ports
+
+
+def start_readers(ports, baud, on_batch):
+    return [SerialReader(port, device_id, baud, on_batch).start() for port, device_id in ports.items()]
@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# ==========================================
+# Columnar time-series store
+# ==========================================
+# Every sample is one slot in a set of preallocated NumPy columns arranged
+# as a fixed-capacity ring. Each slot is written twice (at p and p + ring size),
+# so the live rows are always one contiguous slice and time-range windows are
+# plain views, never copies. Rows are only ever appended, except when a plant
+# profile changes and rewrite() rederives the threshold-dependent columns of
+# rows already stored; that bumps `revision` so views redraw in full.
+
+FLOAT_COLUMNS = ("temp", "hum", "light", "soil", "vpd", "slopeh", "eta", "eta_lo", "eta_hi", "slope_se",
+                 "health", "h_soil", "h_temp", "h_light", "status_dev")   # status_dev: 1 = status reported by the node
+CATEGORY_COLUMNS = ("status", "reasons", "smart_msg", "mood_state")
+# These hold templates ("High Temp ({temp:.1f}°C)"), filled from the same row's
+# readings when shown, so the label tables stay as small as the rule set
+TEMPLATE_COLUMNS = ("reasons", "smart_msg")
+READINGS = ("temp", "hum", "light", "soil", "vpd")
+
+# Column order of the old data_rows dicts (kept for the table / CSV export)
+ROW_COLUMNS = ("timestamp", "full_time", "temp", "hum", "light", "soil", "status",
+               "vpd", "slopeh", "eta", "eta_lo", "eta_hi", "health", "h_soil", "h_temp", "h_light",
+               "reasons", "smart_msg", "mood_state")
+
+# 6 weeks of 5-minute samples (CFG::SAMPLE_MS)
+DEFAULT_CAPACITY = 12 * 24 * 42
+
+
+def fill(label, cols, i=None):
+    # One template label, filled from row i of the columns (or from one row's values)
+    if "{" not in label:
+        return label
+    return label.format(**{c: float(cols[c] if i is None else cols[c][i]) for c in READINGS})
+
+
+def render(labels, codes, cols):
+    # Labels for per-row codes; template labels are filled from the rows' readings
+    out = np.asarray(labels, dtype=object)[codes] if len(codes) else np.empty(0, dtype=object)
+    templated = np.array(["{" in label for label in labels], dtype=bool)
+    if templated.any():
+        for i in np.flatnonzero(templated[codes]):
+            out[i] = fill(out[i], cols, i)
+    return out
+
+
+class Categories:
+    # String <-> int code table for the low-cardinality text columns
+    def __init__(self):
+        self.labels = []
+        self.codes = {}
+
+    def encode(self, label):
+        code = self.codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.labels.append(label)
+            self.codes[label] = code
+        return code
+
+    def decode(self, codes):
+        return np.asarray(self.labels, dtype=object)[codes] if len(codes) else np.empty(0, dtype=object)
+
+
+class Window:
+    # Read-only view over rows [lo, hi) of the store's physical arrays
+    def __init__(self, store, lo, hi):
+        self.store = store
+        self.lo = lo
+        self.hi = hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    @property
+    def time(self):
+        return self.store._time[self.lo:self.hi]
+
+    def __getitem__(self, name):
+        if name == "full_time":
+            return self.time
+        if name in self.store._codes:
+            return self.store._codes[name][self.lo:self.hi]
+        return self.store._cols[name][self.lo:self.hi]
+
+    def labels(self, name):
+        if name in TEMPLATE_COLUMNS:
+            return render(self.store.categories[name].labels, self[name], self)
+        return self.store.categories[name].decode(self[name])
+
+    def to_frame(self):
+        data = {}
+        ft = self.time
+        for c in ROW_COLUMNS:
+            if c == "timestamp":
+                data[c] = pd.DatetimeIndex(ft).strftime("%H:%M:%S")
+            elif c == "full_time":
+                data[c] = pd.DatetimeIndex(ft)
+            elif c in CATEGORY_COLUMNS:
+                data[c] = self.labels(c)
+            else:
+                data[c] = self[c]
+        return pd.DataFrame(data)
+
+
+class Snapshot:
+    # Immutable, sequence-checked read view of a store.
+    #
+    # `count` is the store's sequence number when the snapshot was taken; the
+    # writer only bumps it after a row is fully written, so a snapshot never
+    # sees a torn row. Rows it covers stay untouched for `store.slack` further
+    # appends (the ring has that many spare slots); `valid` says whether the
+    # writer has lapped it since.
+    def __init__(self, store):
+        self.store = store
+        self.count = store.count
+        self.revision = store.revision
+        n = min(self.count, store.capacity)
+        self.hi = self.count % store._ring + store._ring
+        self.lo = self.hi - n
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    @property
+    def version(self):
+        return self.count
+
+    @property
+    def categories(self):
+        return self.store.categories
+
+    @property
+    def valid(self):
+        return self.store.count - self.count <= self.store.slack
+
+    def window(self, start=None, end=None):
+        times = self.store._time[self.lo:self.hi]
+        i0 = 0 if start is None else int(np.searchsorted(times, np.datetime64(start, "ms"), "left"))
+        i1 = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end, "ms"), "right"))
+        return Window(self.store, self.lo + i0, self.lo + max(i0, i1))
+
+    def tail(self, n):
+        return Window(self.store, max(self.lo, self.hi - n), self.hi)
+
+    def since(self, version):
+        # Rows appended after `version`; None once they have been overwritten
+        n = self.count - version
+        if n < 0 or n > len(self):
+            return None
+        return self.tail(n)
+
+    def rows(self, lo, hi):
+        # Rows with sequence numbers [lo, hi); None once they have been overwritten
+        if lo < self.count - len(self) or hi > self.count or lo > hi:
+            return None
+        return Window(self.store, self.hi - (self.count - lo), self.hi - (self.count - hi))
+
+    def latest(self):
+        if not len(self):
+            return None
+        i = self.hi - 1
+        ft = self.store._time[i].astype(datetime)
+        row = {"timestamp": ft.strftime("%H:%M:%S"), "full_time": ft}
+        for c, arr in self.store._cols.items():
+            row[c] = float(arr[i])
+        for c, arr in self.store._codes.items():
+            row[c] = self.store.categories[c].labels[arr[i]]
+        for c in TEMPLATE_COLUMNS:
+            row[c] = fill(row[c], row)
+        return row
+
+    def to_frame(self):
+        return self.window().to_frame()
+
+
+class TimeSeriesStore:
+    # Single writer (the ingest worker), any number of readers via snapshot()
+    def __init__(self, capacity=DEFAULT_CAPACITY, slack=None):
+        self.capacity = capacity
+        self.slack = slack if slack is not None else max(64, capacity // 8)
+        self._ring = capacity + self.slack
+        self.count = 0   # total samples ever appended (monotonic sequence number)
+        self.revision = 0   # bumped by every rewrite() of stored rows
+        size = 2 * self._ring
+        self._time = np.zeros(size, dtype="datetime64[ms]")
+        self._cols = {c: np.full(size, np.nan) for c in FLOAT_COLUMNS}
+        self._codes = {c: np.zeros(size, dtype=np.int32) for c in CATEGORY_COLUMNS}
+        self.categories = {c: Categories() for c in CATEGORY_COLUMNS}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def version(self):
+        return self.count
+
+    def snapshot(self):
+        return Snapshot(self)
+
+    def extend(self, cols):
+        # Columnar append of a whole batch: {"full_time": datetime64[], "soil": [...], ...}
+        ts = self.ordered(cols["full_time"])
+        n = len(ts)
+        if n == 0:
+            return
+        codes = {c: self._encode(c, cols.get(c), n) for c in CATEGORY_COLUMNS}
+        floats = {c: np.asarray(cols[c], dtype=float) if c in cols else np.full(n, np.nan) for c in FLOAT_COLUMNS}
+
+        # Only the newest ring-size rows can survive; write them in wrap-free chunks
+        i = max(0, n - self._ring)
+        while i < n:
+            p = (self.count + i) % self._ring
+            k = min(n - i, self._ring - p)
+            for q in (p, p + self._ring):
+                self._time[q:q + k] = ts[i:i + k]
+                for c, arr in self._cols.items():
+                    arr[q:q + k] = floats[c][i:i + k]
+                for c, arr in self._codes.items():
+                    arr[q:q + k] = codes[c][i:i + k]
+            i += k
+        self.count += n
+
+    def ordered(self, times):
+        # The times as extend() stores them: the time column stays sorted so
+        # windows can be binary searched (nothing before the newest row)
+        ts = np.asarray(times, dtype="datetime64[ms]")
+        if self.count and len(ts):
+            ts = np.maximum(ts, self._time[(self.count - 1) % self._ring])
+        return np.maximum.accumulate(ts) if len(ts) else ts
+
+    def _encode(self, c, labels, n):
+        if labels is None:
+            return np.full(n, self.categories[c].encode(""), dtype=np.int32)
+        uniq, inv = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+        table = np.array([self.categories[c].encode(str(u)) for u in uniq], dtype=np.int32)
+        return table[inv.ravel()]
+
+    def rewrite(self, start, cols):
+        # Overwrite some columns of rows start, start + 1, ... (sequence numbers) in
+        # place, e.g. health and ETA rederived under a new plant profile. Rows
+        # that already fell out of the ring are skipped.
+        n = len(next(iter(cols.values())))
+        skip = max(0, self.count - self._ring - start)
+        if skip >= n or start + n > self.count:
+            return 0
+        vals = {c: self._encode(c, v, n) if c in self._codes else np.asarray(v, dtype=float) for c, v in cols.items()}
+        i = skip
+        while i < n:
+            p = (start + i) % self._ring
+            k = min(n - i, self._ring - p)
+            for q in (p, p + self._ring):
+                for c, v in vals.items():
+                    (self._codes[c] if c in self._codes else self._cols[c])[q:q + k] = v[i:i + k]
+            i += k
+        self.revision += 1
+        return n - skip
+
+    def restore(self, times, floats, codes, labels):
+        # Bulk load into an empty store with pre-encoded category codes
+        # (segments.py keeps the same label tables, so codes copy straight in)
+        assert self.count == 0
+        n = min(len(times), self.capacity)
+        for c in CATEGORY_COLUMNS:
+            for label in labels.get(c, []): self.categories[c].encode(label)
+        for q in (0, self._ring):
+            self._time[q:q + n] = np.asarray(times[len(times) - n:], dtype="datetime64[ms]")
+            for c, arr in self._cols.items():
+                arr[q:q + n] = floats[c][len(times) - n:]
+            for c, arr in self._codes.items():
+                arr[q:q + n] = codes[c][len(times) - n:]
+        self.count = n
+
+    def window(self, start=None, end=None):
+        return self.snapshot().window(start, end)
+
+    def tail(self, n):
+        return self.snapshot().tail(n)
+
+    def since(self, version):
+        return self.snapshot().since(version)
+
+    def latest(self):
+        return self.snapshot().latest()
+
+    def to_frame(self):
+        return self.snapshot().to_frame()
@@ -0,0 +1,132 @@
+import re
+import math
+import numpy as np
+import pandas as pd
+from store import FLOAT_COLUMNS, TEMPLATE_COLUMNS, render
+
+# ==========================================
+# Server-side paging / sorting / filtering for the Raw Data Logs table
+# ==========================================
+# Time filters become binary-search bounds on the store's sorted time column,
+# everything else is a vectorized mask over the window views. Only the
+# requested page is ever turned into dicts. Template labels ("Heat Wave! Temp
+# is {temp:.1f}°C") are filled in only for the rows a filter or sort looks at.
+
+TIME_COLUMNS = ("timestamp", "full_time")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+FILTER_RE = re.compile(r"^\{(?P<col>[^}]+)\}\s+(?P<op>[si]?(?:>=|<=|!=|<|>|=|eq|ne|lt|le|gt|ge|contains|datestartswith))\s+(?P<val>.+)$")
+OP_ALIASES = {"eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+
+
+def parse_filter(filter_query):
+    parts = []
+    for expr in (filter_query or "").split(" && "):
+        m = FILTER_RE.match(expr.strip())
+        if not m: continue
+        op = m.group("op")
+        nocase = op.startswith("i")
+        if op[0] in "si": op = op[1:]
+        val = m.group("val").strip()
+        if len(val) >= 2 and val[0] == val[-1] and val[0] in "\"'`": val = val[1:-1]
+        parts.append((m.group("col"), OP_ALIASES.get(op, op), val, nocase))
+    return parts
+
+
+def _time_bounds(parts):
+    # Fold every time filter into one [start, end] pair for searchsorted
+    start = end = None
+    for col, op, val, _ in parts:
+        if col not in TIME_COLUMNS: continue
+        try: t = pd.Timestamp(val)
+        except ValueError: continue
+        # "2025-12-01" / "2025-12-01 10" / "... 10:05" match the whole day / hour / minute
+        step = {10: "1D", 13: "1h", 16: "1min"}.get(len(val), "1s")
+        lo, hi = t, t + pd.Timedelta(step) - pd.Timedelta("1ms")
+        if op in ("=", "datestartswith", "contains"): new_lo, new_hi = lo, hi
+        elif op == ">=": new_lo, new_hi = lo, None
+        elif op == ">": new_lo, new_hi = hi + pd.Timedelta("1ms"), None
+        elif op == "<=": new_lo, new_hi = None, hi
+        elif op == "<": new_lo, new_hi = None, lo - pd.Timedelta("1ms")
+        else: continue
+        if new_lo is not None: start = new_lo if start is None else max(start, new_lo)
+        if new_hi is not None: end = new_hi if end is None else min(end, new_hi)
+    return start, end
+
+
+def _label_hits(labels, op, val, nocase):
+    labels = np.asarray(labels, dtype=object)
+    if op in ("contains", "datestartswith"):
+        needle = val.lower() if nocase else val
+        return np.array([(needle in (l.lower() if nocase else l)) for l in labels], dtype=bool)
+    if op == "=": return labels == val
+    if op == "!=": return labels != val
+    return None
+
+
+def _mask(win, store, col, op, val, nocase):
+    if col in store.categories:
+        labels = store.categories[col].labels
+        hit = _label_hits(labels, op, val, nocase)
+        if hit is None: return None
+        m = np.isin(win[col], np.flatnonzero(hit))
+        if col in TEMPLATE_COLUMNS:
+            # Rows with a template label match on their own filled-in text
+            templated = np.flatnonzero(["{" in l for l in labels])
+            rows = np.flatnonzero(np.isin(win[col], templated))
+            if len(rows):
+                text = render(labels, win[col][rows], {c: win[c][rows] for c in FLOAT_COLUMNS})
+                m[rows] = _label_hits(text, op, val, nocase)
+        return m
+    try: x = float(val)
+    except ValueError: return None
+    v = win[col]
+    return {"=": v == x, "!=": v != x, "<": v < x, "<=": v <= x, ">": v > x, ">=": v >= x}.get(op)
+
+
+def query_page(store, page_current, page_size, sort_by=None, filter_query=""):
+    parts = parse_filter(filter_query)
+    start, end = _time_bounds(parts)
+    win = store.window(start, end)
+
+    keep = np.ones(len(win), dtype=bool)
+    for col, op, val, nocase in parts:
+        if col in TIME_COLUMNS: continue
+        if col not in store.categories and col not in FLOAT_COLUMNS: continue
+        m = _mask(win, store, col, op, val, nocase)
+        if m is not None: keep &= m
+    idx = np.flatnonzero(keep)
+
+    # Newest first unless the user sorts on something else
+    sort = sort_by[0] if sort_by else {"column_id": "timestamp", "direction": "desc"}
+    desc = sort["direction"] == "desc"
+    col = sort["column_id"]
+    if col not in TIME_COLUMNS:
+        if col in TEMPLATE_COLUMNS:
+            keys = render(store.categories[col].labels, win[col][idx], {c: win[c][idx] for c in FLOAT_COLUMNS})
+        else:
+            keys = store.categories[col].decode(win[col][idx]) if col in store.categories else win[col][idx]
+        idx = idx[np.argsort(keys, kind="stable")]
+    if desc: idx = idx[::-1]
+
+    page_size = page_size or 20
+    page_count = max(1, math.ceil(len(idx) / page_size))
+    sel = idx[page_current * page_size:(page_current + 1) * page_size]
+    return page_records(win, store, sel), page_count
+
+
+def page_records(win, store, sel):
+    times = pd.DatetimeIndex(win.time[sel]).strftime(TIME_FORMAT)
+    cols = {c: win[c][sel] for c in FLOAT_COLUMNS}
+    cats = {c: render(store.categories[c].labels, win[c][sel], cols) if c in TEMPLATE_COLUMNS else store.categories[c].decode(win[c][sel])
+            for c in store.categories}
+    rows = []
+    for i in range(len(sel)):
+        row = {"timestamp": times[i]}
+        for c, v in cols.items():
+            x = float(v[i])
+            row[c] = None if math.isnan(x) else round(x, 4)
+        for c, v in cats.items():
+            row[c] = v[i]
+        rows.append(row)
+    return rows
@@ -0,0 +1,13 @@
+import os
+import sys
+
+# ==========================================
+# Unit tests
+# ==========================================
+#   cd "Plant Water" && python -m pytest -q tests
+# (bench/ holds the pytest-benchmark timings, test/ the PlatformIO firmware tests)
+
+os.environ.setdefault("PLANT_LOG_LEVEL", "CRITICAL")
+os.environ["PLANT_HISTORY_DIR"] = ""   # the dashboard keeps its history in memory only
+os.environ.pop("PLANT_FOLLOW_INGEST", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
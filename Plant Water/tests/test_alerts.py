@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from alerts import MAX_TEXT, AlertDispatcher, format_digest
+
+
+class StubTelegram(BaseHTTPRequestHandler):
+    # sendMessage stand-in: records every call, answers from server.replies (then 200)
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.calls.append((time.monotonic(), self.path, body))
+        status, reply = self.server.replies.pop(0) if self.server.replies else (200, {"ok": True})
+        data = reply if isinstance(reply, bytes) else json.dumps(reply).encode()   # bytes: a non-JSON body
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def telegram():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTelegram)
+    server.calls, server.replies, server.connections = [], [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def dispatcher(server, **kw):
+    return AlertDispatcher("TOKEN", f"http://127.0.0.1:{server.server_address[1]}", **kw)
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_burst_is_sent_as_one_digest(telegram):
+    d = dispatcher(telegram)
+    for msg in ("Soil Dry", "Soil Dry", "Too Hot"):
+        assert d.send(msg, 42)
+    d.start()   # the worker drains the whole burst before its first post
+    wait_for(lambda: d.sent == 1)
+    (_, path, body), = telegram.calls
+    assert path == "/botTOKEN/sendMessage" and body["chat_id"] == 42
+    assert body["text"] == "🚨 3 alerts:\n• Soil Dry (x2)\n• Too Hot"
+
+
+def test_retry_after_is_honoured(telegram):
+    telegram.replies.append((429, {"ok": False, "parameters": {"retry_after": 1}}))
+    d = dispatcher(telegram).start()
+    d.send("Soil Dry", 42)
+    wait_for(lambda: d.sent == 1)
+    (t0, _, first), (t1, _, second) = telegram.calls
+    assert second["text"] == first["text"] == "Soil Dry"
+    assert t1 - t0 >= 0.95
+
+
+def test_one_keep_alive_connection(telegram):
+    d = dispatcher(telegram, rate=100.0, burst=10).start()
+    for i in range(5):
+        d.send(f"alert {i}", 42)
+        wait_for(lambda: d.sent == i + 1)
+    assert len(telegram.calls) == 5 and telegram.connections == 1
+
+
+def test_full_queue_drops_and_counts():
+    d = AlertDispatcher("TOKEN", "http://127.0.0.1:9", maxsize=2)   # not started: nothing drains it
+    assert [d.send(f"alert {i}", 42) for i in range(3)] == [True, True, False]
+    assert d.dropped == 1 and d.depth() == 2
+
+
+def test_pending_is_capped_per_chat(telegram):
+    telegram.replies.append((429, {"ok": False, "parameters": {"retry_after": 60}}))
+    d = dispatcher(telegram, max_pending=3).start()
+    d.send("first", 42)
+    wait_for(lambda: len(telegram.calls) == 1 and d.depth() == 1)   # held back by retry_after
+    for i in range(4):
+        d.send(f"alert {i}", 42)
+    wait_for(lambda: d.dropped == 2)
+    assert d.depth() == 3 and d.pending[42] == ["alert 1", "alert 2", "alert 3"]
+
+
+def test_depth_while_the_worker_adds_chats(telegram):
+    d = dispatcher(telegram, rate=1e-6, burst=0).start()   # never sends: everything stays pending
+    stop = threading.Event()
+    def feed():
+        for i in range(500):
+            d.send("alert", i)
+        stop.set()
+    threading.Thread(target=feed).start()
+    while not stop.is_set():
+        d.depth()   # raised "dictionary changed size during iteration" without the lock
+    wait_for(lambda: d.depth() == 500)
+
+
+def test_429_without_a_json_body_still_backs_off(telegram):
+    telegram.replies.append((429, b"Too Many Requests"))
+    d = dispatcher(telegram).start()
+    d.send("Soil Dry", 42)
+    wait_for(lambda: len(telegram.calls) == 1 and d.depth() == 1)
+    assert d.buckets[42].blocked_until - time.monotonic() > 20   # the default retry_after
+
+
+def test_digest_fits_one_telegram_message():
+    messages = [f"🚨 ALERT (WiFi, node-{i}): CRITICAL: Water NOW! 🩸" for i in range(200)]
+    text = format_digest(messages)
+    assert len(text.encode("utf-16-le")) // 2 <= MAX_TEXT
+    shown = text.count("\n• 🚨")
+    assert 0 < shown < 200 and text.endswith(f"\n• … and {200 - shown} more")
+    assert len(format_digest(["x" * 10000])) == MAX_TEXT
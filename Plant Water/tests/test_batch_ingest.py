@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client():
+    import dashboard
+    import runtime
+    runtime.send_telegram_message = lambda message: None   # the ingest worker's alerts
+    return dashboard, dashboard.server.test_client()
+
+
+def post(client, device_id, ms, now_ms, status="OK"):
+    body = "".join(f"{t},21.5,50,300,0.55,{status},0,0,0\n" for t in ms)
+    r = client.post(f"/update_sensor_batch?device_id={device_id}&now_ms={now_ms}", data=body, content_type="text/csv")
+    assert r.status_code == 200
+    return r.json
+
+
+def bits(ack, n):
+    return list(np.unpackbits(np.frombuffer(bytes.fromhex(ack), dtype=np.uint8), bitorder="little")[:n])
+
+
+def test_samples_older_than_the_history_are_acknowledged_not_stored(client):
+    dashboard, c = client
+    # Device clock at 10 min; samples at 8 and 9 min, then a late batch from 7 to 9.5 min
+    first = post(c, "late-node", [480000, 540000], 600000)
+    assert first["accepted"] == 2 and first["stale"] == 0 and bits(first["ack"], 2) == [1, 1]
+    late = post(c, "late-node", [420000, 500000, 570000], 600000)
+    assert (late["received"], late["accepted"], late["stale"]) == (3, 1, 2)
+    assert bits(late["ack"], 3) == [1, 1, 1]   # acked, so the node stops resending them
+
+    dashboard.ingest.join()
+    t = dashboard.devices.find("late-node").history.snapshot().window().time
+    # Everything stored kept the time the node sent
+    assert len(t) == 3 and len(np.unique(t)) == 3 and np.all(np.diff(t.astype(np.int64)) > 0)
+
+
+def test_csv_batch_keeps_the_node_status(client):
+    dashboard, c = client
+    post(c, "status-node", [480000], 600000, status="Calibrating")
+    post(c, "status-node", [540000], 600000, status="")
+    dashboard.ingest.join()
+    w = dashboard.devices.find("status-node").history.snapshot().window()
+    assert w.labels("status")[0] == "Calibrating" and list(w["status_dev"]) == [1.0, 0.0]   # like the serial path
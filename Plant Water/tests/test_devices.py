@@ -0,0 +1,26 @@
+import os
+import pytest
+import devices as devices_mod
+from devices import DeviceRegistry
+from segments import _dir_name
+
+
+def test_dir_names_are_distinct_and_harmless():
+    ids = ["fern/1", "fern_1", "fern%2F1", "..", ".hidden", "植物-1", "a b"]
+    names = [_dir_name(d) for d in ids]
+    assert len(set(names)) == len(ids)
+    assert all(os.sep not in n and not n.startswith(".") for n in names)
+    assert _dir_name("fern_1") == "fern_1" and _dir_name("植物-1") == "植物-1"
+
+
+def test_get_validates_ids_and_caps_new_devices(monkeypatch):
+    monkeypatch.setattr(devices_mod, "MAX_DEVICES", 2)
+    reg = DeviceRegistry(capacity=16)
+    for bad in ("../etc", "a/b", ".x", "x" * 65, "a\nb"):
+        with pytest.raises(ValueError):
+            reg.get(bad)
+    reg.get("fern"); reg.get("plant_data_5_加了平滑系数")
+    with pytest.raises(ValueError):
+        reg.get("cactus")
+    assert reg.get("fern") is reg.find("fern")
+    assert reg.get("cactus", saved=True).device_id == "cactus"
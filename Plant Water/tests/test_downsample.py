@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from downsample import lttb_indices, downsample, crossing_indices
+from replay import load_traces
+
+TRACES = load_traces()
+
+
+def series(tr):
+    return tr["full_time"].to_numpy().astype("datetime64[ms]").astype(np.int64), tr["soil"].to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize("n_out", [3, 4, 10, 50, 128])
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_lttb_keeps_endpoints_within_budget(tr, n_out):
+    x, y = series(tr)
+    idx = lttb_indices(x, y, n_out)
+    assert len(idx) == min(n_out, len(y))
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_short_series_is_untouched():
+    assert lttb_indices([0, 1, 2], [1.0, 2.0, 3.0], 10).tolist() == [0, 1, 2]
+    assert lttb_indices(np.arange(5), np.ones(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_picks_the_spike():
+    y = np.zeros(1000); y[517] = 1.0
+    assert 517 in lttb_indices(np.arange(1000), y, 20)
+
+
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_downsample_keeps_crossings_within_budget(tr):
+    x, y = series(tr)
+    level = float(np.median(y))
+    idx = downsample(x, y, 60, keep_levels=(level,))
+    assert len(idx) <= 60 and idx[0] == 0 and idx[-1] == len(y) - 1
+    cross = crossing_indices(y, level)
+    if len(cross) <= 60 // 4:
+        assert set(cross) <= set(idx)
+
+
+def test_downsample_budget_holds_on_a_sensor_hovering_on_the_line():
+    # Every sample crosses 0.35: crossings alone would be the whole series
+    y = np.where(np.arange(5000) % 2, 0.34, 0.36)
+    for n_out in (3, 4, 7, 500):
+        idx = downsample(np.arange(5000), y, n_out, keep_levels=(0.35,))
+        assert len(idx) <= n_out and idx[0] == 0 and idx[-1] == 4999
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from pipeline import make_batch
+
+
+@pytest.fixture(scope="module")
+def dashboard():
+    import dashboard
+    import runtime
+    runtime.send_telegram_message = lambda message: None   # the ingest worker's alerts
+    return dashboard
+
+
+def test_a_value_drifting_inside_one_band_is_one_issue(dashboard):
+    dev = dashboard.devices.get("drift-node")
+    n = 24
+    t = np.datetime64("2026-03-02T10:00", "ms") + np.arange(n) * np.timedelta64(5, "m")
+    temp = np.linspace(31.0, 33.3, n)   # "High Temp ({value:.1f}°C)" the whole time
+    for i in range(n):   # one sample per request, like a node posting live
+        dashboard.ingest.submit(dashboard.ingest_samples, dev, make_batch(t[i:i+1], temp[i:i+1], 50.0, 0.5, 20000.0), "WiFi")
+    dashboard.ingest.join()
+    issues = [ev for ev in dashboard.devices.events.query("drift-node", limit=100) if ev["kind"] == "issue"]
+    assert len(issues) == 1
+    assert issues[0]["msg"] == "⚠️ High Temp (31.0°C)" and issues[0]["reason"] == "High Temp ({value:.1f}°C)"
+    assert dev.reasons.active == {"High Temp ({value:.1f}°C)"}
@@ -0,0 +1,40 @@
+import io
+import numpy as np
+import pytest
+from export import stream_export, ROW_COLUMNS
+from segments import SegmentLog
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class Dev:
+    def __init__(self, root, device_id):
+        self.device_id = device_id
+        self.segments = SegmentLog(root, device_id)
+
+
+def parquet(devs, **kw):
+    return pq.read_table(io.BytesIO(b"".join(stream_export(devs, "parquet", **kw))))
+
+
+def test_empty_range_is_a_schema_only_file(tmp_path):
+    dev = Dev(str(tmp_path), "fern")
+    dev.segments.append({"full_time": np.array(["2026-03-02T09:00"], dtype="datetime64[ms]"), "soil": np.array([0.5]),
+                         "status": np.array(["OK"], dtype=object)})
+    empty = parquet([dev], start=np.datetime64("2027-01-01", "ms"))
+    full = parquet([dev])
+    assert empty.num_rows == 0 and full.num_rows == 1
+    assert empty.schema.names == list(ROW_COLUMNS) and empty.schema == full.schema
+    assert parquet([Dev(str(tmp_path), "cactus"), dev], start=np.datetime64("2027-01-01", "ms")).schema.names[0] == "device_id"
+
+
+def test_labels_added_during_an_export(tmp_path):
+    dev = Dev(str(tmp_path), "fern")
+    t = np.datetime64("2026-03-02T09:00", "ms") + np.array([0, 60, 70, 80]) * np.timedelta64(1, "m")
+    dev.segments.append({"full_time": t[:2], "soil": np.zeros(2), "status": np.array(["OK", "OK"], dtype=object)})
+    frames = stream_export([dev], "csv", chunk_rows=1)
+    text = next(frames)   # the 09:00 segment
+    # The 10:00 segment gets rows with a new status label (a new code) mid-export
+    dev.segments.append({"full_time": t[2:], "soil": np.zeros(2), "status": np.array(["Thirsty", "Thirsty"], dtype=object)})
+    text += "".join(frames)
+    assert text.count("OK") == 2 and text.count("Thirsty") == 2
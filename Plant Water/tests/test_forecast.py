@@ -0,0 +1,97 @@
+import math
+import numpy as np
+import pytest
+import forecast
+from forecast import DryingForecaster, features, load_forecaster, save_forecaster
+from pipeline import calculate_vpd_batch, make_batch, process_samples
+from devices import DeviceRegistry
+
+TRUE = (0.004, 0.006, 0.002, 0.003, 0.01)   # b0..b4 of -ds/dt = a + c * s
+DAY = 288
+
+
+def synth(days=40, seed=3, noise=0.002):
+    # 5-minute readings drying by the model's own law under hourly random weather,
+    # watered back to 0.75 whenever they reach 0.3
+    rng = np.random.default_rng(seed)
+    n = days * DAY
+    t = np.datetime64("2026-03-02T00:00", "ms") + np.arange(n) * np.timedelta64(5, "m")
+    h, hrs = np.arange(n) / 12.0, np.arange(days * 24 + 1)
+    temp = np.interp(h, hrs, 22 + 3 * np.sin(hrs * 2 * np.pi / 24) + rng.normal(0, 2, len(hrs)))
+    hum = np.interp(h, hrs, np.clip(55 + rng.normal(0, 12, len(hrs)), 20, 95))
+    light = np.interp(h, hrs, np.clip(800 * np.sin(hrs * 2 * np.pi / 24) + rng.normal(0, 300, len(hrs)), 0, None))
+    vpd = calculate_vpd_batch(temp, hum)
+    s = np.empty(n); s[0] = 0.7; watered = []
+    for i in range(1, n):
+        s[i] = s[i - 1] - sum(b * x for b, x in zip(TRUE, features(vpd[i], temp[i], light[i], s[i - 1]))) / 12
+        if s[i] < 0.3:
+            s[i] = 0.75; watered.append(i)
+    return t, s + rng.normal(0, noise, n), vpd, temp, light, np.array(watered, dtype=np.int64)
+
+
+def feed(f, data, lo, hi):
+    t, s, vpd, temp, light, w = data
+    for d in range(lo, hi, DAY):
+        e = min(d + DAY, hi)
+        f.update(t[d:e], s[d:e], vpd[d:e], temp[d:e], light[d:e], w[(w >= d) & (w < e)] - d)
+
+
+def rate_error(f):
+    # Worst relative error of the learned drying rate under the model's last-day conditions
+    x = [v / len(f._day) for v in f._day_sum]
+    errs = []
+    for soil in (0.35, 0.5, 0.65):
+        a, c, _ = f.rate(soil)
+        true = TRUE[0] + TRUE[1] * x[0] + TRUE[2] * x[1] + TRUE[3] * x[2] + TRUE[4] * soil
+        errs.append(abs(a + c * soil - true) / true)
+    return max(errs)
+
+
+def test_rls_converges_to_the_true_drying_rate():
+    data = synth()
+    f = DryingForecaster()
+    feed(f, data, 0, 3 * DAY)
+    early = rate_error(f)
+    feed(f, data, 3 * DAY, 40 * DAY)
+    assert rate_error(f) < 0.1 and rate_error(f) < early / 3
+    assert f.cycles >= 30 and f.summary()["ready"]
+    # The true time from 0.6 to 0.35 under the same conditions falls inside p10-p90
+    x = [v / len(f._day) for v in f._day_sum]
+    a = TRUE[0] + TRUE[1] * x[0] + TRUE[2] * x[1] + TRUE[3] * x[2]
+    true_h = math.log((0.6 + a / TRUE[4]) / (0.35 + a / TRUE[4])) / TRUE[4]
+    p10, p50, p90 = f.forecast(0.6, 0.35)
+    assert p10 < true_h < p90 and abs(p50 - true_h) < 0.1 * true_h
+
+
+def test_saved_model_continues_like_an_uninterrupted_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecast, "FORECAST_DIR", str(tmp_path))
+    data = synth(days=10)
+    whole, first = DryingForecaster(), DryingForecaster()
+    feed(whole, data, 0, 10 * DAY)
+    # Stop mid-hour and mid-cycle
+    feed(first, data, 0, 5 * DAY + 7)
+    save_forecaster("fern", first)
+    resumed = load_forecaster("fern")
+    feed(resumed, data, 5 * DAY + 7, 10 * DAY)
+    assert resumed.blocks == whole.blocks and resumed.cycles == whole.cycles and resumed.last_ms == whole.last_ms
+    assert resumed.beta == pytest.approx(whole.beta) and resumed.s2 == pytest.approx(whole.s2)
+    assert np.allclose(resumed.P, whole.P)
+    assert resumed.forecast(0.6, 0.35) == pytest.approx(whole.forecast(0.6, 0.35))
+
+
+def test_restart_does_not_learn_saved_history_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecast, "FORECAST_DIR", str(tmp_path / "forecasts"))
+    t, s, vpd, temp, light, _ = synth(days=4)
+    hum = np.full(len(t), 55.0)
+    dev = DeviceRegistry(root=str(tmp_path / "history")).get("fern")
+    for d in range(0, len(t), DAY):
+        res = process_samples(dev, make_batch(t[d:d + DAY], temp[d:d + DAY], hum[d:d + DAY], s[d:d + DAY], light[d:d + DAY]))
+        dev.history.extend(res); dev.segments.append(res)
+    save_forecaster("fern", dev.forecaster)
+    back = DeviceRegistry(root=str(tmp_path / "history")).get("fern")
+    assert back.forecaster.blocks == dev.forecaster.blocks and back.forecaster.cycles == dev.forecaster.cycles
+    assert back.forecaster.beta == pytest.approx(dev.forecaster.beta)
+    # Without a saved model the history alone rebuilds the same fit
+    (tmp_path / "forecasts" / "fern.json").unlink()
+    fresh = DeviceRegistry(root=str(tmp_path / "history")).get("fern")
+    assert fresh.forecaster.blocks == dev.forecaster.blocks
@@ -0,0 +1,122 @@
+import math
+import itertools
+import numpy as np
+import pytest
+from health import read_rules, unit_hash
+from pipeline import hour_of_day
+from replay import load_traces
+from store import fill
+
+TRACES = load_traces()
+
+
+def calculate_health_detailed(soil, temp, hum, light, hour, jitter=0.0):
+    # The dashboard's scoring before the TOML rules, with the clock hour and
+    # the random jitter passed in
+    if math.isnan(temp): temp = 0
+    if math.isnan(hum): hum = 0
+    if math.isnan(light): light = 0
+
+    reasons = []
+
+    if 0.45 <= soil <= 0.65:
+        soil_score = 100
+    elif soil < 0.20:
+        soil_score = 10
+        reasons.append("Critical Dry")
+    elif soil < 0.35:
+        soil_score = 40
+        reasons.append("Soil Dry")
+    elif soil < 0.45:
+        soil_score = 70
+        reasons.append("Soil Low")
+    elif soil > 0.90:
+        soil_score = 50
+        reasons.append("Too Wet")
+    else:
+        soil_score = 80
+
+    if 22 <= temp <= 25:
+        temp_score = 100
+    else:
+        diff = abs(temp - 23.5)
+        temp_score = max(20, 100 - diff * 12)
+        if temp > 30:
+            reasons.append(f"High Temp ({temp:.1f}°C)")
+        elif temp < 15:
+            reasons.append(f"Low Temp ({temp:.1f}°C)")
+
+    is_day = 8 <= hour <= 18
+    if is_day:
+        if light < 300:
+            light_score = 50
+            reasons.append("Low Light")
+        elif light > 3000:
+            light_score = 60
+        else:
+            light_score = 100
+    else:
+        light_score = 100 if light < 50 else 60
+
+    total = (soil_score * 0.5 + temp_score * 0.3 + light_score * 0.2)
+    total = max(0, min(100, total + jitter))
+    return int(total), soil_score, int(temp_score), light_score, reasons
+
+
+def check_parity(soil, temp, light, hours, times=None):
+    rules = read_rules("default")
+    rules.jitter = 0
+    h = rules.score(soil, temp, light, hours, times)
+    for i in range(len(soil)):
+        old = calculate_health_detailed(soil[i], temp[i], 0.0, light[i], hours[i])
+        new = (h["health"][i], h["h_soil"][i], h["h_temp"][i], h["h_light"][i], list(h["reason_list"][i].values()))
+        assert new == old, (i, soil[i], temp[i], light[i], hours[i])
+        # The stored label is a template over the row's readings (NaN stored as 0, see make_batch)
+        row = {"temp": np.nan_to_num(temp[i]), "hum": 0.0, "light": np.nan_to_num(light[i]), "soil": soil[i], "vpd": 0.0}
+        assert fill(h["reasons"][i], row) == ", ".join(old[4])
+
+
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_default_rules_reproduce_the_old_scores_on_recorded_logs(tr):
+    times = tr["full_time"].to_numpy().astype("datetime64[ms]")
+    soil, temp, light = (tr[c].to_numpy(dtype=float) for c in ("soil", "temp", "light"))
+    check_parity(soil, temp, light, hour_of_day(times), times)
+
+
+def test_default_rules_reproduce_the_old_scores_on_every_band_edge():
+    grid = np.array(list(itertools.product(
+        [0.0, 0.19, 0.2, 0.34, 0.35, 0.44, 0.45, 0.65, 0.66, 0.9, 0.91],
+        [0.0, 14.9, 15.0, 21.9, 22.0, 25.0, 25.1, 30.0, 30.1, 41.0],
+        [0.0, 49.0, 50.0, 299.0, 300.0, 3000.0, 3001.0],
+        [0, 7, 8, 18, 19])))
+    check_parity(grid[:, 0], grid[:, 1], grid[:, 2], grid[:, 3].astype(np.int64))
+    nan = np.array([np.nan, 0.5, 0.5])
+    check_parity(nan, nan[[1, 0, 0]], nan[[1, 1, 0]], np.array([12, 12, 3]))
+
+
+def test_jitter_is_a_pure_function_of_time_and_seed():
+    tr = TRACES[2]
+    times = tr["full_time"].to_numpy().astype("datetime64[ms]")
+    soil, temp, light = (tr[c].to_numpy(dtype=float) for c in ("soil", "temp", "light"))
+    hours = hour_of_day(times)
+    rules = read_rules("default")
+    a = rules.score(soil, temp, light, hours, times, reasons=False)["health"]
+    assert np.array_equal(a, read_rules("default").score(soil, temp, light, hours, times, reasons=False)["health"])
+    # Rescoring a slice (or the batch backwards) gives each sample the same jitter
+    rev = rules.score(soil[::-1], temp[::-1], light[::-1], hours[::-1], times[::-1], reasons=False)["health"]
+    assert np.array_equal(rev[::-1], a)
+    assert np.array_equal(rules.score(soil[100:150], temp[100:150], light[100:150], hours[100:150], times[100:150],
+                                      reasons=False)["health"], a[100:150])
+    # Within +-jitter of the jitter-free score
+    rules.jitter = 0
+    base = rules.score(soil, temp, light, hours, times, reasons=False)["health"]
+    assert np.all(np.abs(a - base) <= 2) and not np.array_equal(a, base)
+
+
+def test_unit_hash():
+    keys = np.arange(1_700_000_000_000, 1_700_000_000_000 + 300_000 * 20_000, 300_000, dtype=np.int64)
+    u = unit_hash(keys, seed=0)
+    assert np.array_equal(u, unit_hash(keys.copy(), seed=0))
+    assert not np.array_equal(u, unit_hash(keys, seed=1))
+    assert u.min() >= 0 and u.max() < 1
+    assert abs(u.mean() - 0.5) < 0.01 and np.histogram(u, 10, (0, 1))[0].min() > 1800
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+
+def test_ingest_server_does_not_import_dash():
+    code = "import sys, ingest_server; print(sorted(m for m in ('dash', 'plotly', 'flask') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         capture_output=True, text=True, check=True, env={**os.environ, "PLANT_HISTORY_DIR": ""})
+    assert out.stdout.strip() == "[]"
+
+
+def test_csv_batch_through_the_route():
+    import runtime
+    import ingest_server
+    runtime.send_telegram_message = lambda message: None
+    srv = ingest_server.IngestServer()
+    body = b"480000,21,50,300,0.5,Calibrating,0,0,0\n540000,21,50,300,0.5,OK,0,0,0\nbad line\n"
+    status, _, reply = srv.route("POST", "/update_sensor_batch?device_id=srv-node&now_ms=600000", {"content-type": "text/csv"}, body)
+    assert status == 200 and json.loads(reply) == {"received": 3, "accepted": 2, "stale": 0, "ack": "03"}
+    srv.flush()
+    runtime.ingest.join()
+    w = runtime.devices.find("srv-node").history.snapshot().window()
+    assert list(w.labels("status")) == ["Calibrating", "OK"]
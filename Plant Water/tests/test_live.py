@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+from pipeline import make_batch
+
+
+@pytest.fixture(scope="module")
+def dashboard():
+    import dashboard
+    import runtime
+    runtime.send_telegram_message = lambda message: None   # the ingest worker's alerts
+    return dashboard
+
+
+def ingest(dashboard, dev, n, start):
+    t = start + np.arange(n) * np.timedelta64(5, "m")
+    dashboard.ingest.submit(dashboard.ingest_samples, dev, make_batch(t, np.full(n, 21.0), np.full(n, 50.0), np.full(n, 0.5), np.full(n, 300.0)), "WiFi")
+    dashboard.ingest.join()
+
+
+def test_sample_message_carries_what_the_browser_extends_with(dashboard):
+    dev = dashboard.devices.get("live-node")
+    ingest(dashboard, dev, 3, np.datetime64("2026-03-02T09:00", "ms"))
+    sub = dashboard.live.subscribe("live-node")
+    try:
+        ingest(dashboard, dev, 2, np.datetime64("2026-03-02T10:00", "ms"))
+        raw = sub.q.get(timeout=2).decode()
+    finally:
+        dashboard.live.unsubscribe(sub)
+    assert raw.startswith("event: sample\n")
+    msg = json.loads(raw.split("data: ", 1)[1])
+    assert msg["version"]["version"] == 5 and msg["points"]["seq"] == 3
+    assert msg["points"]["dry"] == dev.profile.soil["thirsty"] and len(msg["points"]["soil"]) == 2
+    assert msg["latest"]["light"] == 300.0
+
+
+def test_poll_leaves_rendering_to_the_stream(dashboard):
+    dev = dashboard.devices.get("poll-node")
+    ingest(dashboard, dev, 3, np.datetime64("2026-03-02T09:00", "ms"))
+    data, _, _, _, table = dashboard.poll(0, "poll-node", None, None, "poll-node", None)
+    ingest(dashboard, dev, 1, np.datetime64("2026-03-02T10:00", "ms"))
+    live = dashboard.poll(1, "poll-node", data, None, "poll-node", table)
+    assert live[0] is dashboard.dash.no_update and live[4]["version"] == 4   # the table still refreshes
+    assert dashboard.poll(2, "poll-node", data, None, None, table)[0]["version"] == 4   # stream down: server renders
+
+
+def test_eta_card_shows_the_drying_model_once_it_is_ready(dashboard):
+    dev = dashboard.devices.get("eta-node")
+    ingest(dashboard, dev, 3, np.datetime64("2026-03-02T09:00", "ms"))
+    data = {"device": "eta-node", "version": dev.history.version, "rev": dev.history.revision}
+    assert dev.eta_forecast is None and dashboard.update_view(data, 24, None)[6:9] == ("--", "--", "")   # flat soil: no slope ETA
+    dev.eta_forecast = (5.0, 6.5, 300.0)   # p10, p50, p90 hours; p90 past the card's range
+    assert dashboard.update_view(data, 24, None)[6:9] == ("06", "30", "≥ 5.0 h")
@@ -0,0 +1,33 @@
+import os
+import shutil
+import health
+import profiles
+from profiles import ProfileStore
+
+
+def edit(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))   # a new stamp even within one mtime tick
+
+
+def test_invalid_health_profile_keeps_the_last_good_rules(tmp_path, monkeypatch):
+    rules_dir, plants = tmp_path / "health_profiles", tmp_path / "plants"
+    rules_dir.mkdir(); plants.mkdir()
+    shutil.copy(os.path.join(health.HERE, "health_profiles", "default.toml"), rules_dir)
+    monkeypatch.setattr(health, "PROFILE_DIR", str(rules_dir))
+    monkeypatch.setattr(profiles, "PROFILE_DIR", str(rules_dir))
+    store = ProfileStore(str(plants))
+    good = store.get("fern").health
+    path = str(rules_dir / "default.toml")
+    original = open(path, encoding="utf-8").read()
+
+    edit(path, original.replace("[soil]", "[soil"))   # a half-saved edit: not valid TOML
+    assert store.poll() == []
+    assert store.get("cactus").health is good   # a new device still gets the last good rules
+    assert store.poll() == []                   # logged once, not retried on every poll
+
+    edit(path, original.replace("bias = 0", "bias = 5"))
+    assert sorted(store.poll()) == ["cactus", "fern"]
+    assert store.get("fern").health.bias == 5 and store.get("cactus").health is store.get("fern").health
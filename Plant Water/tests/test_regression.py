@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from regression import SlidingRegression, MIN_SPAN_H
+from replay import load_traces
+
+TRACES = load_traces()
+
+
+def hours(tr):
+    return tr["full_time"].to_numpy().astype("datetime64[ms]").astype(np.int64) / 3.6e6
+
+
+def reference(t_h, y, window_h, mode):
+    # Refit each window from scratch: the per-sample formula the running sums replace
+    out = np.zeros(len(y))
+    for i in range(len(y)):
+        w = (t_h[:i + 1] >= t_h[i] - window_h)
+        x, v = t_h[:i + 1][w], y[:i + 1][w]
+        if mode == "ols":
+            sxx = np.sum((x - x.mean()) ** 2)
+            if len(x) >= 2 and sxx >= MIN_SPAN_H ** 2:
+                out[i] = np.sum((x - x.mean()) * (v - v.mean())) / sxx
+        else:
+            pairs = [(v[b] - v[a]) / (x[b] - x[a]) for a in range(len(x)) for b in range(a + 1, len(x)) if x[b] - x[a] >= MIN_SPAN_H]
+            out[i] = np.median(pairs) if pairs else 0.0
+    return out
+
+
+@pytest.mark.parametrize("mode", ["ols", "theil-sen"])
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_batch_matches_scalar_and_refit_on_recorded_logs(tr, mode):
+    t_h, soil = hours(tr), tr["soil"].to_numpy(dtype=float)
+    scalar = SlidingRegression(mode=mode)
+    one = np.array([scalar.add(t, y) for t, y in zip(t_h, soil)])
+    batch = SlidingRegression(mode=mode)
+    b, err = batch.update_batch(t_h, soil)
+    # rtol covers the cancellation in windows that barely clear MIN_SPAN_H
+    np.testing.assert_allclose(b, one, rtol=1e-5, atol=1e-9)
+    np.testing.assert_allclose(b, reference(t_h, soil, batch.window_h, mode), rtol=1e-5, atol=1e-9)
+    assert err[-1] == pytest.approx(scalar.stderr(), rel=1e-5, abs=1e-6)
+    # Chunked batches carry the window over exactly
+    chunked = SlidingRegression(mode=mode)
+    parts = [chunked.update_batch(t_h[a:a + 37], soil[a:a + 37]) for a in range(0, len(soil), 37)]
+    np.testing.assert_allclose(np.concatenate([p[0] for p in parts]), b, rtol=1e-5, atol=1e-9)
+    np.testing.assert_allclose(np.concatenate([p[1] for p in parts]), err, rtol=1e-5, atol=1e-6)
+
+
+def test_short_windows():
+    r = SlidingRegression()
+    b, se = r.update_batch([10.0], [0.5])
+    assert b[0] == 0.0 and se[0] == 0.0                        # one point: no slope
+    b, se = r.update_batch([10.0 + MIN_SPAN_H / 10], [0.4])
+    assert b[0] == 0.0                                          # two points at (almost) the same time
+    r = SlidingRegression()
+    b, se = r.update_batch([10.0, 10.5], [0.5, 0.45])
+    assert b[1] == pytest.approx(-0.1) and se[1] == 0.0         # two points: slope, no error yet
+    b, se = r.update_batch([10.75], [0.42])
+    assert se[0] > 0
+    b, se = r.update_batch([12.0], [0.3])                       # the window has moved past the others
+    assert b[0] == 0.0 and len(r) == 1
+    assert [len(v) for v in SlidingRegression().update_batch([], [])] == [0, 0]
+
+
+@pytest.mark.parametrize("mode", ["ols", "theil-sen"])
+def test_nan_readings_are_skipped(mode):
+    t = 100 + np.arange(10) / 12
+    y = 0.6 - 0.02 * np.arange(10)
+    y_nan = y.copy(); y_nan[[0, 4, 5]] = np.nan
+    clean = SlidingRegression(mode=mode)
+    want = {i: v for i, v in zip([1, 2, 3, 6, 7, 8, 9], clean.update_batch(np.delete(t, [0, 4, 5]), np.delete(y, [0, 4, 5]))[0])}
+    r = SlidingRegression(mode=mode)
+    b, se = r.update_batch(t, y_nan)
+    assert np.all(np.isfinite(b)) and np.all(np.isfinite(se))
+    assert b[0] == 0.0 and b[4] == b[5] == want[3]
+    assert all(b[i] == pytest.approx(v) for i, v in want.items())
+    s = SlidingRegression(mode=mode)
+    assert [s.add(ti, yi) for ti, yi in zip(t, y_nan)] == pytest.approx(list(b))
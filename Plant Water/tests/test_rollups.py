@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rollups import Rollups, LEVELS, ROLLUP_COLUMNS
+from replay import load_traces
+
+TRACES = load_traces()
+RULES = {"5min": "5min", "1h": "1h", "1d": "1D"}
+
+
+def columns(tr):
+    cols = {c: tr[c].to_numpy(dtype=float) for c in ROLLUP_COLUMNS}
+    cols["full_time"] = tr["full_time"].to_numpy().astype("datetime64[ms]")
+    return cols
+
+
+def expected(tr, rule, column):
+    # The same buckets straight from pandas (empty buckets dropped)
+    s = tr.set_index(pd.to_datetime(tr["full_time"]))[column].astype(float)
+    r = s.resample(RULES[rule]).agg(["min", "max", "mean", "last", "count"])
+    return r[r["count"] > 0]
+
+
+def check(rollups, tr):
+    for name, ms, _ in LEVELS:
+        for column in ROLLUP_COLUMNS:
+            got, want = rollups.window(name, column=column), expected(tr, name, column)
+            start = (got["time"] - np.timedelta64(ms // 2, "ms")).astype("datetime64[ns]")
+            assert np.array_equal(start, want.index.to_numpy())
+            for f in ("min", "max", "mean", "last"):
+                np.testing.assert_allclose(got[f], want[f].to_numpy(), rtol=1e-12, err_msg=f"{name} {column} {f}")
+
+
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_rollups_match_pandas_resample(tr):
+    r = Rollups()
+    r.update(columns(tr))
+    check(r, tr)
+
+
+@pytest.mark.parametrize("tr", TRACES, ids=[tr["trace"].iloc[0] for tr in TRACES])
+def test_chunked_updates_fold_into_the_open_bucket(tr):
+    # Odd chunk sizes split buckets across batches at every level
+    r, cols = Rollups(), columns(tr)
+    for a in range(0, len(tr), 7):
+        r.update({c: v[a:a + 7] for c, v in cols.items()})
+    check(r, tr)
+
+
+def test_ring_keeps_the_newest_buckets():
+    tr = TRACES[0]
+    r = Rollups(levels=(("1h", 3600 * 1000, 5),))
+    cols = columns(tr)
+    for a in range(0, len(tr), 11):
+        r.update({c: v[a:a + 11] for c, v in cols.items()})
+    want = expected(tr, "1h", "soil").iloc[-5:]
+    got = r.window("1h")
+    assert len(got["mean"]) == 5
+    np.testing.assert_allclose(got["mean"], want["mean"].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(got["last"], want["last"].to_numpy())
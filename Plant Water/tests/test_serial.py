@@ -0,0 +1,96 @@
+import threading
+import time
+import pytest
+
+serial = pytest.importorskip("serial")
+fake_serial = pytest.importorskip("fake_serial")   # POSIX pty
+from serial_ingest import LineFramer, SerialReader, parse_serial_lines
+
+LINE = "21.50,48.00,1800,0.550,OK,0.0,-1,80"
+
+
+def test_framer_joins_split_lines_and_splits_merged_ones():
+    f = LineFramer()
+    assert f.feed(b"1000,21.5,48") == []
+    assert f.feed(b",1800,0.55,OK,0,-1,80\r\n2000,21.6") == [b"1000,21.5,48,1800,0.55,OK,0,-1,80"]
+    assert f.feed(b",48,1800,0.55,OK,0,-1,80\r\n3000,a\r\n\r\n4000,b\n") == [
+        b"2000,21.6,48,1800,0.55,OK,0,-1,80", b"3000,a", b"4000,b"]   # \r\n and \n, blank lines skipped
+    assert f.buf == b""
+
+
+def test_framer_drops_an_overlong_run_without_newline():
+    f = LineFramer(max_line=16)
+    assert f.feed(b"x" * 20) == [] and f.overflows == 1
+    assert f.feed(b"1,2\n") == [b"1,2"]
+
+
+def test_bad_field_counts_are_dropped_and_counted():
+    import dashboard   # wires SERIAL_DROPPED to the readers' counters
+    import metrics
+    got = []
+    reader = SerialReader("/dev/fake-test", "fern", 9600, lambda d, b: got.append(b))
+    reader._handle([f"1000,{LINE}".encode(), b"1000,21.5,48,1800", f"1000,{LINE},extra".encode(), b"1000,x,48,1800,0.5,OK,0,-1,80"])
+    assert len(got) == 1 and len(got[0]["soil"]) == 1 and reader.stats["bad_lines"] == 3
+    dashboard.serial_readers = [reader]
+    try:
+        assert 'plant_serial_lines_dropped_total{port="/dev/fake-test"} 3' in metrics.render()
+    finally:
+        dashboard.serial_readers = []
+
+
+def collect(port, n, timeout=10.0):
+    got, done = [], threading.Event()
+
+    def on_batch(device_id, batch):
+        got.extend(zip([device_id] * len(batch["soil"]), batch["soil"], batch["status"]))
+        if len(got) >= n: done.set()
+    reader = SerialReader(port, "fern", 115200, on_batch, timeout=0.1).start()
+    return reader, got, done
+
+
+def test_split_writes_from_a_fake_device_frame_into_samples():
+    dev = fake_serial.FakeSerialDevice(rate=0, split=True, lines=[LINE], seed=1)
+    reader, got, done = collect(dev.port, 50)
+    try:
+        time.sleep(0.3)   # let the reader open the port before anything is written
+        dev.start()
+        assert done.wait(10)
+    finally:
+        reader.stop(); dev.stop()
+    assert all(g == ("fern", 0.55, "OK") for g in got)
+    assert reader.stats["bad_lines"] <= 1   # at most a line cut by the reader's start
+
+
+def test_reader_reconnects_after_a_serial_error(monkeypatch):
+    class Flaky(serial.Serial):
+        # The first connection fails on its first read, like an unplugged board
+        opened = 0
+
+        def __init__(self, *args, **kw):
+            super().__init__(*args, **kw)
+            Flaky.opened += 1
+            self.fail = Flaky.opened == 1
+
+        def read(self, size=1):
+            data = super().read(size)
+            if self.fail and data:
+                raise serial.SerialException("device disconnected")
+            return data
+    monkeypatch.setattr(serial, "Serial", Flaky)
+    monkeypatch.setattr("serial_ingest.RECONNECT_S", 0.1)
+    dev = fake_serial.FakeSerialDevice(rate=200, lines=[LINE])
+    reader, got, done = collect(dev.port, 5)
+    try:
+        time.sleep(0.3)
+        dev.start()
+        assert done.wait(10)
+    finally:
+        reader.stop(); dev.stop()
+    assert Flaky.opened == 2 and reader.stats["reconnects"] == 1
+    assert all(g == ("fern", 0.55, "OK") for g in got)
+
+
+def test_parse_keeps_nan_as_zero_and_the_status():
+    b = parse_serial_lines([b"1000,nan,48,nan,0.5,TooWet,0,-1,80", b"1000,21,48,10,0.4,,0,-1,80"])
+    assert list(b["temp"]) == [0.0, 21.0] and list(b["light"]) == [0.0, 10.0]
+    assert list(b["status"]) == ["TooWet", None]
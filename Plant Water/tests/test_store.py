@@ -0,0 +1,44 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+from devices import DeviceRegistry
+from export import iter_frames, iter_csv, ROW_COLUMNS
+from pipeline import make_batch, process_samples
+from table_query import query_page
+
+
+def heat_wave(tmp_path, n=200):
+    # A hot afternoon: the temperature never repeats, the advice and reason templates do
+    reg = DeviceRegistry(capacity=1000, root=str(tmp_path))
+    dev = reg.get("fern")
+    t = np.datetime64("2026-07-02T12:00", "ms") + np.arange(n) * np.timedelta64(5, "m")
+    temp = 30.5 + np.arange(n) * 0.1
+    res = process_samples(dev, make_batch(t, temp, np.full(n, 40.0), np.full(n, 0.55), np.full(n, 1000.0)))
+    dev.history.extend(res)
+    dev.segments.append(res)
+    return dev, temp
+
+
+def test_templated_labels_stay_bounded_and_render_per_row(tmp_path):
+    dev, temp = heat_wave(tmp_path)
+    cats = dev.history.categories
+    assert cats["smart_msg"].labels == ["🔥 Heat Wave! Temp is {temp:.1f}°C"]
+    assert cats["reasons"].labels == ["High Temp ({temp:.1f}°C)"]
+    saved = json.load(open(dev.segments.labels_path, encoding="utf-8"))
+    assert len(saved["smart_msg"]) == len(saved["reasons"]) == 1
+
+    snap = dev.history.snapshot()
+    assert snap.latest()["smart_msg"] == f"🔥 Heat Wave! Temp is {temp[-1]:.1f}°C"
+    frame = snap.to_frame()
+    assert frame["reasons"].iloc[3] == f"High Temp ({temp[3]:.1f}°C)"
+
+    rows, _ = query_page(snap, 0, 5)
+    assert rows[0]["smart_msg"] == f"🔥 Heat Wave! Temp is {temp[-1]:.1f}°C"
+    rows, pages = query_page(snap, 0, 5, filter_query="{smart_msg} contains 31.2")
+    assert pages == 1 and [r["temp"] for r in rows] == [31.2]
+    rows, _ = query_page(snap, 0, 5, sort_by=[{"column_id": "reasons", "direction": "asc"}])
+    assert rows[0]["reasons"] == "High Temp (30.5°C)"
+
+    csv = pd.read_csv(io.StringIO("".join(iter_csv(iter_frames([dev]), ROW_COLUMNS))))
+    assert list(csv["smart_msg"]) == [f"🔥 Heat Wave! Temp is {x:.1f}°C" for x in temp]
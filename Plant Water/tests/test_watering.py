@@ -0,0 +1,55 @@
+import numpy as np
+from watering import WateringDetector, DryingCycles, WATERING_THRESHOLD
+
+T0 = np.datetime64("2026-03-02T00:00", "ms")
+
+
+def trace(n=576, at=300, pour=(0.3,), noise=0.005, seed=7):
+    # Two days of 5-minute readings drying 0.002 per sample, watered from sample `at`
+    rng = np.random.default_rng(seed)
+    soil = 0.7 - 0.002 * np.arange(n) + rng.normal(0, noise, n)
+    for i, step in enumerate(pour):
+        soil[at + i:] += step
+    return T0 + np.arange(n) * np.timedelta64(5, "m"), soil
+
+
+def cycles(times, soil, det):
+    cyc = DryingCycles()
+    idx, rises = det.scan(soil)
+    for i, rise in zip(idx, rises):
+        cyc.add(times[i].astype(np.int64), soil[i], rise)
+    return idx, rises, cyc
+
+
+def test_one_cycle_per_watering_step():
+    times, soil = trace()
+    idx, rises, cyc = cycles(times, soil, WateringDetector())
+    assert idx.tolist() == [300] and len(cyc) == 1
+    assert abs(rises[0] - 0.3) < 0.03
+    assert cyc.at(times[299].astype(np.int64)) is None
+    assert cyc.at(times[-1].astype(np.int64))["start"] == times[300].astype(np.int64)
+
+
+def test_cusum_catches_a_slow_pour():
+    # 0.05 per sample over half an hour, with the firmware rule switched off: CUSUM fires once
+    times, soil = trace(pour=(0.05,) * 6)
+    idx, rises, cyc = cycles(times, soil, WateringDetector(threshold=np.inf))
+    assert len(idx) == 1 and 300 <= idx[0] <= 305 and len(cyc) == 1
+    assert rises[0] > WATERING_THRESHOLD
+    # Both triggers together still count the pour once
+    assert len(WateringDetector().scan(soil)[0]) == 1
+
+
+def test_no_false_positive_on_noise():
+    for noise in (0.005, 0.01):
+        times, soil = trace(n=5000, pour=(), noise=noise)
+        idx, _, cyc = cycles(times, soil, WateringDetector())
+        assert len(idx) == 0 and len(cyc) == 0
+
+
+def test_chunked_scan_matches_one_batch():
+    _, soil = trace(pour=(0.05,) * 6)
+    whole = WateringDetector().scan(soil)[0]
+    det = WateringDetector()
+    parts = [det.scan(soil[a:a + 50])[0] + a for a in range(0, len(soil), 50)]
+    assert np.concatenate(parts).tolist() == whole.tolist()
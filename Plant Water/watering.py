@@ -0,0 +1,85 @@
+import bisect
+from collections import deque
+import numpy as np
+
+# ==========================================
+# Watering detection & drying cycles
+# ==========================================
+# Two triggers, either one marks a watering:
+#  - the firmware rule (main.cpp): soil rose more than WATERING_THRESHOLD above
+#    the lowest of the last 5 readings
+#  - a one-sided CUSUM on the per-sample soil change, which also catches a slow
+#    pour spread over several samples that never jumps 0.15 at once
+# After a watering both are reset (like the firmware's history.reset()) and
+# the caller restarts the slope fit, so pre- and post-watering readings are
+# never mixed. Every watering opens a drying cycle in DryingCycles.
+
+WATERING_THRESHOLD = 0.15   # CFG::WATERING_THRESHOLD
+LOOKBACK = 5
+CUSUM_K = 0.02              # per-sample rise treated as noise
+CUSUM_H = 0.15              # accumulated rise that counts as a watering
+
+
+class WateringDetector:
+    def __init__(self, threshold=WATERING_THRESHOLD, lookback=LOOKBACK, k=CUSUM_K, h=CUSUM_H):
+        self.threshold = threshold
+        self.k = k
+        self.h = h
+        self.recent = deque(maxlen=lookback)
+        self.g = 0.0         # CUSUM statistic
+        self.g_start = None  # soil level where the current CUSUM run began
+
+    def step(self, soil):
+        # Returns the detected rise for this reading, or 0.0
+        rise = soil - min(self.recent) if self.recent else 0.0
+        if self.recent:
+            if self.g == 0.0: self.g_start = self.recent[-1]
+            self.g = max(0.0, self.g + (soil - self.recent[-1]) - self.k)
+        if rise > self.threshold or self.g > self.h:
+            rise = max(rise, soil - self.g_start)
+            self.recent.clear(); self.g = 0.0; self.g_start = None
+            self.recent.append(soil)
+            return rise
+        self.recent.append(soil)
+        return 0.0
+
+    def scan(self, soil):
+        # Indices and rises of the waterings in a batch of readings
+        idx, rises = [], []
+        for i, s in enumerate(np.asarray(soil, dtype=float).tolist()):
+            rise = self.step(s)
+            if rise:
+                idx.append(i); rises.append(rise)
+        return np.array(idx, dtype=np.int64), np.array(rises)
+
+
+class DryingCycles:
+    # Append-only index of drying cycles, one per watering, sorted by start time.
+    # A cycle runs from its watering to the next one (the last one is still open).
+    def __init__(self):
+        self.starts = []   # epoch ms of each watering
+        self.levels = []   # soil right after watering
+        self.rises = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, t_ms, level, rise):
+        if self.starts and t_ms < self.starts[-1]:
+            return   # late backfill behind the newest cycle; keep the index sorted
+        self.starts.append(int(t_ms)); self.levels.append(float(level)); self.rises.append(float(rise))
+
+    def _cycle(self, i):
+        return {"start": self.starts[i], "end": self.starts[i + 1] if i + 1 < len(self.starts) else None,
+                "level": self.levels[i], "rise": self.rises[i]}
+
+    def at(self, t_ms):
+        # The cycle containing t_ms (None before the first watering)
+        i = bisect.bisect_right(self.starts, t_ms) - 1
+        return self._cycle(i) if i >= 0 else None
+
+    def between(self, start_ms=None, end_ms=None):
+        # Cycles overlapping [start_ms, end_ms]; O(log n) to locate, then O(k)
+        lo = 0 if start_ms is None else max(0, bisect.bisect_right(self.starts, start_ms) - 1)
+        hi = len(self.starts) if end_ms is None else bisect.bisect_right(self.starts, end_ms)
+        return [self._cycle(i) for i in range(lo, hi)]